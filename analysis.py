@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+from config import (
+    LLM_BASE_URL, LLM_API_KEY, LLM_MODEL, LLM_MAX_CONCURRENCY, LLM_RATE_LIMIT,
+    LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BATCH_THRESHOLD, LLM_MAX_BATCH, LLM_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_FORMAT = """Type: [Specific type of emergency/incident]
+Location: [Exact location including address if available]
+Severity: [Critical/High/Medium/Low]
+Units Responding: [List all responding units]
+Description: [Detailed description of the emergency]
+Timestamp: [Current time]
+
+Debug Info:
+- Confidence: [High/Medium/Low]
+- Reasoning: [Brief explanation of emergency classification]"""
+
+START_TIMEOUT = 10  # Seconds submit() waits for the client loop to come up
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def build_prompt(dispatch_message: str, recent_history: str = "") -> str:
+    return f"""Analyze this emergency dispatch message. Include previous context if relevant.
+If this is not an emergency or disaster-related incident, respond with 'NOT_EMERGENCY'.
+
+Previous context (if relevant):
+{recent_history}
+
+Current message:
+{dispatch_message}
+
+Format the response exactly as shown below:
+{RESPONSE_FORMAT}
+"""
+
+
+def build_batch_prompt(items: List[tuple]) -> str:
+    """Packs several (message, recent_history) pairs into one request."""
+    blocks = []
+    for i, (message, recent_history) in enumerate(items, 1):
+        blocks.append(f"### Dispatch {i}\nPrevious context (if relevant):\n{recent_history}\n\nCurrent message:\n{message}")
+    dispatches = "\n\n".join(blocks)
+    return f"""Analyze each of the following {len(items)} emergency dispatch messages independently. Include previous context if relevant.
+Answer every message under its own header line exactly of the form '### Dispatch <number>'.
+Under a header, respond with 'NOT_EMERGENCY' if that message is not an emergency or disaster-related incident.
+
+{dispatches}
+
+Format each answer exactly as shown below:
+{RESPONSE_FORMAT}
+"""
+
+
+def split_batch_response(text: str, count: int) -> List[Optional[str]]:
+    """Splits a batched answer back into one section per dispatch; missing sections are None."""
+    sections = [None] * count
+    parts = re.split(r"^\s*#{2,3}\s*Dispatch\s+(\d+)\s*:?\s*$", text, flags=re.MULTILINE)
+    for number, body in zip(parts[1::2], parts[2::2]):
+        index = int(number) - 1
+        if 0 <= index < count and sections[index] is None:
+            sections[index] = body.strip()
+    return sections
+
+
+class AsyncRateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AnalysisService:
+    """
+    Shared LLM client used by every station.
+
+    Runs an asyncio loop on its own thread with one pooled HTTP client.
+    Requests are limited by a global concurrency cap and rate limiter and
+    retried with exponential backoff. When the backlog reaches
+    batch_threshold, pending dispatches are packed into a single request.
+
+    submit() is thread-safe and returns a Future resolving to the raw
+    model response for that dispatch.
+    """
+
+    def __init__(self, base_url=LLM_BASE_URL, api_key=LLM_API_KEY, model=LLM_MODEL,
+                 max_concurrency=LLM_MAX_CONCURRENCY, rate_limit=LLM_RATE_LIMIT,
+                 max_retries=LLM_MAX_RETRIES, backoff_base=LLM_BACKOFF_BASE,
+                 batch_threshold=LLM_BATCH_THRESHOLD, max_batch=LLM_MAX_BATCH, timeout=LLM_TIMEOUT):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.batch_threshold = batch_threshold
+        self.max_batch = max_batch
+        self.timeout = timeout
+
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._start_error: Optional[BaseException] = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "requests": 0,
+            "batched_requests": 0,
+            "batched_dispatches": 0,
+            "retries": 0,
+            "in_flight": 0,
+            "total_latency": 0.0,
+        }
+
+    def submit(self, dispatch_message: str, recent_history: str = "") -> Future:
+        self._ensure_running()
+        future = Future()
+        with self._lock:
+            self._stats["submitted"] += 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (dispatch_message, recent_history, future))
+        return future
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        requests_done = stats["requests"]
+        stats["avg_latency"] = stats.pop("total_latency") / requests_done if requests_done else 0.0
+        stats["pending"] = self._queue.qsize() if self._queue is not None else 0
+        return stats
+
+    def _ensure_running(self):
+        """Starts the loop thread if needed; raises if the client could not be created."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._ready.clear()
+                self._start_error = None
+                self._thread = threading.Thread(target=self._run_loop, daemon=True)
+                self._thread.start()
+                if not self._ready.wait(START_TIMEOUT):
+                    raise RuntimeError("analysis service did not start")
+            if self._start_error is not None:
+                raise RuntimeError(f"analysis service failed to start: {self._start_error}") from self._start_error
+
+    def _run_loop(self):
+        try:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._queue = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._rate_limiter = AsyncRateLimiter(self.rate_limit)
+            self._tasks = set()
+            self._client = AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                max_retries=0,  # Retries are handled here with backoff
+                timeout=self.timeout,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_concurrency,
+                        max_keepalive_connections=self.max_concurrency
+                    )
+                )
+            )
+        except Exception as e:
+            # e.g. no API key; submit() raises this instead of waiting forever
+            logger.error("Could not create the analysis client: %s", e)
+            self._start_error = e
+            return
+        finally:
+            self._ready.set()
+        self._loop.run_until_complete(self._dispatch())
+
+    async def _dispatch(self):
+        while True:
+            batch = [await self._queue.get()]
+            await self._semaphore.acquire()
+            # Only pack requests together once a backlog has built up while
+            # every connection slot was busy
+            if self._queue.qsize() + 1 >= self.batch_threshold:
+                while len(batch) < self.max_batch and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+            task = asyncio.create_task(self._process(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, batch):
+        try:
+            if len(batch) == 1:
+                message, recent_history, future = batch[0]
+                response = await self._complete(build_prompt(message, recent_history), max_tokens=500)
+                self._resolve(future, response)
+                return
+
+            response = await self._complete(
+                build_batch_prompt([(m, h) for m, h, _ in batch]), max_tokens=500 * len(batch)
+            )
+            with self._lock:
+                self._stats["batched_requests"] += 1
+                self._stats["batched_dispatches"] += len(batch)
+            for item, section in zip(batch, split_batch_response(response, len(batch))):
+                if section is None:
+                    # The model skipped this one; send it again on its own
+                    self._queue.put_nowait(item)
+                else:
+                    self._resolve(item[2], section)
+        except Exception as e:
+            logger.error("Error in analysis request: %s", e)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+                    with self._lock:
+                        self._stats["failed"] += 1
+        finally:
+            self._semaphore.release()
+
+    async def _complete(self, prompt: str, max_tokens: int) -> str:
+        for attempt in range(self.max_retries + 1):
+            await self._rate_limiter.acquire()
+            started = time.time()
+            with self._lock:
+                self._stats["in_flight"] += 1
+            try:
+                completion = await self._client.chat.completions.create(
+                    extra_headers={
+                        "HTTP-Referer": "YOUR_WEBSITE",
+                        "X-Title": "Emergency Dispatch Analysis",
+                    },
+                    model=self.model,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.1,
+                    max_tokens=max_tokens
+                )
+                with self._lock:
+                    self._stats["requests"] += 1
+                    self._stats["total_latency"] += time.time() - started
+                return completion.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+                logger.warning("Analysis request failed (%s); retrying in %.1fs", e, delay)
+                with self._lock:
+                    self._stats["retries"] += 1
+                await asyncio.sleep(delay)
+            finally:
+                with self._lock:
+                    self._stats["in_flight"] -= 1
+
+    def _resolve(self, future: Future, response: str):
+        if not future.done():
+            future.set_result(response)
+            with self._lock:
+                self._stats["completed"] += 1
@@ -1,56 +1,149 @@
-from fastapi import FastAPI, Query, BackgroundTasks
-from radio import get_radio_stations
-from transcriber import transcribe_audio_pipeline
+from fastapi import FastAPI, Query, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from radio import get_radio_stations, get_station_cache_stats, close_client
+from transcriber import (
+    transcribe_audio_pipeline, warm_up, schedulers, get_scheduler, cascade, prefilter, analysis_cache, analysis_service,
+    incident_tracker, fingerprints
+)
+from models import registry
+from config import MODEL_SIZE, MODEL_SIZES, MODEL_WARMUP, PROFILER_ENABLED, HISTORY_CAPACITY, SEARCH_DEFAULT_LIMIT
+from metrics import registry as metrics, configure_logging, SamplingProfiler, QUEUE_DEPTH, QUEUE_DROPPED
+from history import TranscriptHistory
+from transcripts import TranscriptStore
+from jobs import IngestJobManager
+from feed import FeedBroker
 from datetime import datetime
 from openai import OpenAI
-from typing import List, Dict
+from typing import List, Dict, Optional
+import asyncio
+import json
 import queue
 
+configure_logging()
+
 app = FastAPI()
 active_transcribers = {}
 transcription_records = {}
+feed = FeedBroker()
+# Every transcription, kept across restarts and searchable across stations
+transcript_store = TranscriptStore()
+profiler = SamplingProfiler() if PROFILER_ENABLED else None
+# Long recordings are transcribed in the background on the shared inference backend
+job_manager = IngestJobManager(get_scheduler)
 
 class TranscriptionRecord:
     def __init__(self):
-        self.transcriptions: List[Dict] = []
-        self.max_history = 100  # Keep last 100 transcriptions
+        # Ring buffer keeping the last HISTORY_CAPACITY transcriptions
+        self.transcriptions = TranscriptHistory()
         self.analysis_queue = queue.Queue()
         
     def add_transcription(self, text: str, analysis: Dict):
-        self.transcriptions.append({
-            "text": text,
-            "analysis": analysis,
-            "timestamp": datetime.now().isoformat()
-        })
-        # Maintain history limit
-        if len(self.transcriptions) > self.max_history:
-            self.transcriptions.pop(0)
+        return self.transcriptions.append(text, analysis)
+
+def _parse_since(raw: Optional[str], stations: List[str]) -> Dict[str, int]:
+    """
+    Accepts a single seq for every station or a JSON object of station_url -> seq.
+    Anything malformed, as a whole or for one station, means no cursor there.
+    """
+    if not raw:
+        return {}
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return {}
+    if isinstance(value, int):
+        return {url: value for url in stations}
+    if not isinstance(value, dict):
+        return {}
+    since = {}
+    for url, seq in value.items():
+        if url not in stations:
+            continue
+        try:
+            since[url] = int(seq)
+        except (TypeError, ValueError, OverflowError):
+            continue
+    return since
+
+def _histories() -> Dict[str, TranscriptHistory]:
+    return {url: record.transcriptions for url, record in transcription_records.items()}
+
+def _collect_queue_metrics():
+    for url, transcriber in list(active_transcribers.items()):
+        for name, bounded in (("audio", transcriber.audio_queue), ("analysis", transcriber.analysis_queue)):
+            stats = bounded.get_stats()
+            QUEUE_DEPTH.labels(url, name).set(stats["depth"])
+            QUEUE_DROPPED.labels(url, name).set(stats["dropped"])
+
+metrics.add_collector(_collect_queue_metrics)
+
+@app.on_event("startup")
+async def attach_feed():
+    # Transcriber threads publish onto this loop
+    feed.attach(asyncio.get_running_loop())
+
+@app.on_event("startup")
+async def warm_up_model():
+    # Loads in the background; /stations and health checks do not wait on it
+    if MODEL_WARMUP:
+        warm_up()
+
+@app.on_event("startup")
+async def start_profiler():
+    if profiler is not None:
+        profiler.start()
+
+@app.on_event("startup")
+async def resume_jobs():
+    await asyncio.to_thread(job_manager.start)
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    job_manager.close()
+
+@app.on_event("shutdown")
+async def close_station_client():
+    await close_client()
+
+@app.on_event("shutdown")
+async def flush_transcripts():
+    await asyncio.to_thread(transcript_store.close)
 
 @app.get("/")
 def read_root():
   return {"message": "Live Radio Transcription API"}
 
 @app.get("/stations")
-def get_stations(tag: str = Query("police", description="any kind of tag")):
+async def get_stations(tag: str = Query("police", description="any kind of tag")):
   """Fetches radio stations from Radio-Browser API."""
-  stations = get_radio_stations(tag)
+  stations = await get_radio_stations(tag)
   return {"stations": stations}
 
 @app.get("/transcribe/start")
-async def start_transcription(station_url: str):
+async def start_transcription(
+    station_url: str,
+    model_size: str = Query(MODEL_SIZE, description="Whisper model size for this station")
+):
     """Starts transcribing a given radio station."""
     if station_url in active_transcribers:
         return {"message": "Transcription already running for this station"}
+    if model_size not in MODEL_SIZES:
+        return {"message": f"Unknown model size, choose from: {', '.join(MODEL_SIZES)}"}
     
-    # Create record keeper for this station
+    # Create record keeper for this station, picking up where the last run left off
     if station_url not in transcription_records:
-        transcription_records[station_url] = TranscriptionRecord()
+        record = TranscriptionRecord()
+        record.transcriptions.restore(await asyncio.to_thread(transcript_store.latest, station_url, HISTORY_CAPACITY))
+        transcription_records[station_url] = record
     
     # Create callback for handling transcriptions
     def handle_transcription(text: str, analysis: Dict):
-        transcription_records[station_url].add_transcription(text, analysis)
+        entry = transcription_records[station_url].add_transcription(text, analysis)
+        transcript_store.add(station_url, entry)
+        feed.publish(station_url, entry)
     
-    transcriber = transcribe_audio_pipeline(station_url)
+    metrics.restore_station(station_url)
+    transcriber = transcribe_audio_pipeline(station_url, model_size)
     transcriber.callback = handle_transcription
     active_transcribers[station_url] = transcriber
     
@@ -60,18 +153,185 @@ async def start_transcription(station_url: str):
 async def stop_transcription(station_url: str):
     """Stops transcribing a given radio station."""
     if station_url in active_transcribers:
-        active_transcribers[station_url].stop_streaming()
-        del active_transcribers[station_url]
+        transcriber = active_transcribers.pop(station_url)
+        await asyncio.to_thread(transcriber.stop_streaming)
+        metrics.remove_station(station_url)
         return {"message": "Transcription stopped"}
     return {"message": "No active transcription found for this station"}
 
 @app.get("/transcribe/history")
-async def get_transcription_history(station_url: str):
-    """Gets transcription history for a station."""
+async def get_transcription_history(
+    station_url: str,
+    since: Optional[int] = Query(None, description="Only entries with a greater seq"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum entries to return"),
+    start: Optional[datetime] = Query(None, description="Earliest timestamp (ISO 8601)"),
+    end: Optional[datetime] = Query(None, description="Latest timestamp (ISO 8601)")
+):
+    """Gets transcription history for a station, optionally only entries after a seq cursor or in a time range."""
     if station_url not in transcription_records:
         return {"message": "No transcription history found for this station"}
     
+    history = transcription_records[station_url].transcriptions
     return {
         "station_url": station_url,
-        "history": transcription_records[station_url].transcriptions
-    }
\ No newline at end of file
+        "last_seq": history.last_seq,
+        "history": history.query(since=since, limit=limit, start=start, end=end)
+    }
+
+@app.get("/transcribe/incidents")
+async def get_open_incidents(station_url: str):
+    """Lists the incidents currently open for a station, most recent last."""
+    return {"station_url": station_url, "incidents": incident_tracker.open_incidents(station_url)}
+
+@app.get("/transcribe/search")
+def search_transcriptions(
+    q: Optional[str] = Query(None, description="Keywords matched against transcript text, type and location"),
+    station_url: Optional[str] = Query(None, description="Only this station"),
+    severity: Optional[str] = Query(None, description="Critical, High, Medium or Low"),
+    start: Optional[datetime] = Query(None, description="Earliest timestamp (ISO 8601)"),
+    end: Optional[datetime] = Query(None, description="Latest timestamp (ISO 8601)"),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, description="Results per page"),
+    before: Optional[int] = Query(None, description="next_before from the previous page")
+):
+    """Searches persisted transcriptions across all stations, newest first."""
+    return transcript_store.search(q, station_url, severity, start, end, limit, before)
+
+@app.get("/transcribe/stream")
+async def stream_transcriptions(
+    request: Request,
+    station_url: List[str] = Query(..., description="Stations to follow; repeat for several"),
+    since: Optional[str] = Query(None, description="Resume after this seq, or a JSON object of station_url -> seq")
+):
+    """Server-Sent Events feed of new transcriptions. Event ids carry the resume cursor."""
+    since_by_station = _parse_since(request.headers.get("last-event-id") or since, station_url)
+    subscriber = feed.subscribe(station_url)
+
+    async def events():
+        cursor = dict(since_by_station)
+        try:
+            async for message in feed.stream(subscriber, _histories(), since_by_station):
+                if await request.is_disconnected():
+                    break
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+                if message["type"] == "transcription":
+                    cursor[message["station_url"]] = message["seq"]
+                yield f"id: {json.dumps(cursor)}\nevent: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        finally:
+            feed.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.websocket("/transcribe/ws")
+async def websocket_transcriptions(
+    websocket: WebSocket,
+    station_url: List[str] = Query(..., description="Stations to follow; repeat for several"),
+    since: Optional[str] = Query(None, description="Resume after this seq, or a JSON object of station_url -> seq")
+):
+    """WebSocket feed of new transcriptions for one or more stations."""
+    await websocket.accept()
+    subscriber = feed.subscribe(station_url)
+    try:
+        async for message in feed.stream(subscriber, _histories(), _parse_since(since, station_url)):
+            if message is None:
+                message = {"type": "keepalive"}
+            await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        feed.unsubscribe(subscriber)
+
+@app.post("/jobs")
+async def submit_job(
+    request: Request,
+    path: Optional[str] = Query(None, description="Recording in the server's ingest directory; otherwise the request body is the file"),
+    filename: str = Query("", description="Name of the uploaded file, for its extension"),
+    model_size: str = Query(MODEL_SIZE, description="Whisper model size for this job")
+):
+    """Queues a recording for batch transcription. Poll /jobs/{id} and /jobs/{id}/results."""
+    if model_size not in MODEL_SIZES:
+        return {"message": f"Unknown model size, choose from: {', '.join(MODEL_SIZES)}"}
+    upload = path is None
+    if upload:
+        path = job_manager.upload_path(filename)
+        with open(path, "wb") as recording:
+            async for chunk in request.stream():
+                await asyncio.to_thread(recording.write, chunk)
+    else:
+        path = job_manager.local_path(path)
+        if path is None:
+            return {"message": "Recordings can only be submitted by path from the ingest directory (JOB_INGEST_DIR)"}
+    try:
+        return await asyncio.to_thread(job_manager.submit, path, model_size, upload)
+    except FileNotFoundError:
+        return {"message": "Recording not found"}
+
+@app.get("/jobs")
+async def list_jobs():
+    """Lists batch transcription jobs and their progress."""
+    return {"jobs": job_manager.list_jobs()}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Progress of a batch transcription job."""
+    return job_manager.status(job_id) or {"message": "No job found with this id"}
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    since: int = Query(0, ge=0, description="next from the previous response"),
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for new pieces")
+):
+    """Pieces transcribed so far, as they finish, with start and end seconds in the recording."""
+    return await asyncio.to_thread(job_manager.results, job_id, since, wait) or {"message": "No job found with this id"}
+
+@app.get("/jobs/{job_id}/transcript")
+async def get_job_transcript(job_id: str):
+    """Every transcribed piece of a job in recording order."""
+    pieces = await asyncio.to_thread(job_manager.transcript, job_id)
+    if pieces is None:
+        return {"message": "No job found with this id"}
+    return {"id": job_id, "status": job_manager.status(job_id)["status"], "pieces": pieces}
+
+@app.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: str):
+    """Transcribes a finished job's failed pieces again."""
+    try:
+        return await asyncio.to_thread(job_manager.retry, job_id) or {"message": "No job found with this id"}
+    except FileNotFoundError:
+        return {"message": "Recording not found"}
+
+@app.get("/transcribe/stats")
+async def get_transcription_stats():
+    """Reports shared inference scheduler and per-station pipeline statistics."""
+    return {
+        "scheduler": schedulers[MODEL_SIZE].get_stats(),
+        "schedulers": {size: s.get_stats() for size, s in schedulers.items() if size != MODEL_SIZE},
+        "cascade": cascade.get_stats() if cascade else None,
+        "models": registry.get_stats(),
+        "analysis": {
+            "prefilter": prefilter.get_stats(),
+            "cache": analysis_cache.get_stats(),
+            "incidents": incident_tracker.get_stats(),
+            "llm": analysis_service.get_stats()
+        },
+        "mirrors": fingerprints.get_stats() if fingerprints else None,
+        "feed": feed.get_stats(),
+        "transcript_store": transcript_store.get_stats(),
+        "jobs": job_manager.get_stats(),
+        "station_directory": get_station_cache_stats(),
+        "stations": {url: t.get_stats() for url, t in active_transcribers.items()}
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus-format metrics for every pipeline stage, labeled per station."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+def get_profile(reset: bool = Query(False, description="Clear samples after reading")):
+    """Collapsed stack samples from the sampling profiler (PROFILER_ENABLED=1), for flame graphs."""
+    if profiler is None:
+        return PlainTextResponse("Profiler disabled; set PROFILER_ENABLED=1\n", status_code=404)
+    return profiler.collapsed(reset=reset)
@@ -0,0 +1,82 @@
+"""
+Compares the NumPy/SciPy preprocessing engine with the previous pydub path.
+
+Both turn the same clip into 16kHz mono float32 ready for Whisper. The
+pydub path is the one transcriber.py used before preprocess.py: mono
+downmix, gain to 0 dBFS peak and resampling through audioop, then
+conversion to an array.
+
+  python benchmarks/preprocess_bench.py --input radio.wav --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from pydub import AudioSegment
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess import AudioPreprocessor, SAMPLE_DTYPES  # noqa: E402
+
+
+def pydub_preprocess(audio: AudioSegment) -> np.ndarray:
+    audio = audio.set_channels(1)
+    audio = audio.apply_gain(-audio.max_dBFS)
+    audio = audio.set_frame_rate(16000)
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+    return samples / float(1 << (8 * audio.sample_width - 1))
+
+
+def engine_preprocess(preprocessor: AudioPreprocessor, audio: AudioSegment) -> np.ndarray:
+    samples = np.frombuffer(audio.raw_data, dtype=SAMPLE_DTYPES[audio.sample_width])
+    return preprocessor.process(samples, audio.frame_rate, audio.channels)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return result, times
+
+
+def report(name, times, seconds):
+    median = float(np.median(times))
+    print(f"{name:<28} median {median * 1000:8.2f} ms   best {min(times) * 1000:8.2f} ms   "
+          f"{seconds / median:8.0f}x realtime")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default="radio.wav", help="Audio file to preprocess")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--bandpass", type=float, nargs=2, metavar=("LOW", "HIGH"), default=(250, 3800))
+    args = parser.parse_args()
+
+    audio = AudioSegment.from_file(args.input)
+    seconds = len(audio) / 1000
+    print(f"{args.input}: {seconds:.1f}s, {audio.frame_rate} Hz, {audio.channels} channel(s), "
+          f"{8 * audio.sample_width}-bit")
+
+    reference, times = timed(lambda: pydub_preprocess(audio), args.repeat)
+    report("pydub", times, seconds)
+
+    variants = {
+        "engine (peak)": AudioPreprocessor(bandpass=None, trim=False),
+        "engine (peak, trim)": AudioPreprocessor(bandpass=None, trim=True),
+        "engine (loudness, band-pass)": AudioPreprocessor(normalization="loudness", bandpass=tuple(args.bandpass)),
+    }
+    for name, preprocessor in variants.items():
+        result, times = timed(lambda: engine_preprocess(preprocessor, audio), args.repeat)
+        report(name, times, seconds)
+        if name == "engine (peak)":
+            n = min(len(result), len(reference))
+            print(f"{'':<28} length {len(result)} vs {len(reference)}, "
+                  f"max abs diff from pydub {np.abs(result[:n] - reference[:n]).max():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Offline replay benchmark for the live transcription pipeline.
+
+Serves a local audio file as N simulated station streams over HTTP, runs
+a LiveTranscriber per stream with the LLM replaced by fixtures/stub_llm.py,
+and reports real-time factor, per-stage latency percentiles, throughput,
+peak RSS and CPU. Results are written as JSON; pass --baseline with an
+earlier result file to print the change in the headline numbers.
+
+  python benchmarks/replay_bench.py --input test.mp3 --stations 4 --duration 60
+  python benchmarks/replay_bench.py --speed 0 --output fast.json --baseline replay_results.json
+
+--speed 1 paces every stream in real time, as a station would; higher
+values replay faster, and 0 sends audio as fast as the pipeline reads it,
+which measures capacity rather than latency under a realistic load.
+
+Every simulated station streams the same clip, so mirror deduplication
+would collapse them into one pipeline. It is off unless --dedupe is given.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import numpy as np
+from pydub import AudioSegment
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fixtures.stub_llm import serve as serve_stub_llm  # noqa: E402
+
+STAGES = ("preprocess", "transcribe", "analysis", "end_to_end")
+
+
+def encode_stream(path, bitrate):
+    """Re-encodes the input as MP3 so the replayed streams look like real stations."""
+    audio = AudioSegment.from_file(path)
+    buffer = BytesIO()
+    audio.export(buffer, format="mp3", bitrate=bitrate)
+    return buffer.getvalue(), len(audio) / 1000
+
+
+def make_stream_server(data, duration, speed):
+    bytes_per_second = len(data) / duration * speed if speed > 0 else 0
+
+    class StreamHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.end_headers()
+            started, sent = time.time(), 0
+            try:
+                # Loop the clip for as long as the client listens
+                while not self.server.stopping:
+                    for offset in range(0, len(data), 4096):
+                        chunk = data[offset:offset + 4096]
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        if bytes_per_second:
+                            ahead = sent / bytes_per_second - (time.time() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                        if self.server.stopping:
+                            break
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StreamHandler)
+    server.daemon_threads = True
+    server.stopping = False
+    return server
+
+
+class StageRecorder:
+    def __init__(self):
+        self.samples = defaultdict(list)  # stage -> [(seconds, audio_seconds)]
+        self.lock = threading.Lock()
+        self.callbacks = 0
+
+    def observe(self, station_url, stage, seconds, audio_seconds):
+        with self.lock:
+            self.samples[stage].append((seconds, audio_seconds))
+
+    def on_transcription(self, text, analysis):
+        with self.lock:
+            self.callbacks += 1
+
+
+def tree_rss_kb(pid=None):
+    """Resident memory of a process and all its descendants, from /proc."""
+    pid = pid or os.getpid()
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as children:
+                total += sum(tree_rss_kb(int(child)) for child in children.read().split())
+    except OSError:
+        pass
+    return total
+
+
+class ResourceSampler(threading.Thread):
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_tree_rss_kb = 0
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak_tree_rss_kb = max(self.peak_tree_rss_kb, tree_rss_kb())
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean": float(values.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(values.max()),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_for_drain(transcribers, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(not t.audio_queue.qsize() and not t.analysis_queue.qsize() for t in transcribers):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def run(args):
+    stub = serve_stub_llm(port=0, latency=args.llm_latency)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    # Must be set before the pipeline modules read config
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+    import transcriber as live
+    from config import MODEL_SIZE, INFERENCE_BACKEND, SEGMENTATION, VAD_ENABLED, CASCADE_ENABLED, CASCADE_TIERS
+
+    data, clip_seconds = encode_stream(args.input, args.bitrate)
+    streams = make_stream_server(data, clip_seconds, args.speed)
+    threading.Thread(target=streams.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{streams.server_address[1]}/station"
+    if not args.dedupe:
+        # Identical streams would otherwise follow one leader and skip transcription
+        live.fingerprints = None
+
+    if args.warm_up:
+        print("Warming up models...")
+        for scheduler in list(live.schedulers.values()):
+            scheduler.submit("warmup", np.zeros(16000, dtype=np.float32)).result()
+
+    recorder = StageRecorder()
+    sampler = ResourceSampler()
+    sampler.start()
+    cpu_before = os.times()
+    started = time.time()
+
+    transcribers = []
+    for index in range(args.stations):
+        transcriber = live.LiveTranscriber()
+        transcriber.observer = recorder.observe
+        transcriber.callback = recorder.on_transcription
+        transcriber.start_streaming(f"{base_url}/{index}")
+        transcribers.append(transcriber)
+
+    print(f"Replaying {args.input} ({clip_seconds:.1f}s) to {args.stations} station(s) for {args.duration}s")
+    time.sleep(args.duration)
+
+    # Stop feeding audio, then let segments already cut finish
+    streams.stopping = True
+    streams.shutdown()
+    drained = wait_for_drain(transcribers, args.drain)
+    wall = time.time() - started
+    for transcriber in transcribers:
+        transcriber.stop_streaming()
+    cpu_after = os.times()
+    sampler.stop_event.set()
+    stub.shutdown()
+
+    cpu_seconds = sum(cpu_after[:4]) - sum(cpu_before[:4])
+    transcribe = recorder.samples["transcribe"]
+    audio_seconds = sum(audio for _, audio in transcribe)
+    stations = [t.get_stats() for t in transcribers]
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": git_commit(),
+        "config": {
+            "input": os.path.basename(args.input),
+            "stations": args.stations,
+            "duration": args.duration,
+            "speed": args.speed,
+            "llm_latency": args.llm_latency,
+            "model_size": MODEL_SIZE,
+            "inference_backend": INFERENCE_BACKEND,
+            "segmentation": SEGMENTATION,
+            "vad": VAD_ENABLED,
+            "cascade": list(CASCADE_TIERS) if CASCADE_ENABLED else None,
+            "dedupe": live.fingerprints is not None,
+        },
+        "wall_seconds": wall,
+        "drained": drained,
+        "rtf": {
+            # Wall time per second of audio transcribed, across all stations
+            "aggregate": wall / audio_seconds if audio_seconds else None,
+            "per_chunk": percentiles([seconds / audio for seconds, audio in transcribe if audio]),
+        },
+        "throughput": {
+            "segments": len(transcribe),
+            "transcriptions": recorder.callbacks,
+            "audio_seconds": audio_seconds,
+            "audio_seconds_per_second": audio_seconds / wall,
+            "segments_per_second": len(transcribe) / wall,
+        },
+        "stages": {stage: percentiles([seconds for seconds, _ in recorder.samples[stage]]) for stage in STAGES},
+        "resources": {
+            "cpu_seconds": cpu_seconds,
+            "cpu_cores": cpu_seconds / wall,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "peak_tree_rss_mb": sampler.peak_tree_rss_kb / 1024,
+        },
+        "drops": {
+            "audio_queue": sum(s["audio_queue"]["dropped"] for s in stations),
+            "analysis_queue": sum(s["analysis_queue"]["dropped"] for s in stations),
+            "decoded_samples": sum(s["decoded_samples_dropped"] for s in stations),
+            "reconnects": sum(s["reconnects"] for s in stations),
+        },
+        "schedulers": {size: scheduler.get_stats() for size, scheduler in live.schedulers.items()},
+        "cascade": live.cascade.get_stats() if live.cascade else None,
+    }
+
+
+HEADLINE = [
+    ("rtf.aggregate", False),
+    ("rtf.per_chunk.p95", False),
+    ("throughput.audio_seconds_per_second", True),
+    ("stages.transcribe.p95", False),
+    ("stages.end_to_end.p50", False),
+    ("stages.end_to_end.p95", False),
+    ("stages.end_to_end.p99", False),
+    ("resources.cpu_cores", False),
+    ("resources.peak_tree_rss_mb", False),
+]
+
+
+def lookup(results, path):
+    for key in path.split("."):
+        if not isinstance(results, dict):
+            return None
+        results = results.get(key)
+    return results
+
+
+def print_summary(results, baseline=None):
+    for path, higher_is_better in HEADLINE:
+        value = lookup(results, path)
+        line = f"{path:<38} {value:12.4f}" if value is not None else f"{path:<38} {'n/a':>12}"
+        previous = lookup(baseline, path) if baseline else None
+        if value is not None and previous:
+            change = (value - previous) / previous * 100
+            better = change > 0 if higher_is_better else change < 0
+            line += f"   {change:+7.1f}% vs baseline ({'better' if better else 'worse'})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=os.path.join(ROOT, "test.mp3"), help="Audio file to replay")
+    parser.add_argument("--stations", type=int, default=4, help="Concurrent simulated streams")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to stream")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed; 0 sends as fast as possible")
+    parser.add_argument("--drain", type=float, default=30, help="Seconds to wait for in-flight segments")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub LLM response delay")
+    parser.add_argument("--bitrate", default="64k", help="MP3 bitrate of the replayed streams")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Keep mirror deduplication on; the identical streams then share one pipeline")
+    parser.add_argument("--no-warm-up", dest="warm_up", action="store_false", help="Include model load in the run")
+    parser.add_argument("--output", default="replay_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as previous:
+            baseline = json.load(previous)
+    print_summary(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import (
+    CASCADE_MIN_AVG_LOGPROB, CASCADE_MAX_COMPRESSION_RATIO, CASCADE_MAX_NO_SPEECH_PROB,
+    CASCADE_SILENCE_NO_SPEECH_PROB, CASCADE_MIN_WORDS
+)
+from prefilter import DispatchPreFilter
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCascade:
+    """
+    Transcribes each chunk with the cheapest model tier first and only
+    re-runs it on the next, larger tier when the result looks unreliable.
+
+    A result is escalated when Whisper's own segment statistics are poor
+    (low avg_logprob, high compression_ratio, or an uncertain
+    no_speech_prob) or when a transcript of several words contains no
+    dispatch cue at all. Chunks Whisper is confident are silence are not
+    escalated. The last tier's result is always accepted.
+
+    Takes the schedulers for each tier, smallest first, and exposes the
+    same submit()/get_stats() interface as InferenceScheduler.
+    """
+
+    def __init__(self, tiers: List[Tuple[str, object]], prefilter: Optional[DispatchPreFilter] = None,
+                 min_avg_logprob=CASCADE_MIN_AVG_LOGPROB, max_compression_ratio=CASCADE_MAX_COMPRESSION_RATIO,
+                 max_no_speech_prob=CASCADE_MAX_NO_SPEECH_PROB,
+                 silence_no_speech_prob=CASCADE_SILENCE_NO_SPEECH_PROB, min_words=CASCADE_MIN_WORDS):
+        self.tiers = tiers
+        self.prefilter = prefilter or DispatchPreFilter()
+        self.min_avg_logprob = min_avg_logprob
+        self.max_compression_ratio = max_compression_ratio
+        self.max_no_speech_prob = max_no_speech_prob
+        self.silence_no_speech_prob = silence_no_speech_prob
+        self.min_words = min_words
+        self._lock = threading.Lock()
+        self._tier_stats = [{"requests": 0, "escalated": 0, "total_latency": 0.0} for _ in tiers]
+        self._reasons = Counter()
+
+    def submit(self, station, audio, callback: Optional[Callable] = None) -> Future:
+        future = Future()
+        self._submit_tier(0, station, audio, callback, future)
+        return future
+
+    def escalation_reason(self, result: Dict) -> Optional[str]:
+        """Returns why a result should go to the next tier, or None to accept it."""
+        segments = result.get("segments") or []
+        text = result.get("text", "").strip()
+        if not segments or not text:
+            return None
+
+        avg_logprob = _mean(segments, "avg_logprob")
+        no_speech_prob = max(segment.get("no_speech_prob") or 0.0 for segment in segments)
+        compression_ratio = max(segment.get("compression_ratio") or 0.0 for segment in segments)
+
+        if no_speech_prob > self.silence_no_speech_prob and avg_logprob is not None \
+                and avg_logprob < self.min_avg_logprob:
+            # Whisper's own silence rule; a larger model would not help
+            return None
+        if avg_logprob is not None and avg_logprob < self.min_avg_logprob:
+            return "low_avg_logprob"
+        if compression_ratio > self.max_compression_ratio:
+            return "high_compression_ratio"
+        if no_speech_prob > self.max_no_speech_prob:
+            return "uncertain_speech"
+        if len(text.split()) >= self.min_words and self.prefilter.score(text) < self.prefilter.threshold:
+            return "no_dispatch_cue"
+        return None
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            tiers = [dict(stats) for stats in self._tier_stats]
+            reasons = dict(self._reasons)
+        for (model_size, _), stats in zip(self.tiers, tiers):
+            stats["model_size"] = model_size
+            stats["avg_latency"] = stats["total_latency"] / stats["requests"] if stats["requests"] else 0.0
+            stats["escalation_rate"] = stats["escalated"] / stats["requests"] if stats["requests"] else 0.0
+        first = tiers[0]["requests"] if tiers else 0
+        final = tiers[-1]["requests"] if tiers else 0
+        return {
+            "backend": "cascade",
+            "requests": first,
+            "escalation_rate": final / first if first and len(tiers) > 1 else 0.0,
+            "escalation_reasons": reasons,
+            "tiers": tiers,
+            "schedulers": {model_size: scheduler.get_stats() for model_size, scheduler in self.tiers},
+        }
+
+    def _submit_tier(self, index, station, audio, callback, future: Future):
+        model_size, scheduler = self.tiers[index]
+        started = time.time()
+
+        def on_done(tier_future: Future):
+            latency = time.time() - started
+            error = tier_future.exception()
+            result = None if error else tier_future.result()
+            reason = None
+            if result is not None and index + 1 < len(self.tiers):
+                reason = self.escalation_reason(result)
+
+            with self._lock:
+                stats = self._tier_stats[index]
+                stats["requests"] += 1
+                stats["total_latency"] += latency
+                if reason:
+                    stats["escalated"] += 1
+                    self._reasons[reason] += 1
+
+            if error is not None:
+                future.set_exception(error)
+                return
+            if reason:
+                self._submit_tier(index + 1, station, audio, callback, future)
+                return
+
+            result["model_size"] = model_size
+            future.set_result(result)
+            if callback:
+                try:
+                    callback(result)
+                except Exception as e:
+                    logger.warning("Error in inference callback: %s", e)
+
+        try:
+            scheduler.submit(station, audio).add_done_callback(on_done)
+        except Exception as e:
+            future.set_exception(e)
+
+
+def _mean(segments, key) -> Optional[float]:
+    values = [segment[key] for segment in segments if segment.get(key) is not None]
+    return sum(values) / len(values) if values else None
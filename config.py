@@ -1,4 +1,165 @@
 # Configuration settings
-RADIO_BROWSER_API = "https://de2.api.radio-browser.info/json/stations/bytag/"
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RADIO_BROWSER_API = os.getenv("RADIO_BROWSER_API", "https://de2.api.radio-browser.info/json/stations/bytag/")
 DEFAULT_TAG = "police"  # Default country for radio search
-MODEL_SIZE = "base"  # Choose from: tiny, base, small, medium, large
\ No newline at end of file
+MODEL_SIZE = "base"  # Choose from: tiny, base, small, medium, large
+
+# Logging and instrumentation
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # DEBUG, INFO, WARNING, ERROR, or OFF
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"  # Sample thread stacks, served at /debug/profile
+PROFILER_INTERVAL = 0.01  # Seconds between stack samples
+
+# Model registry
+# Sizes a station may request
+MODEL_SIZES = ("tiny", "tiny.en", "base", "base.en", "small", "small.en", "medium", "medium.en", "large", "turbo")
+MODEL_DEVICE = os.getenv("MODEL_DEVICE")  # e.g. "cpu" or "cuda"; unset picks cuda when available
+MODEL_WARMUP = True  # Load MODEL_SIZE in the background at API startup
+MODEL_WARMUP_SECONDS = 1.0  # Length of the silent clip run through the model during warm-up
+
+# Model cascade
+CASCADE_ENABLED = False  # Transcribe with the first tier and escalate only doubtful chunks
+CASCADE_TIERS = ("tiny", MODEL_SIZE)  # Model sizes, smallest first
+CASCADE_MIN_AVG_LOGPROB = -0.8  # Escalate when the mean segment avg_logprob is lower
+CASCADE_MAX_COMPRESSION_RATIO = 2.4  # Escalate repetitive output above this ratio
+CASCADE_MAX_NO_SPEECH_PROB = 0.5  # Escalate when Whisper is this unsure there was speech
+CASCADE_SILENCE_NO_SPEECH_PROB = 0.6  # Above this with a low avg_logprob the chunk is silence; never escalated
+CASCADE_MIN_WORDS = 4  # Transcripts this long without any dispatch cue are escalated
+
+# Station directory lookups
+STATION_CACHE_TTL = 300  # Seconds a tag's station list is served from cache
+STATION_CACHE_STALE_TTL = 3600  # Further seconds a stale list is served while refreshing in the background
+STATION_REQUEST_TIMEOUT = 10  # Seconds per Radio-Browser request
+
+# Shared inference scheduler
+INFERENCE_MAX_BATCH_SIZE = 8  # Maximum chunks decoded together in one Whisper pass
+INFERENCE_MAX_WAIT = 0.5  # Seconds the oldest queued chunk may wait for a batch to fill
+INFERENCE_BACKEND = "batched"  # "batched" runs one in-process model, "process_pool" shards stations across worker processes
+INFERENCE_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)  # Decoding retried at each in turn, as model.transcribe does
+INFERENCE_COMPRESSION_RATIO_THRESHOLD = 2.4  # Re-decode more repetitive output at the next temperature
+INFERENCE_LOGPROB_THRESHOLD = -1.0  # Re-decode output with a lower avg_logprob at the next temperature
+INFERENCE_NO_SPEECH_THRESHOLD = 0.6  # Above this, with a low avg_logprob, the chunk is silence
+
+# Whisper worker processes (INFERENCE_BACKEND = "process_pool")
+WORKER_PROCESSES = 4  # Processes, each loading its own model
+WORKER_THREADS = 2  # Torch threads per worker process
+WORKER_SLOTS = 4  # Shared memory audio slots per worker; submit blocks when all are in use
+WORKER_MAX_AUDIO_SECONDS = 30  # Slot size; longer chunks are pickled instead
+WORKER_MAX_TASK_CRASHES = 2  # Worker crashes tolerated on one chunk before it is failed
+WORKER_MAX_STARTUP_CRASHES = 5  # Crashes in a row before a worker runs any chunk, after which it is given up
+WORKER_RESTART_BACKOFF = 1.0  # Seconds before restarting a worker that crashed at startup, doubled per crash
+WORKER_RESTART_MAX_BACKOFF = 60.0
+WORKER_MAX_BACKGROUND = 1  # Batch job pieces queued per worker at once, so live chunks wait behind at most this many
+
+# Streaming decoder
+DECODER_BUFFER_SECONDS = 60  # Decoded PCM kept per station before the oldest audio is dropped
+
+# Audio preprocessing
+PREPROCESS_NORMALIZATION = "peak"  # "peak", "loudness" or None
+PREPROCESS_TARGET_DBFS = -20.0  # RMS level targeted by loudness normalization
+PREPROCESS_BANDPASS = None  # (low_hz, high_hz) to filter radio audio, e.g. (250, 3800); None disables
+PREPROCESS_BANDPASS_ORDER = 4  # Butterworth filter order
+PREPROCESS_TRIM = True  # Trim leading and trailing silence from files and captures
+PREPROCESS_TRIM_DB = -40.0  # Audio this far below the loudest frame counts as silence
+PREPROCESS_TRIM_PADDING = 0.1  # Seconds kept around trimmed audio
+
+# Voice activity gating
+VAD_ENABLED = True  # Drop chunks without speech before they reach Whisper
+VAD_FRAME_MS = 30  # Analysis frame length in milliseconds
+VAD_ENERGY_THRESHOLD_DB = -45  # Frames quieter than this (dBFS) are silence
+VAD_MAX_ZCR = 0.35  # Frames with a higher zero-crossing rate are treated as hiss
+VAD_MIN_SPEECH_SECONDS = 0.3  # Chunks with less speech than this are dropped
+VAD_PADDING_SECONDS = 0.2  # Silence kept around speech when trimming
+
+# Mirrored stream detection
+DEDUPE_ENABLED = True  # Stations carrying the same audio share one transcription pipeline
+DEDUPE_WINDOW_SECONDS = 30  # Recent audio per station compared when looking for mirrors
+DEDUPE_CHECK_SECONDS = 5  # Seconds of audio between mirror checks
+DEDUPE_MIN_MATCHES = 40  # Fingerprint hashes that must line up at one time offset
+DEDUPE_MIN_MATCH_RATIO = 0.1  # Share of a station's recent hashes that must line up
+
+# Segmentation
+SEGMENTATION = "silence"  # "silence" cuts at gaps between transmissions, "fixed" every chunk_duration
+SEGMENT_MIN_SECONDS = 0.5  # Voiced bursts shorter than this are discarded
+SEGMENT_MAX_SECONDS = 20  # Past this length any pause closes the segment
+SEGMENT_HARD_CAP_SECONDS = 30  # Segments are cut here regardless; keep within Whisper's 30 s window
+SEGMENT_SILENCE_GAP = 0.8  # Silence that ends a transmission, in seconds
+SEGMENT_BLOCK_SECONDS = 0.5  # Decoded audio handed to the segmenter at a time
+
+# Analysis pre-filter and cache
+PREFILTER_THRESHOLD = 1.0  # Transcripts scoring below this are treated as chatter and skip the LLM
+ANALYSIS_CACHE_SIZE = 1024  # Analyses kept for repeated transmissions
+ANALYSIS_CACHE_TTL = 600  # Seconds a cached analysis stays valid
+
+# Incident correlation
+INCIDENT_TTL = 1800  # Seconds without a transmission before an incident is closed
+INCIDENT_MAX_OPEN = 20  # Open incidents tracked per station; the oldest is closed beyond this
+INCIDENT_MAX_TRANSCRIPTS = 8  # Recent transmissions kept per incident for matching and context
+INCIDENT_SIMILARITY = 0.35  # Estimated Jaccard similarity that links a transmission to an incident
+INCIDENT_SHINGLE_SIZE = 4  # Characters per shingle
+INCIDENT_NUM_PERM = 64  # MinHash permutations
+INCIDENT_CONTEXT_TOKENS = 200  # Approximate token budget for context sent with a dispatch
+
+# Dispatch analysis LLM
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")  # Point at a local stub server for testing
+LLM_API_KEY = os.getenv("OPENROUTER_API_KEY")
+LLM_MODEL = "deepseek/deepseek-chat:free"
+LLM_MAX_CONCURRENCY = 4  # Requests in flight across all stations
+LLM_RATE_LIMIT = 2.0  # Requests per second across all stations; 0 disables
+LLM_MAX_RETRIES = 4  # Retries on connection errors, timeouts, 429s and 5xx
+LLM_BACKOFF_BASE = 1.0  # Seconds before the first retry; doubles each attempt
+LLM_BATCH_THRESHOLD = 4  # Pending dispatches before they are packed into one request
+LLM_MAX_BATCH = 4  # Dispatches packed into a single request
+LLM_TIMEOUT = 60  # Seconds per request
+
+# Pipeline runtime
+PIPELINE_AUDIO_QUEUE_SIZE = 8  # Segments waiting for Whisper per station
+PIPELINE_AUDIO_QUEUE_POLICY = "drop_oldest"  # drop_oldest, drop_newest or block when full
+PIPELINE_ANALYSIS_QUEUE_SIZE = 32  # Transcripts waiting for analysis per station
+PIPELINE_ANALYSIS_QUEUE_POLICY = "drop_oldest"
+PIPELINE_STOP_TIMEOUT = 2.0  # Seconds stop waits for stage threads to exit
+STREAM_READ_TIMEOUT = 30  # Seconds without stream data before reconnecting
+RECONNECT_BACKOFF = 1.0  # Seconds before the first reconnect; doubles each failure
+RECONNECT_MAX_BACKOFF = 60.0
+
+# Transcription history
+HISTORY_CAPACITY = 100  # Transcriptions kept in memory per station
+
+# Persistent transcript store
+TRANSCRIPT_DB_PATH = "transcripts.sqlite3"  # SQLite database of every transcription
+TRANSCRIPT_BATCH_SIZE = 200  # Transcriptions written per transaction
+TRANSCRIPT_FLUSH_INTERVAL = 1.0  # Max seconds a transcription waits before being written
+TRANSCRIPT_QUEUE_SIZE = 10000  # Transcriptions waiting to be written before new ones are dropped
+SEARCH_DEFAULT_LIMIT = 50  # Results per search page
+SEARCH_MAX_LIMIT = 500
+
+# Batch ingest jobs
+JOB_DIR = "jobs"  # Job state, checkpoints and uploaded recordings
+JOB_INGEST_DIR = os.getenv("JOB_INGEST_DIR")  # Server directory jobs may read recordings from by path; unset allows uploads only
+JOB_MAX_RUNNING = 1  # Jobs transcribed at the same time
+JOB_MAX_IN_FLIGHT = 16  # Pieces per job waiting on the inference backend
+JOB_PIECE_RETRIES = 2  # Extra attempts for a piece before it is recorded as failed
+JOB_BLOCK_SECONDS = 5  # Audio decoded from the file at a time
+
+# Live transcription feed
+FEED_SUBSCRIBER_QUEUE_SIZE = 100  # Messages buffered per client before new ones are dropped
+FEED_KEEPALIVE_SECONDS = 15  # Idle time before a keepalive is sent
+
+# Geocoding
+GEOCODE_CACHE_PATH = "geocode_cache.sqlite3"  # On-disk geocoding cache
+GEOCODE_MEMORY_CACHE_SIZE = 2048  # Locations kept in memory in front of the disk cache
+GEOCODE_NEGATIVE_TTL = 86400  # Seconds an unresolvable location is remembered
+GEOCODE_MIN_INTERVAL = 1.0  # Seconds between geocoder requests (Nominatim allows 1 per second)
+GEOCODE_USER_AGENT = "triage_transcription"
+
+# Incident persistence
+INCIDENT_BATCH_SIZE = 50  # Incidents per bulk insert
+INCIDENT_FLUSH_INTERVAL = 2.0  # Max seconds an incident waits before being flushed
+INCIDENT_BUFFER_SIZE = 1000  # Incidents held in memory; beyond this they wait in the spool only
+INCIDENT_SPOOL_PATH = "incident_spool.jsonl"  # Durable log of incidents not yet stored
+INCIDENT_SPOOL_COMPACT_ROWS = 10000  # Stored rows logged in the spool before it is rewritten with only pending ones
+INCIDENT_MAX_RETRIES = 5  # Insert attempts per flush before backing off until the next one
+INCIDENT_RETRY_BACKOFF = 1.0  # Base seconds for exponential retry backoff
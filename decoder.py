@@ -0,0 +1,206 @@
+import subprocess
+import threading
+from typing import Iterator, Optional
+
+import numpy as np
+from config import DECODER_BUFFER_SECONDS
+
+SAMPLE_RATE = 16000  # Whisper's expected input rate
+
+
+class DecoderError(Exception):
+    pass
+
+
+class PCMRingBuffer:
+    """
+    Fixed-capacity float32 ring buffer of decoded samples.
+
+    Written by the decoder's reader thread and read by the station's
+    segmenter/decode thread. When that thread falls behind, the oldest
+    samples are overwritten and counted in `dropped`.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.start = 0
+        self.count = 0
+        self.dropped = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def available(self) -> int:
+        with self._cond:
+            return self.count
+
+    def write(self, samples: np.ndarray):
+        with self._cond:
+            n = len(samples)
+            if n >= self.capacity:
+                self.dropped += self.count + n - self.capacity
+                samples = samples[-self.capacity:]
+                n = self.capacity
+                self.start = 0
+                self.count = 0
+            overflow = self.count + n - self.capacity
+            if overflow > 0:
+                self.start = (self.start + overflow) % self.capacity
+                self.count -= overflow
+                self.dropped += overflow
+
+            end = (self.start + self.count) % self.capacity
+            first = min(n, self.capacity - end)
+            self.data[end:end + first] = samples[:first]
+            self.data[:n - first] = samples[first:]
+            self.count += n
+            self._cond.notify_all()
+
+    def read(self, n: int, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Removes and returns exactly n samples, waiting up to timeout seconds
+        for them to arrive. Returns None on timeout or once closed.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.count >= n or self.closed, timeout):
+                return None
+            if self.count < n:
+                return None
+            first = min(n, self.capacity - self.start)
+            out = np.empty(n, dtype=np.float32)
+            out[:first] = self.data[self.start:self.start + first]
+            out[first:] = self.data[:n - first]
+            self.start = (self.start + n) % self.capacity
+            self.count -= n
+            return out
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class StreamDecoder:
+    """
+    Long-lived ffmpeg process that turns a compressed radio stream into
+    continuous 16kHz mono PCM.
+
+    Compressed bytes are fed in as they arrive from the network; ffmpeg
+    handles frame boundaries itself, so bursty or partial chunks never cause
+    decode errors. Decoded audio collects in a ring buffer and is read back
+    in exact sample counts.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, buffer_seconds=DECODER_BUFFER_SECONDS, ring=None):
+        self.sample_rate = sample_rate
+        # A ring passed in outlives this decoder, e.g. across reconnects
+        self._owns_ring = ring is None
+        self.ring = ring if ring is not None else PCMRingBuffer(int(sample_rate * buffer_seconds))
+        self.process = None
+        self.bytes_in = 0
+        self._reader = None
+
+    def start(self):
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-fflags", "nobuffer", "-probesize", "32768", "-analyzeduration", "0",
+            "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(self.sample_rate),
+            "pipe:1",
+        ]
+        try:
+            self.process = subprocess.Popen(
+                cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0
+            )
+        except FileNotFoundError as e:
+            raise DecoderError("ffmpeg was not found on PATH") from e
+
+        self._reader = threading.Thread(target=self._read_pcm, daemon=True)
+        self._reader.start()
+        return self
+
+    def feed(self, data: bytes):
+        """Writes compressed stream bytes to the decoder."""
+        if self.process is None or self.process.poll() is not None:
+            raise DecoderError("decoder process is not running")
+        try:
+            self.process.stdin.write(data)
+        except (BrokenPipeError, ValueError) as e:
+            raise DecoderError("decoder process closed its input") from e
+        self.bytes_in += len(data)
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def available(self) -> int:
+        return self.ring.available
+
+    def read(self, n_samples: int, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        return self.ring.read(n_samples, timeout)
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._reader is not None:
+            self._reader.join(timeout=2)
+        if self._owns_ring:
+            self.ring.close()
+
+    def _read_pcm(self):
+        remainder = b""
+        while True:
+            data = self.process.stdout.read(8192)
+            if not data:
+                break
+            data = remainder + data
+            usable = len(data) - (len(data) % 2)
+            remainder = data[usable:]
+            if usable:
+                pcm = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+                self.ring.write(pcm)
+        if self._owns_ring:
+            self.ring.close()
+
+
+def decode_file(path: str, block_samples: int, sample_rate=SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Decodes an audio file of any length into 16kHz mono float32 blocks of
+    block_samples (the last may be shorter). Unlike StreamDecoder nothing
+    is dropped: ffmpeg only decodes as fast as the blocks are consumed.
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+        "-i", path,
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError as e:
+        raise DecoderError("ffmpeg was not found on PATH") from e
+
+    try:
+        while True:
+            data = process.stdout.read(block_samples * 2)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16).astype(np.float32) / 32768.0
+        if process.wait() != 0:
+            raise DecoderError(f"ffmpeg could not decode {path}: {process.stderr.read().decode(errors='replace').strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
@@ -0,0 +1,110 @@
+import asyncio
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+
+from config import FEED_SUBSCRIBER_QUEUE_SIZE, FEED_KEEPALIVE_SECONDS
+from history import TranscriptHistory
+
+
+class Subscriber:
+    def __init__(self, stations: Iterable[str], queue_size: int):
+        self.stations = set(stations)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+
+class FeedBroker:
+    """
+    Fans new transcriptions out to live WebSocket/SSE clients.
+
+    publish() is called from transcriber threads and only schedules
+    delivery on the API event loop, so it never blocks. Each subscriber has
+    its own bounded queue; when a slow client's queue is full its messages
+    are dropped and counted instead of holding anyone else up. Clients
+    resume after a reconnect by passing the last seq seen per station,
+    which is replayed from the station's TranscriptHistory.
+    """
+
+    def __init__(self, queue_size=FEED_SUBSCRIBER_QUEUE_SIZE, keepalive=FEED_KEEPALIVE_SECONDS):
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[str, Set[Subscriber]] = defaultdict(set)
+        self._stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def publish(self, station_url: str, entry: Dict):
+        """Thread-safe; entry is a history entry including its seq."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._deliver, station_url, entry)
+
+    def subscribe(self, stations: Iterable[str]) -> Subscriber:
+        subscriber = Subscriber(stations, self.queue_size)
+        for station_url in subscriber.stations:
+            self._subscribers[station_url].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        for station_url in subscriber.stations:
+            subscribers = self._subscribers.get(station_url)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[station_url]
+
+    async def stream(self, subscriber: Subscriber, histories: Dict[str, TranscriptHistory],
+                     since: Dict[str, int]) -> AsyncIterator[Optional[Dict]]:
+        """
+        Yields messages for a subscriber: first anything after `since` still
+        in history, then live entries. Yields None when idle for keepalive
+        seconds so callers can ping the connection.
+
+        Seqs are consecutive per station, so a "dropped" notice is sent
+        only when a live entry skips past the last one delivered; live
+        copies of entries already replayed are skipped without one.
+        """
+        cursor = {url: seq for url, seq in since.items() if url in subscriber.stations}
+        for station_url, seq in list(cursor.items()):
+            history = histories.get(station_url)
+            if history is None:
+                continue
+            for entry in history.query(since=seq):
+                cursor[station_url] = entry["seq"]
+                yield self._message(station_url, entry)
+
+        while True:
+            try:
+                station_url, entry = await asyncio.wait_for(subscriber.queue.get(), self.keepalive)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+
+            last = cursor.get(station_url)
+            # Already sent during replay
+            if last is not None and entry["seq"] <= last:
+                continue
+            if last is not None and entry["seq"] > last + 1:
+                yield {"type": "dropped", "station_url": station_url, "count": entry["seq"] - last - 1}
+            cursor[station_url] = entry["seq"]
+            yield self._message(station_url, entry)
+
+    def get_stats(self) -> Dict:
+        subscribers = set().union(*self._subscribers.values()) if self._subscribers else set()
+        return dict(self._stats, subscribers=len(subscribers))
+
+    def _deliver(self, station_url: str, entry: Dict):
+        self._stats["published"] += 1
+        for subscriber in self._subscribers.get(station_url, ()):
+            try:
+                subscriber.queue.put_nowait((station_url, entry))
+                self._stats["delivered"] += 1
+            except asyncio.QueueFull:
+                subscriber.dropped += 1
+                self._stats["dropped"] += 1
+
+    @staticmethod
+    def _message(station_url: str, entry: Dict) -> Dict:
+        return dict(entry, type="transcription", station_url=station_url)
@@ -0,0 +1,180 @@
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from config import DEDUPE_WINDOW_SECONDS, DEDUPE_MIN_MATCHES, DEDUPE_MIN_MATCH_RATIO
+from decoder import SAMPLE_RATE
+
+FFT_SIZE = 1024
+HOP_SIZE = 512
+BAND_EDGES_HZ = (300, 500, 800, 1200, 1800, 2600, 4000)  # One spectral peak per band and frame
+PEAK_DB = 6.0  # A band's peak must stand this far above the frame's mean level
+SILENCE_DB = -50.0  # Frames quieter than this (dBFS) have no peaks
+FAN_OUT = 3  # Later peaks paired with each anchor peak
+TARGET_FRAMES = 32  # How far ahead, in frames, an anchor looks for its pairs
+OFFSET_RESOLUTION = 0.1  # Seconds; matching hashes must agree on the time offset this closely
+
+
+class Fingerprinter:
+    """
+    Streaming spectral-peak fingerprint of one station's audio.
+
+    Each STFT frame contributes its loudest bin in a few voice-band bands,
+    and each peak is paired with the next few peaks after it. A pair
+    hashes to (anchor bin, target bin, frame gap), which survives
+    re-encoding, gain changes and mirrors running seconds behind, since
+    only relative times are hashed. update() takes decoded blocks of any
+    length and returns the hashes completed so far with their anchor
+    times in seconds of this stream's audio.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.window = np.hanning(FFT_SIZE).astype(np.float32)
+        bins = np.fft.rfftfreq(FFT_SIZE, 1 / sample_rate)
+        self.bands = [(int(np.searchsorted(bins, low)), int(np.searchsorted(bins, high)))
+                      for low, high in zip(BAND_EDGES_HZ, BAND_EDGES_HZ[1:])]
+        self.low_bin, self.high_bin = self.bands[0][0], self.bands[-1][1]
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._frame = 0  # Index of the next STFT frame
+        self._peaks = np.zeros((0, 2), dtype=np.int64)  # (frame, bin) not yet used as anchors
+
+    @property
+    def seconds(self) -> float:
+        return self._frame * HOP_SIZE / self.sample_rate
+
+    def update(self, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        samples = np.concatenate([self._pending, samples]) if len(self._pending) else np.ascontiguousarray(samples)
+        n_frames = max(0, (len(samples) - FFT_SIZE) // HOP_SIZE + 1)
+        self._pending = samples[n_frames * HOP_SIZE:]
+        if n_frames:
+            frames = np.lib.stride_tricks.as_strided(
+                samples, (n_frames, FFT_SIZE), (samples.strides[0] * HOP_SIZE, samples.strides[0]), writeable=False
+            )
+            self._peaks = np.concatenate([self._peaks, self._find_peaks(frames)])
+            self._frame += n_frames
+        return self._pair()
+
+    def _find_peaks(self, frames: np.ndarray) -> np.ndarray:
+        spectrum = np.abs(np.fft.rfft(frames * self.window, axis=1)[:, self.low_bin:self.high_bin])
+        level = 20 * np.log10(spectrum + 1e-10)
+        loud = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-12) > SILENCE_DB
+        mean = level.mean(axis=1)
+
+        peaks = []
+        for low, high in self.bands:
+            band = level[:, low - self.low_bin:high - self.low_bin]
+            best = band.argmax(axis=1)
+            keep = loud & (band[np.arange(len(band)), best] > mean + PEAK_DB)
+            rows = np.flatnonzero(keep)
+            peaks.append(np.column_stack([rows + self._frame, best[rows] + low]))
+        peaks = np.concatenate(peaks)
+        return peaks[np.argsort(peaks[:, 0], kind="stable")]
+
+    def _pair(self) -> Tuple[np.ndarray, np.ndarray]:
+        peaks = self._peaks
+        # Anchors whose whole target zone has been seen
+        ready = int(np.searchsorted(peaks[:, 0], self._frame - TARGET_FRAMES, side="left"))
+        if ready == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+        frames = peaks[:, 0]
+        starts = np.searchsorted(frames, frames[:ready] + 1, side="left")
+        ends = np.minimum(np.searchsorted(frames, frames[:ready] + TARGET_FRAMES, side="right"), starts + FAN_OUT)
+        anchors = np.repeat(np.arange(ready), ends - starts)
+        targets = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)]) \
+            if len(anchors) else np.zeros(0, dtype=np.int64)
+        self._peaks = peaks[ready:]
+
+        gap = frames[targets] - frames[anchors]
+        hashes = (peaks[anchors, 1] << 16) | (peaks[targets, 1] << 6) | gap
+        return hashes, frames[anchors] * HOP_SIZE / self.sample_rate
+
+
+class FingerprintIndex:
+    """
+    Recent fingerprint hashes of every station, for spotting mirrors.
+
+    Two stations are mirrors when at least min_matches of one's hashes
+    from the last window seconds appear in the other's at a single,
+    consistent time offset, and those make up at least min_ratio of its
+    hashes. Requiring one offset rules out chance hash collisions between
+    different audio.
+    """
+
+    def __init__(self, window=DEDUPE_WINDOW_SECONDS, min_matches=DEDUPE_MIN_MATCHES,
+                 min_ratio=DEDUPE_MIN_MATCH_RATIO):
+        self.window = window
+        self.min_matches = min_matches
+        self.min_ratio = min_ratio
+        self._streams: Dict[str, deque] = {}  # station -> deque of (hashes, times) blocks
+        self._lock = threading.Lock()
+        self._stats = {"comparisons": 0, "mirrors_found": 0}
+
+    def add(self, station_url: str, hashes: np.ndarray, times: np.ndarray):
+        with self._lock:
+            blocks = self._streams.setdefault(station_url, deque())
+            if len(hashes):
+                blocks.append((hashes, times))
+            while blocks and blocks[-1][1][-1] - blocks[0][1][-1] > self.window:
+                blocks.popleft()
+
+    def remove(self, station_url: str):
+        with self._lock:
+            self._streams.pop(station_url, None)
+
+    def hash_count(self, station_url: str) -> int:
+        with self._lock:
+            return sum(len(hashes) for hashes, _ in self._streams.get(station_url, ()))
+
+    def compare(self, station_url: str, other_url: str) -> Tuple[int, float]:
+        """Returns (matches, ratio): station hashes found in the other at the best offset, and their share."""
+        own, other = self._window(station_url), self._window(other_url)
+        with self._lock:
+            self._stats["comparisons"] += 1
+        if own is None or other is None:
+            return 0, 0.0
+        own_hashes, own_times = own
+        other_hashes, other_times = other
+        order = np.argsort(other_hashes, kind="stable")
+        sorted_hashes = other_hashes[order]
+        positions = np.minimum(np.searchsorted(sorted_hashes, own_hashes), len(sorted_hashes) - 1)
+        found = sorted_hashes[positions] == own_hashes
+        if not found.any():
+            return 0, 0.0
+        offsets = np.round((own_times[found] - other_times[order[positions[found]]]) / OFFSET_RESOLUTION).astype(np.int64)
+        counts = np.bincount(offsets - offsets.min())
+        # Neighboring bins together, so an offset on a bin edge is not split in two
+        best = int((counts[:-1] + counts[1:]).max()) if len(counts) > 1 else int(counts[0])
+        return best, best / len(own_hashes)
+
+    def is_mirror(self, station_url: str, other_url: str) -> bool:
+        matches, ratio = self.compare(station_url, other_url)
+        return matches >= self.min_matches and ratio >= self.min_ratio
+
+    def find_mirror(self, station_url: str, candidates: Iterable[str]) -> Optional[str]:
+        """The candidate station carrying the same audio as station_url, if any."""
+        best, best_matches = None, 0
+        for other_url in candidates:
+            matches, ratio = self.compare(station_url, other_url)
+            if matches >= self.min_matches and ratio >= self.min_ratio and matches > best_matches:
+                best, best_matches = other_url, matches
+        if best is not None:
+            with self._lock:
+                self._stats["mirrors_found"] += 1
+        return best
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["stations"] = len(self._streams)
+        return stats
+
+    def _window(self, station_url: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            blocks = list(self._streams.get(station_url, ()))
+        if not blocks:
+            return None
+        return np.concatenate([hashes for hashes, _ in blocks]), np.concatenate([times for _, times in blocks])
@@ -0,0 +1,70 @@
+"""
+Local stand-in for the Radio-Browser station directory.
+
+Serves /json/stations/bytag/<tag> with generated stations and counts
+upstream hits, so station caching can be exercised offline.
+
+  python fixtures/radio_browser.py --port 8002 --latency 0.5
+  RADIO_BROWSER_API=http://127.0.0.1:8002/json/stations/bytag/ uvicorn app:app
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+PREFIX = "/json/stations/bytag/"
+
+
+class RadioBrowserHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    hits = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if not parsed.path.startswith(PREFIX):
+            self._send(404, {"error": "not found"})
+            return
+
+        tag = unquote(parsed.path[len(PREFIX):])
+        limit = int(parse_qs(parsed.query).get("limit", ["15"])[0])
+        with self.lock:
+            self.hits[tag] = self.hits.get(tag, 0) + 1
+        time.sleep(self.latency)
+
+        self._send(200, [{
+            "name": f"{tag.title()} Scanner {i}",
+            "url": f"http://127.0.0.1:{self.server.server_port}/stream/{tag}/{i}",
+            "url_resolved": f"http://127.0.0.1:{self.server.server_port}/stream/{tag}/{i}",
+            "tags": tag,
+        } for i in range(limit)])
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8002, latency=0.0, host="127.0.0.1"):
+    """Starts the fixture server and returns it; its handler's `hits` counts requests per tag."""
+    handler = type("ConfiguredRadioBrowserHandler", (RadioBrowserHandler,), {"latency": latency, "hits": {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.handler = handler
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    args = parser.parse_args()
+    print(f"Radio-Browser fixture listening on http://127.0.0.1:{args.port}{PREFIX}")
+    serve(args.port, args.latency).serve_forever()
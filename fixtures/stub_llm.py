@@ -0,0 +1,105 @@
+"""
+Local stand-in for the OpenAI-compatible chat completions API.
+
+Answers dispatch analysis prompts (single or batched) with canned analyses
+so the analysis service can be exercised without network access or quota.
+
+  python fixtures/stub_llm.py --port 8001 --latency 0.5 --error-rate 0.1
+  LLM_BASE_URL=http://127.0.0.1:8001/v1 uvicorn app:app
+"""
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+KEYWORDS = ("fire", "crash", "accident", "shooting", "medical", "injury", "assault", "explosion", "rescue")
+
+
+def analyze(message):
+    lowered = message.lower()
+    keyword = next((k for k in KEYWORDS if k in lowered), None)
+    if keyword is None:
+        return "NOT_EMERGENCY"
+    return f"""Type: {keyword.title()} incident
+Location: Unknown
+Severity: Medium
+Units Responding: Unknown
+Description: Reported {keyword} emergency: {message.strip()[:200]}
+Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}
+
+Debug Info:
+- Confidence: Medium
+- Reasoning: Stub response matched keyword '{keyword}'"""
+
+
+def answer(prompt):
+    blocks = re.split(r"^### Dispatch (\d+)$", prompt, flags=re.MULTILINE)
+    if len(blocks) > 1:
+        sections = []
+        for number, body in zip(blocks[1::2], blocks[2::2]):
+            message = body.split("Current message:", 1)[-1].split("Format each answer", 1)[0]
+            sections.append(f"### Dispatch {number}\n{analyze(message)}")
+        return "\n\n".join(sections)
+    message = prompt.split("Current message:", 1)[-1].split("Format the response", 1)[0]
+    return analyze(message)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.latency)
+
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+        if random.random() < self.error_rate:
+            self._send(429, {"error": {"message": "rate limited", "type": "rate_limit_exceeded"}})
+            return
+
+        prompt = body["messages"][-1]["content"]
+        content = answer(prompt)
+        self._send(200, {
+            "id": f"stub-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                      "total_tokens": len(prompt.split()) + len(content.split())},
+        })
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8001, latency=0.0, error_rate=0.0, host="127.0.0.1"):
+    """Starts the stub server and returns it; call serve_forever() or run it in a thread."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"latency": latency, "error_rate": error_rate})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    args = parser.parse_args()
+    print(f"Stub LLM listening on http://127.0.0.1:{args.port}/v1")
+    serve(args.port, args.latency, args.error_rate).serve_forever()
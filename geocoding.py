@@ -0,0 +1,249 @@
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from geopy.exc import GeocoderServiceError
+from geopy.geocoders import Nominatim
+from config import (
+    GEOCODE_CACHE_PATH, GEOCODE_MEMORY_CACHE_SIZE, GEOCODE_NEGATIVE_TTL,
+    GEOCODE_MIN_INTERVAL, GEOCODE_USER_AGENT
+)
+
+logger = logging.getLogger(__name__)
+
+Coordinates = Tuple[Optional[float], Optional[float]]
+
+STREET_SUFFIXES = {
+    "street": "st", "avenue": "ave", "av": "ave", "road": "rd", "boulevard": "blvd",
+    "drive": "dr", "lane": "ln", "court": "ct", "place": "pl", "highway": "hwy",
+    "parkway": "pkwy", "terrace": "ter", "circle": "cir", "north": "n", "south": "s",
+    "east": "e", "west": "w",
+}
+UNKNOWN_LOCATIONS = {"", "unknown", "n/a", "na", "none", "not specified", "unspecified"}
+
+
+def normalize_address(location: str) -> str:
+    """
+    Builds the cache key for a location: lowercased, punctuation stripped,
+    street suffixes abbreviated, and intersection parts sorted so
+    "5th Ave & Main Street" and "main st and 5th avenue" share a key.
+    Returns "" for placeholders such as "Unknown".
+    """
+    text = re.sub(r"\s*(&|/|@|\bat\b)\s*", " and ", location.lower())
+    text = re.sub(r"[^a-z0-9 ]+", " ", text)
+    words = [STREET_SUFFIXES.get(word, word) for word in text.split()]
+    text = " ".join(words)
+    if text in UNKNOWN_LOCATIONS:
+        return ""
+    parts = [part.strip() for part in text.split(" and ") if part.strip()]
+    return " and ".join(sorted(parts))
+
+
+class StaticGeocoder:
+    """
+    Offline stand-in for a geopy geocoder, answering from a fixed mapping of
+    address -> (latitude, longitude). Keys are normalized like cache keys.
+    """
+
+    class Location:
+        def __init__(self, latitude, longitude):
+            self.latitude = latitude
+            self.longitude = longitude
+
+    def __init__(self, locations: Dict[str, Tuple[float, float]]):
+        self.locations = {normalize_address(address): coords for address, coords in locations.items()}
+        self.calls = 0
+
+    def geocode(self, query: str):
+        self.calls += 1
+        coords = self.locations.get(normalize_address(query))
+        return self.Location(*coords) if coords else None
+
+
+class GeocodeCache:
+    """
+    In-memory LRU in front of an SQLite table of geocoding results.
+
+    Found coordinates are kept indefinitely; misses are cached for
+    negative_ttl seconds so unresolvable locations are not retried on
+    every incident.
+    """
+
+    def __init__(self, path=GEOCODE_CACHE_PATH, memory_size=GEOCODE_MEMORY_CACHE_SIZE,
+                 negative_ttl=GEOCODE_NEGATIVE_TTL):
+        self.memory_size = memory_size
+        self.negative_ttl = negative_ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS geocodes ("
+            "key TEXT PRIMARY KEY, latitude REAL, longitude REAL, found INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Tuple[bool, Coordinates]:
+        """Returns (hit, (latitude, longitude)); a cached miss is (True, (None, None))."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                source = "memory_hits"
+            else:
+                row = self._db.execute(
+                    "SELECT latitude, longitude, found, updated_at FROM geocodes WHERE key = ?", (key,)
+                ).fetchone()
+                entry = (row[0], row[1], bool(row[2]), row[3]) if row else None
+                source = "disk_hits"
+
+            if entry is not None and not entry[2] and time.time() - entry[3] > self.negative_ttl:
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, (None, None)
+
+            self._stats[source] += 1
+            self._remember(key, entry)
+            return True, (entry[0], entry[1])
+
+    def put(self, key: str, coords: Coordinates):
+        found = coords[0] is not None
+        entry = (coords[0], coords[1], found, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocodes (key, latitude, longitude, found, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (key, entry[0], entry[1], int(found), entry[3])
+            )
+            self._db.commit()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, memory_size=len(self._memory))
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+
+class GeocodeResolver:
+    """
+    Resolves incident locations to coordinates through the cache and a
+    single rate-limited background worker.
+
+    resolve_async() answers from cache immediately when it can; otherwise
+    the lookup is queued and the callback runs on the worker thread once
+    the geocoder answers. Requests for a location already queued share
+    one lookup. The geocoder is pluggable (any object with a geopy-style
+    geocode(query) method) and defaults to Nominatim.
+    """
+
+    def __init__(self, geocoder=None, cache: Optional[GeocodeCache] = None, min_interval=GEOCODE_MIN_INTERVAL):
+        self.geocoder = geocoder
+        self.cache = cache if cache is not None else GeocodeCache()
+        self.min_interval = min_interval
+        self._queue = queue.Queue()
+        self._waiting: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_request = 0.0
+        self._stats = {"lookups": 0, "errors": 0}
+
+    def lookup_cached(self, location: str) -> Tuple[bool, Coordinates]:
+        key = normalize_address(location)
+        if not key:
+            return True, (None, None)
+        return self.cache.get(key)
+
+    def resolve_async(self, location: str, callback: Callable[[Optional[float], Optional[float]], None]):
+        key = normalize_address(location)
+        if not key:
+            callback(None, None)
+            return
+        hit, coords = self.cache.get(key)
+        if hit:
+            callback(*coords)
+            return
+
+        with self._lock:
+            if key in self._waiting:
+                self._waiting[key].append(callback)
+                return
+            self._waiting[key] = [callback]
+        self._ensure_running()
+        self._queue.put((key, location))
+
+    def resolve(self, location: str, timeout: Optional[float] = None) -> Coordinates:
+        """Blocking variant of resolve_async; returns (None, None) on timeout or failure."""
+        done = threading.Event()
+        result = [(None, None)]
+
+        def on_resolved(latitude, longitude):
+            result[0] = (latitude, longitude)
+            done.set()
+
+        self.resolve_async(location, on_resolved)
+        done.wait(timeout)
+        return result[0]
+
+    def get_stats(self) -> Dict:
+        return dict(self._stats, pending=self._queue.qsize(), cache=self.cache.get_stats())
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        if self.geocoder is None:
+            self.geocoder = Nominatim(user_agent=GEOCODE_USER_AGENT)
+
+        while True:
+            key, location = self._queue.get()
+            coords = (None, None)
+            try:
+                coords = self._lookup(key, location)
+            except Exception as e:
+                # Anything unexpected fails this location only; the worker keeps going
+                logger.exception("Unexpected geocoding error for location '%s': %s", location, e)
+                self._stats["errors"] += 1
+            finally:
+                with self._lock:
+                    callbacks = self._waiting.pop(key, [])
+                for callback in callbacks:
+                    try:
+                        callback(*coords)
+                    except Exception as e:
+                        logger.warning("Error in geocoding callback: %s", e)
+
+    def _lookup(self, key: str, location: str) -> Coordinates:
+        hit, coords = self.cache.get(key)
+        if hit:
+            return coords
+
+        wait = self._last_request + self.min_interval - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request = time.time()
+        self._stats["lookups"] += 1
+
+        try:
+            location_data = self.geocoder.geocode(location)
+        except GeocoderServiceError as e:
+            # Transient failures are not cached
+            logger.warning("Geocoding error for location '%s': %s", location, e)
+            self._stats["errors"] += 1
+            return None, None
+
+        coords = (location_data.latitude, location_data.longitude) if location_data else (None, None)
+        self.cache.put(key, coords)
+        return coords
@@ -0,0 +1,112 @@
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import HISTORY_CAPACITY
+
+
+class TranscriptHistory:
+    """
+    Fixed-capacity ring buffer of transcription entries for one station.
+
+    Every entry gets a monotonically increasing sequence number, so clients
+    can poll with `since` and receive only what is new. Appends are O(1)
+    and overwrite the oldest entry once full. Queries locate their range by
+    sequence arithmetic and binary search over timestamps, and only copy
+    references to the entries they return.
+    """
+
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        self.capacity = capacity
+        self._entries: List[Optional[Dict]] = [None] * capacity
+        self._times = [0.0] * capacity
+        self._next_seq = 1
+        self._first_seq = 1  # No entries before this seq, e.g. after a restore
+        self._lock = threading.Lock()
+
+    def append(self, text: str, analysis: Dict, timestamp: Optional[datetime] = None) -> Dict:
+        """Stores a transcription and returns the entry, including its seq."""
+        timestamp = timestamp or datetime.now()
+        with self._lock:
+            entry = {
+                "seq": self._next_seq,
+                "text": text,
+                "analysis": analysis,
+                "timestamp": timestamp.isoformat()
+            }
+            slot = (self._next_seq - 1) % self.capacity
+            self._entries[slot] = entry
+            self._times[slot] = timestamp.timestamp()
+            self._next_seq += 1
+        return entry
+
+    def restore(self, entries: List[Dict]):
+        """
+        Reloads persisted entries, oldest first, keeping their seq numbers so
+        client cursors stay valid. Only the newest run of consecutive seqs is
+        kept, since entries the store dropped would leave holes in the buffer.
+        """
+        entries = entries[-self.capacity:]
+        for i in range(len(entries) - 1, 0, -1):
+            if entries[i]["seq"] != entries[i - 1]["seq"] + 1:
+                entries = entries[i:]
+                break
+        if not entries:
+            return
+        with self._lock:
+            for entry in entries:
+                slot = (entry["seq"] - 1) % self.capacity
+                self._entries[slot] = entry
+                self._times[slot] = datetime.fromisoformat(entry["timestamp"]).timestamp()
+            self._first_seq = entries[0]["seq"]
+            self._next_seq = entries[-1]["seq"] + 1
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest entry, 0 if empty."""
+        with self._lock:
+            return self._next_seq - 1
+
+    def __len__(self):
+        with self._lock:
+            return min(self._next_seq - self._first_seq, self.capacity)
+
+    def latest(self, n: int) -> List[Dict]:
+        return self.query(limit=n)
+
+    def query(self, since: Optional[int] = None, limit: Optional[int] = None,
+              start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict]:
+        """
+        Returns entries oldest first.
+
+        since: only entries with seq greater than this; with limit, the
+               oldest `limit` of them, so a client can page forward.
+        limit: without since, the newest `limit` entries.
+        start/end: inclusive timestamp bounds.
+        """
+        with self._lock:
+            lo = max(self._first_seq, self._next_seq - self.capacity)
+            hi = self._next_seq
+            if since is not None:
+                lo = max(lo, since + 1)
+            if start is not None:
+                lo = self._first_seq_at_or_after(lo, hi, start.timestamp(), inclusive=True)
+            if end is not None:
+                hi = self._first_seq_at_or_after(lo, hi, end.timestamp(), inclusive=False)
+            if limit is not None and hi - lo > limit:
+                if since is not None:
+                    hi = lo + limit
+                else:
+                    lo = hi - limit
+            return [self._entries[(seq - 1) % self.capacity] for seq in range(lo, hi)]
+
+    def _first_seq_at_or_after(self, lo: int, hi: int, t: float, inclusive: bool) -> int:
+        # Entries are appended in time order, so timestamps are sorted by seq
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_time = self._times[(mid - 1) % self.capacity]
+            if mid_time < t or (not inclusive and mid_time == t):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
@@ -0,0 +1,314 @@
+import copy
+import itertools
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    INCIDENT_TTL, INCIDENT_MAX_OPEN, INCIDENT_MAX_TRANSCRIPTS, INCIDENT_SIMILARITY, INCIDENT_SHINGLE_SIZE,
+    INCIDENT_NUM_PERM, INCIDENT_CONTEXT_TOKENS
+)
+from prefilter import EMERGENCY_KEYWORDS, normalize_transcript
+
+# Apparatus and unit call signs, e.g. "engine 5", "medic 12", "unit 4a"
+UNIT_PATTERN = re.compile(
+    r"\b(engine|ladder|truck|tower|medic|ambulance|rescue|squad|battalion|brush|tanker|"
+    r"unit|car|adam|david|charlie|ems)\s*-?\s*(\d{1,4}[a-z]?)\b"
+)
+STREET_SUFFIXES = {
+    "street": "st", "avenue": "ave", "road": "rd", "boulevard": "blvd", "drive": "dr", "lane": "ln",
+    "court": "ct", "place": "pl", "highway": "hwy",
+}
+ADDRESS_PATTERN = re.compile(
+    r"\b(\d{1,5})\s+((?:[a-z]+\s+){0,2}?)(" + "|".join(list(STREET_SUFFIXES) + list(STREET_SUFFIXES.values())) + r"|way)\b"
+)
+# Words describing what happened; a unit transmission without any is only a status update
+DETAIL_PATTERN = re.compile(
+    r"\b(" + "|".join(EMERGENCY_KEYWORDS) + r"|smoke|flames|victim|patient|suspect|injur\w*|shots?|weapon|"
+    r"unconscious|breathing|bleeding|overdose|collision|rollover|structure|alarm|gas|hazmat)"
+)
+
+_MERSENNE = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+
+
+def units_in(text: str) -> List[str]:
+    return list(dict.fromkeys(f"{kind} {number}" for kind, number in UNIT_PATTERN.findall(normalize_transcript(text))))
+
+
+def addresses_in(text: str) -> List[str]:
+    """Street addresses with the suffix abbreviated, so "12 Main Street" and "12 main st" compare equal."""
+    return [f"{number} {street}{STREET_SUFFIXES.get(suffix, suffix)}"
+            for number, street, suffix in ADDRESS_PATTERN.findall(normalize_transcript(text))]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) used for context budgets."""
+    return len(text) // 4 + 1
+
+
+class Incident:
+    def __init__(self, incident_id: int, station_url: str, analysis: Dict, provisional=False):
+        self.id = incident_id
+        self.station_url = station_url
+        self.analysis = analysis
+        self.provisional = provisional  # Opened by a transcript whose analysis is not back yet
+        self.units: Dict[str, None] = {}  # Ordered set
+        self.addresses = set()
+        self.transcripts = deque(maxlen=INCIDENT_MAX_TRANSCRIPTS)
+        self.signatures = deque(maxlen=INCIDENT_MAX_TRANSCRIPTS)
+        self.opened_at = self.updated_at = time.time()
+        self.updates = 0
+
+    def summary(self) -> str:
+        analysis = self.analysis or {}
+        line = f"Incident #{self.id}: {analysis.get('Type', 'Unknown')} at {analysis.get('Location', 'unknown location')}"
+        if analysis.get("Severity"):
+            line += f", severity {analysis['Severity']}"
+        if self.units:
+            line += f"; units: {', '.join(unit.title() for unit in self.units)}"
+        return line
+
+
+class IncidentMatch:
+    """
+    The incident a transcript was added to, and whether it only reports
+    units. opened is True when the transcript matched nothing and opened a
+    provisional incident of its own.
+    """
+
+    __slots__ = ("incident", "signature", "units", "addresses", "unit_update", "score", "opened", "earlier")
+
+    def __init__(self, incident, signature, units, addresses, unit_update, score, opened, earlier):
+        self.incident = incident
+        self.signature = signature
+        self.units = units
+        self.addresses = addresses
+        self.unit_update = unit_update
+        self.score = score
+        self.opened = opened
+        self.earlier = earlier  # The incident's transcripts before this one
+
+
+class IncidentTracker:
+    """
+    Groups each station's transmissions into open incidents.
+
+    A new transcript joins an open incident on the same station when it
+    names one of the incident's addresses or units, or when its MinHash
+    signature (over character shingles, which tolerate transcription
+    errors) is similar enough to one of the incident's recent
+    transmissions. Each station keeps at most max_open incidents, and an
+    incident closes after ttl seconds without a transmission.
+
+    match() adds the transcript to its incident straight away, so a
+    station's transmissions are matched in the order they were spoken even
+    while earlier ones still wait on the LLM. A transcript matching nothing
+    opens a provisional incident, which record() confirms once an analysis
+    finds an emergency, or discards if its own transcript was chatter.
+    Provisional incidents are matched against but not listed.
+
+    The tracker gives the LLM a short, token-budgeted summary of the
+    matched incident (or of the station's open incidents) as context.
+    Transmissions that only add units to a known incident are answered
+    locally by update_analysis() without an LLM call.
+    """
+
+    def __init__(self, ttl=INCIDENT_TTL, max_open=INCIDENT_MAX_OPEN, similarity=INCIDENT_SIMILARITY,
+                 shingle_size=INCIDENT_SHINGLE_SIZE, num_perm=INCIDENT_NUM_PERM, context_tokens=INCIDENT_CONTEXT_TOKENS):
+        self.ttl = ttl
+        self.max_open = max_open
+        self.similarity = similarity
+        self.shingle_size = shingle_size
+        self.context_tokens = context_tokens
+        # Random (a * x + b) mod p hash functions, one per permutation
+        self._a = _rng.integers(1, _MERSENNE, num_perm, dtype=np.uint64)
+        self._b = _rng.integers(0, _MERSENNE, num_perm, dtype=np.uint64)
+        self._incidents: Dict[str, OrderedDict] = {}  # station -> incident id -> Incident, oldest first
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stats = {"transcripts": 0, "linked": 0, "unit_updates": 0, "opened": 0, "closed": 0}
+
+    def signature(self, text: str) -> np.ndarray:
+        normalized = normalize_transcript(text)
+        k = self.shingle_size
+        shingles = {normalized[i:i + k] for i in range(max(1, len(normalized) - k + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # Both factors are below 2**32, so the products fit in uint64
+        return ((np.outer(hashes, self._a) + self._b) % _MERSENNE).min(axis=0)
+
+    def match(self, station_url: str, text: str) -> IncidentMatch:
+        signature = self.signature(text)
+        units = units_in(text)
+        addresses = addresses_in(text)
+        remainder = UNIT_PATTERN.sub(" ", normalize_transcript(text))
+        # Units without any address or incident detail only report who is responding
+        unit_only = bool(units) and not addresses and not DETAIL_PATTERN.search(remainder)
+
+        best, best_score = None, 0.0
+        with self._lock:
+            self._stats["transcripts"] += 1
+            open_incidents = self._open(station_url)
+            for incident in reversed(open_incidents.values()):
+                if incident.addresses.intersection(addresses):
+                    score = 1.0
+                else:
+                    score = float((np.stack(incident.signatures) == signature).mean(axis=1).max()) \
+                        if incident.signatures else 0.0
+                    if unit_only and any(unit in incident.units for unit in units):
+                        score = max(score, self.similarity)
+                if score > best_score:
+                    best, best_score = incident, score
+            if best_score < self.similarity:
+                best = None
+                if unit_only and open_incidents:
+                    # A bare status update most likely concerns the latest incident
+                    best = next(reversed(open_incidents.values()))
+            opened = best is None
+            if opened:
+                best = Incident(next(self._ids), station_url, None, provisional=True)
+                open_incidents[best.id] = best
+            else:
+                self._stats["linked"] += 1
+                open_incidents.move_to_end(best.id)
+            # Added now, so the next transmission can match this one before its analysis is back
+            earlier = list(best.transcripts)
+            best.transcripts.append(text)
+            best.signatures.append(signature)
+            best.units.update(dict.fromkeys(units))
+            best.addresses.update(addresses)
+            best.updated_at = time.time()
+        return IncidentMatch(best, signature, units, addresses, unit_only and not opened, best_score, opened, earlier)
+
+    def context(self, station_url: str, match: Optional[IncidentMatch] = None) -> str:
+        """Compact LLM context: the matched incident, or the station's open incidents, within the token budget."""
+        with self._lock:
+            if match is not None and not match.opened:
+                incident = match.incident
+                summaries = [incident.summary()] if incident.analysis is not None else []
+                earlier = match.earlier
+            else:
+                summaries, earlier = [incident.summary() for incident in reversed(self._listed(station_url))], []
+        budget = self.context_tokens
+        lines = []
+        for line in summaries:
+            budget -= estimate_tokens(line)
+            if budget < 0:
+                return "\n".join(lines)
+            lines.append(line)
+        # Newest transmissions first until the budget runs out, then back in spoken order
+        transmissions = []
+        for text in reversed(earlier):
+            budget -= estimate_tokens(text)
+            if budget < 0:
+                break
+            transmissions.append(f"- {text}")
+        if transmissions:
+            lines.append("Earlier transmissions:")
+            lines.extend(reversed(transmissions))
+        return "\n".join(lines)
+
+    def update_analysis(self, match: IncidentMatch) -> Optional[Dict]:
+        """The incident's analysis with the transcript's units added, for a unit-only update; None otherwise."""
+        if not match.unit_update or match.incident.analysis is None:
+            return None
+        with self._lock:
+            analysis = copy.deepcopy(match.incident.analysis)
+            known = set(units_in(analysis.get("Units Responding", "")))
+            new = [unit for unit in match.units if unit not in known]
+            if new:
+                existing = analysis.get("Units Responding", "").strip()
+                added = ", ".join(unit.title() for unit in new)
+                analysis["Units Responding"] = f"{existing}, {added}" if existing else added
+            self._stats["unit_updates"] += 1
+        analysis["Timestamp"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        analysis["Incident"] = match.incident.id
+        analysis["Debug"] = dict(analysis.get("Debug") or {}, ValidationStatus=f"Unit update to incident {match.incident.id}")
+        return analysis
+
+    def record(self, station_url: str, text: str, analysis: Optional[Dict], match: IncidentMatch) -> Optional[int]:
+        """
+        Applies a transcript's analysis to the incident match() added it to,
+        confirming a provisional incident when the analysis found an
+        emergency. Call once per match, in the order of the matches. Sets
+        analysis["Incident"] and returns the incident id, or None for
+        chatter outside any incident.
+        """
+        incident = match.incident
+        with self._lock:
+            open_incidents = self._open(station_url)
+            if incident.id not in open_incidents:
+                # Closed while the transcript was being analyzed
+                if analysis is None:
+                    return None
+                incident = Incident(next(self._ids), station_url, None, provisional=True)
+                incident.transcripts.append(text)
+                incident.signatures.append(match.signature)
+                incident.units.update(dict.fromkeys(match.units))
+                incident.addresses.update(match.addresses)
+                open_incidents[incident.id] = incident
+            elif analysis is None and incident.provisional and match.opened:
+                # Opened by chatter; transcripts that joined it open their own if they turn out to matter
+                del open_incidents[incident.id]
+                return None
+            open_incidents.move_to_end(incident.id)
+            if analysis is not None:
+                incident.analysis = {key: value for key, value in analysis.items() if key != "Debug"}
+                incident.addresses.update(addresses_in(analysis.get("Location", "")))
+                incident.units.update(dict.fromkeys(units_in(analysis.get("Units Responding", ""))))
+                if incident.provisional:
+                    incident.provisional = False
+                    self._stats["opened"] += 1
+                    self._evict(open_incidents)
+            incident.updated_at = time.time()
+            incident.updates += 1
+        if analysis is not None:
+            analysis["Incident"] = incident.id
+        return None if incident.provisional else incident.id
+
+    def open_incidents(self, station_url: str) -> List[Dict]:
+        """The station's open incidents, oldest first. Read-only; safe for any station URL."""
+        with self._lock:
+            return [{
+                "id": incident.id,
+                "summary": incident.summary(),
+                "transmissions": incident.updates,
+                "opened_at": datetime.fromtimestamp(incident.opened_at).isoformat(),
+                "updated_at": datetime.fromtimestamp(incident.updated_at).isoformat(),
+            } for incident in self._listed(station_url)]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open"] = sum(len(self._listed(url)) for url in self._incidents)
+        stats["link_rate"] = stats["linked"] / stats["transcripts"] if stats["transcripts"] else 0.0
+        return stats
+
+    def _open(self, station_url: str) -> OrderedDict:
+        """The station's open and provisional incidents after closing idle ones. Caller holds the lock."""
+        open_incidents = self._incidents.setdefault(station_url, OrderedDict())
+        cutoff = time.time() - self.ttl
+        while open_incidents and next(iter(open_incidents.values())).updated_at < cutoff:
+            _, incident = open_incidents.popitem(last=False)
+            if not incident.provisional:
+                self._stats["closed"] += 1
+        return open_incidents
+
+    def _listed(self, station_url: str) -> List[Incident]:
+        """The station's confirmed, unexpired incidents, without changing any state. Caller holds the lock."""
+        cutoff = time.time() - self.ttl
+        return [incident for incident in self._incidents.get(station_url, {}).values()
+                if not incident.provisional and incident.updated_at >= cutoff]
+
+    def _evict(self, open_incidents: OrderedDict):
+        """Closes the oldest confirmed incidents beyond max_open. Caller holds the lock."""
+        confirmed = [incident.id for incident in open_incidents.values() if not incident.provisional]
+        for incident_id in confirmed[:max(0, len(confirmed) - self.max_open)]:
+            del open_incidents[incident_id]
+            self._stats["closed"] += 1
@@ -0,0 +1,391 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    MODEL_SIZE, JOB_DIR, JOB_INGEST_DIR, JOB_MAX_RUNNING, JOB_MAX_IN_FLIGHT, JOB_PIECE_RETRIES, JOB_BLOCK_SECONDS
+)
+from decoder import SAMPLE_RATE, decode_file
+from models import registry
+from persistence import ends_with_newline
+from preprocess import AudioPreprocessor
+from scheduler import InferenceScheduler
+from segmenter import SilenceSegmenter
+from vad import EnergyVAD
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class IngestJob:
+    def __init__(self, job_id: str, path: str, model_size=MODEL_SIZE, status=QUEUED, created_at=None,
+                 started_at=None, finished_at=None, audio_seconds=0.0, pieces_total=None, error=None, upload=False):
+        self.id = job_id
+        self.path = path
+        self.upload = upload  # The recording was uploaded and is deleted once every piece is transcribed
+        self.model_size = model_size
+        self.status = status
+        self.created_at = created_at or time.time()
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.audio_seconds = audio_seconds  # Decoded so far
+        self.pieces_total = pieces_total  # Known once the whole file has been split
+        self.error = error
+        self.pieces: Dict[int, Dict] = {}  # Latest result per piece index
+        self.results: List[Dict] = []  # Transcribed pieces in the order they finished
+        self.positions: Dict[int, int] = {}  # Piece index -> its entry in results
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "path": self.path,
+            "model_size": self.model_size,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "audio_seconds": self.audio_seconds,
+            "pieces_total": self.pieces_total,
+            "error": self.error,
+            "upload": self.upload,
+        }
+
+
+class _Piece:
+    __slots__ = ("index", "start", "end", "samples", "attempts", "future")
+
+    def __init__(self, index, start, samples):
+        self.index = index
+        self.start = start
+        self.end = start + len(samples) / SAMPLE_RATE
+        self.samples = samples
+        self.attempts = 0
+        self.future: Optional[Future] = None
+
+
+class IngestJobManager:
+    """
+    Transcribes long recordings, such as scanner archives, as background jobs.
+
+    A job decodes its file block by block, cuts it into transmissions at
+    silences with the live pipeline's segmenter, and submits the pieces
+    to the shared inference backend as they are cut. The batching
+    scheduler decodes several pieces per pass, and the process pool spreads
+    them across its workers. Pieces are submitted as background work, so
+    live stations are served first. At most max_in_flight pieces per job
+    are outstanding, so memory stays flat however long the file is.
+
+    Each finished piece is appended to a checkpoint file with its start and
+    end in seconds from the beginning of the recording, and is available
+    from results() at once. Jobs left unfinished by a crash are resumed on
+    start(). Segmentation is deterministic, so pieces already in the
+    checkpoint are skipped. A piece still failing after `retries` attempts is
+    recorded as failed, and retry() runs only those again. An uploaded
+    recording is deleted once all of its pieces are transcribed; it is kept
+    while any piece has failed, so the job can still be retried.
+
+    Recordings already on the server can only be submitted from inside
+    ingest_dir; see local_path().
+    """
+
+    def __init__(self, scheduler_for: Callable[[str], object], directory=JOB_DIR, ingest_dir=JOB_INGEST_DIR,
+                 max_running=JOB_MAX_RUNNING, max_in_flight=JOB_MAX_IN_FLIGHT, retries=JOB_PIECE_RETRIES):
+        self.scheduler_for = scheduler_for  # model size -> scheduler with submit(station, audio, background=) -> Future
+        self.directory = directory
+        self.ingest_dir = ingest_dir
+        self.max_running = max_running
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.jobs: Dict[str, IngestJob] = {}
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    def start(self):
+        """Loads existing jobs and resumes the unfinished ones."""
+        os.makedirs(self.directory, exist_ok=True)
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+                job = IngestJob(data.pop("id"), **data)
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                logger.warning("Skipping unreadable job file %s: %s", name, e)
+                continue
+            self._load_checkpoint(job)
+            self.jobs[job.id] = job
+            if job.status == DONE:
+                self._remove_upload(job)  # In case the process stopped before it could
+            if job.status in (QUEUED, RUNNING):
+                logger.info("Resuming ingest job %s (%d pieces done)", job.id, len(job.pieces))
+                job.status = QUEUED
+                self._queue.put(job.id)
+
+        for i in range(self.max_running):
+            thread = threading.Thread(target=self._run, daemon=True, name=f"ingest-job-{i}")
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, path: str, model_size=MODEL_SIZE, upload=False) -> Dict:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        job = IngestJob(uuid.uuid4().hex[:12], os.path.abspath(path), model_size, upload=upload)
+        with self._cond:
+            self.jobs[job.id] = job
+        self._save(job)
+        self._queue.put(job.id)
+        return self.status(job.id)
+
+    def local_path(self, path: str) -> Optional[str]:
+        """
+        The real path of a recording on the server, resolved relative to
+        ingest_dir, or None when it lies outside it (or no ingest_dir is set).
+        """
+        if not self.ingest_dir:
+            return None
+        root = os.path.realpath(self.ingest_dir)
+        path = os.path.realpath(os.path.join(root, path))
+        return path if os.path.commonpath([root, path]) == root else None
+
+    def upload_path(self, filename: str = "") -> str:
+        """Where to store an uploaded recording before submitting it."""
+        os.makedirs(self.directory, exist_ok=True)
+        extension = os.path.splitext(os.path.basename(filename))[1]
+        return os.path.join(self.directory, f"upload-{uuid.uuid4().hex[:12]}{extension}")
+
+    def retry(self, job_id: str) -> Optional[Dict]:
+        """Runs a finished job again; only failed pieces are transcribed. Raises FileNotFoundError without the recording."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if not os.path.isfile(job.path):
+            raise FileNotFoundError(job.path)
+        with self._cond:
+            if job.status not in (DONE, FAILED):
+                return self.status(job_id)
+            job.status = QUEUED
+            job.error = None
+            job.started_at = job.finished_at = None
+        self._save(job)
+        self._queue.put(job.id)
+        return self.status(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        with self._cond:
+            status = job.to_dict()
+            pieces = list(job.pieces.values())
+        failed = sum(1 for piece in pieces if "error" in piece)
+        status["pieces_done"] = len(pieces) - failed
+        status["pieces_failed"] = failed
+        elapsed = (job.finished_at or time.time()) - job.started_at if job.started_at else 0.0
+        status["realtime_factor"] = elapsed / job.audio_seconds if job.audio_seconds else None
+        for key in ("created_at", "started_at", "finished_at"):
+            if status[key]:
+                status[key] = datetime.fromtimestamp(status[key]).isoformat()
+        return status
+
+    def results(self, job_id: str, since=0, wait: float = 0) -> Optional[Dict]:
+        """
+        Transcribed pieces after the first `since`, in the order they
+        finished. With wait, blocks up to that many seconds for new ones.
+        Pass the returned next as `since` to continue. A retried piece
+        replaces its failed entry in place.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        with self._cond:
+            self._cond.wait_for(lambda: len(job.results) > since or job.status in (DONE, FAILED), timeout=wait)
+            results = job.results[since:]
+            return {"id": job.id, "status": job.status, "results": results, "next": since + len(results)}
+
+    def transcript(self, job_id: str) -> Optional[List[Dict]]:
+        """Every transcribed piece so far, in recording order."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        with self._cond:
+            return sorted((piece for piece in job.pieces.values() if "text" in piece), key=lambda piece: piece["start"])
+
+    def list_jobs(self) -> List[Dict]:
+        return [self.status(job_id) for job_id in list(self.jobs)]
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            statuses = [job.status for job in self.jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+    def close(self):
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None or self._closed:
+                return
+            job = self.jobs[job_id]
+            with self._cond:
+                job.status = RUNNING
+                job.started_at = job.started_at or time.time()
+            self._save(job)
+            try:
+                self._transcribe(job)
+                job.status = DONE
+            except Exception as e:
+                logger.exception("Ingest job %s failed: %s", job.id, e)
+                job.status = FAILED
+                job.error = str(e)
+            job.finished_at = time.time()
+            self._save(job)
+            self._remove_upload(job)
+            with self._cond:
+                self._cond.notify_all()
+
+    def _transcribe(self, job: IngestJob):
+        scheduler = self.scheduler_for(job.model_size)
+        # Held for the whole job, so the model is not unloaded when the last station using it stops
+        model_ref = isinstance(scheduler, InferenceScheduler)
+        if model_ref:
+            registry.acquire(job.model_size)
+        try:
+            self._transcribe_with(job, scheduler)
+        finally:
+            if model_ref:
+                registry.release(job.model_size)
+
+    def _transcribe_with(self, job: IngestJob, scheduler):
+        segmenter = SilenceSegmenter(EnergyVAD())
+        preprocessor = AudioPreprocessor(trim=False)
+        completions = queue.Queue()
+        in_flight = 0
+        index = 0
+        audio_seconds = 0.0
+
+        def submit(piece: _Piece):
+            piece.attempts += 1
+            # Distinct keys let a process pool spread one job's pieces across its workers
+            piece.future = scheduler.submit(f"job:{job.id}:{piece.index}", piece.samples, background=True)
+            piece.future.add_done_callback(lambda _: completions.put(piece))
+
+        def harvest(block: bool) -> int:
+            """Records finished pieces; returns how many left flight."""
+            finished = 0
+            while True:
+                try:
+                    piece = completions.get(timeout=None) if block and not finished else completions.get_nowait()
+                except queue.Empty:
+                    return finished
+                error = piece.future.exception()
+                if error is not None and piece.attempts <= self.retries:
+                    logger.warning("Piece %d of job %s failed (%s); retrying", piece.index, job.id, error)
+                    submit(piece)
+                    continue
+                self._record(job, checkpoint, piece, error)
+                finished += 1
+
+        path = self._checkpoint_path(job)
+        # A line cut short by a crash must not run into the next one
+        torn = os.path.exists(path) and os.path.getsize(path) and not ends_with_newline(path)
+        with open(path, "a") as checkpoint:
+            if torn:
+                checkpoint.write("\n")
+            for block in decode_file(job.path, int(JOB_BLOCK_SECONDS * SAMPLE_RATE)):
+                audio_seconds += len(block) / SAMPLE_RATE
+                for start, segment in segmenter.feed_timed(block):
+                    in_flight += self._submit_piece(job, index, start, segment, preprocessor, submit)
+                    index += 1
+                    while in_flight >= self.max_in_flight:
+                        in_flight -= harvest(block=True)
+                in_flight -= harvest(block=False)
+                job.audio_seconds = max(job.audio_seconds, audio_seconds)
+
+            for start, segment in segmenter.flush_timed():
+                in_flight += self._submit_piece(job, index, start, segment, preprocessor, submit)
+                index += 1
+            job.pieces_total = index
+            self._save(job)
+            while in_flight:
+                in_flight -= harvest(block=True)
+
+    def _submit_piece(self, job, index, start, segment, preprocessor, submit) -> int:
+        previous = job.pieces.get(index)
+        if previous is not None and "error" not in previous:
+            return 0  # Checkpointed before a restart
+        submit(_Piece(index, start, preprocessor.process(segment)))
+        return 1
+
+    def _record(self, job: IngestJob, checkpoint, piece: _Piece, error: Optional[BaseException]):
+        entry = {"index": piece.index, "start": round(piece.start, 2), "end": round(piece.end, 2)}
+        if error is None:
+            result = piece.future.result()
+            entry["text"] = result["text"].strip()
+            entry["model_size"] = result.get("model_size", job.model_size)
+        else:
+            entry["error"] = str(error) or type(error).__name__
+        checkpoint.write(json.dumps(entry) + "\n")
+        checkpoint.flush()
+        with self._cond:
+            job.pieces[piece.index] = entry
+            if piece.index in job.positions:
+                # A retried piece; its earlier failure is replaced, not repeated
+                job.results[job.positions[piece.index]] = entry
+            elif entry.get("text") or "error" in entry:
+                job.positions[piece.index] = len(job.results)
+                job.results.append(entry)
+            self._cond.notify_all()
+
+    def _load_checkpoint(self, job: IngestJob):
+        try:
+            with open(self._checkpoint_path(job)) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short by a crash
+                    job.pieces[entry["index"]] = entry
+        except FileNotFoundError:
+            return
+        job.results = sorted((entry for entry in job.pieces.values() if entry.get("text") or "error" in entry),
+                             key=lambda entry: entry["start"])
+        job.positions = {entry["index"]: position for position, entry in enumerate(job.results)}
+
+    def _remove_upload(self, job: IngestJob):
+        """Deletes an uploaded recording once none of its pieces needs another try."""
+        with self._cond:
+            failed = job.status == FAILED or any("error" in piece for piece in job.pieces.values())
+        if not job.upload or failed:
+            return
+        try:
+            os.remove(job.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not delete the upload of job %s: %s", job.id, e)
+
+    def _checkpoint_path(self, job: IngestJob) -> str:
+        return os.path.join(self.directory, f"{job.id}.pieces.jsonl")
+
+    def _save(self, job: IngestJob):
+        path = os.path.join(self.directory, f"{job.id}.json")
+        with self._cond:
+            data = job.to_dict()
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
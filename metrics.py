@@ -0,0 +1,304 @@
+import logging
+import sys
+import threading
+import time
+from collections import Counter as Tally
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import LOG_LEVEL, PROFILER_INTERVAL
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def configure_logging(level=LOG_LEVEL):
+    """Sets up leveled logging for the pipeline; level "OFF" silences it."""
+    if str(level).upper() == "OFF":
+        logging.disable(logging.CRITICAL)
+        return
+    logging.basicConfig(
+        level=getattr(logging, str(level).upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._removed: Dict[int, set] = {}  # Label index -> values whose series were removed
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    # Late updates from a stopped station's threads go nowhere
+                    if not any(values[index] in removed for index, removed in self._removed.items()):
+                        self._children[values] = child
+        return child
+
+    def remove_matching(self, label: str, value: str):
+        """
+        Drops every child whose label has this value, e.g. a stopped
+        station, and keeps labels() from creating them again until
+        restore_matching() is called.
+        """
+        if label not in self.labelnames:
+            return
+        index = self.labelnames.index(label)
+        with self._lock:
+            self._removed.setdefault(index, set()).add(value)
+            for values in [values for values in self._children if values[index] == value]:
+                del self._children[values]
+
+    def restore_matching(self, label: str, value: str):
+        if label not in self.labelnames:
+            return
+        with self._lock:
+            self._removed.get(self.labelnames.index(label), set()).discard(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _render_child(self, values, child) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self.lock:
+            self.counts[index] += 1
+            self.total += value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _Histogram(self.buckets)
+
+    def _render_child(self, values, child):
+        with child.lock:
+            counts, total = list(child.counts), child.total
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds the process's metrics and renders them in the Prometheus text
+    format. Collectors registered with add_collector() run before every
+    render, for gauges that are read from component stats at scrape time.
+    """
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        self.collectors.append(collector)
+
+    def remove_station(self, station_url: str):
+        """Drops a stopped station's series; its threads may still be winding down, so they stay dropped."""
+        for metric in self.metrics:
+            metric.remove_matching("station", station_url)
+
+    def restore_station(self, station_url: str):
+        """Lets a station that was removed record metrics again, when it is started anew."""
+        for metric in self.metrics:
+            metric.restore_matching("station", station_url)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception:
+                logging.getLogger(__name__).exception("Error in metrics collector")
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STREAM_BYTES = registry.register(Counter(
+    "triage_stream_bytes_total", "Bytes received from station streams", ["station"]))
+STREAM_RECONNECTS = registry.register(Counter(
+    "triage_stream_reconnects_total", "Station stream reconnects", ["station"]))
+STREAM_MIRRORED = registry.register(Gauge(
+    "triage_stream_mirrored", "1 while a station shares a mirrored station's transcription pipeline", ["station"]))
+DECODED_AUDIO = registry.register(Counter(
+    "triage_decoded_audio_seconds_total", "Seconds of audio decoded and segmented", ["station"]))
+STAGE_SECONDS = registry.register(Histogram(
+    "triage_stage_seconds", "Time spent in each pipeline stage per segment", ["station", "stage"]))
+QUEUE_WAIT = registry.register(Histogram(
+    "triage_queue_wait_seconds", "Time items wait in a pipeline queue", ["station", "queue"]))
+QUEUE_DEPTH = registry.register(Gauge(
+    "triage_queue_depth", "Items waiting in a pipeline queue", ["station", "queue"]))
+# Counted by the queues themselves; the collector copies their running totals in with set()
+QUEUE_DROPPED = registry.register(Counter(
+    "triage_queue_dropped_total", "Items dropped by a full pipeline queue", ["station", "queue"]))
+TRANSCRIPTS_DROPPED = registry.register(Counter(
+    "triage_transcripts_dropped_total", "Transcripts never stored because the store's write queue was full",
+    ["station"]))
+TRANSCRIBE_RTF = registry.register(Histogram(
+    "triage_transcribe_realtime_factor", "Whisper seconds per second of audio", ["station"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)))
+ANALYSIS_ROUTES = registry.register(Counter(
+    "triage_analysis_routes_total", "Transcripts by how they were analyzed (incident, cache, prefilter, llm)",
+    ["station", "route"]))
+LLM_SECONDS = registry.register(Histogram(
+    "triage_llm_seconds", "Dispatch analysis LLM latency, including retries", ["station"]))
+LLM_REQUESTS = registry.register(Counter(
+    "triage_llm_requests_total", "Dispatch analysis LLM calls by result", ["station", "result"]))
+VALIDATION = registry.register(Counter(
+    "triage_analysis_outcomes_total", "LLM analyses by validation outcome", ["station", "outcome"]))
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread each interval seconds and counts
+    them in collapsed form ("frame;frame;frame count"), the input format
+    of flamegraph tools. Costs nothing until started.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self.samples = Tally()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self, reset=False) -> str:
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self.samples.most_common()]
+            if reset:
+                self.samples.clear()
+        return "\n".join(lines) + "\n"
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                frames.append(names.get(ident, str(ident)))
+                stacks.append(";".join(reversed(frames)))
+            with self._lock:
+                self.samples.update(stacks)
@@ -0,0 +1,142 @@
+import functools
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from config import MODEL_SIZE, MODEL_DEVICE, MODEL_WARMUP_SECONDS
+from decoder import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def default_device() -> str:
+    if MODEL_DEVICE:
+        return MODEL_DEVICE
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class ModelEntry:
+    def __init__(self):
+        self.model = None
+        self.lock = threading.Lock()  # Held while loading so concurrent first uses load once
+        self.refs = 0
+        self.loaded_at = None
+        self.load_time = 0.0
+        self.warm = False
+
+
+class ModelRegistry:
+    """
+    Loads Whisper models on first use and shares them by (size, device).
+
+    get() returns a cached model, loading it if needed. Stations that use a
+    model for a while take a reference with acquire() and give it back with
+    release(), and the inference scheduler holds one for every queued chunk;
+    a model whose last reference is released is unloaded, except
+    for pinned sizes, which stay loaded once used. warm_up() loads a model
+    and runs one short inference in the background so the first real chunk
+    does not pay for loading and kernel setup.
+    """
+
+    def __init__(self, pinned=(MODEL_SIZE,)):
+        self.pinned = set(pinned)
+        self._entries: Dict[Tuple[str, str], ModelEntry] = {}
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "unloads": 0}
+
+    def pin(self, *sizes: str):
+        """Keeps these sizes loaded once used, for callers that share them without references."""
+        with self._lock:
+            self.pinned.update(sizes)
+
+    def get(self, size: str = MODEL_SIZE, device: Optional[str] = None):
+        entry = self._entry(size, device)
+        if entry.model is None:
+            with entry.lock:
+                if entry.model is None:
+                    self._load(entry, size, device or default_device())
+        return entry.model
+
+    def acquire(self, size: str = MODEL_SIZE, device: Optional[str] = None):
+        """Takes a reference; the model itself still loads on the first get()."""
+        with self._lock:
+            self._entry_locked(size, device).refs += 1
+
+    def release(self, size: str = MODEL_SIZE, device: Optional[str] = None):
+        key = (size, device or default_device())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.refs == 0:
+                return
+            entry.refs -= 1
+            if entry.refs or size in self.pinned:
+                return
+            del self._entries[key]
+        # Another thread may be mid-load; wait so the model is not orphaned
+        with entry.lock:
+            if entry.model is not None:
+                entry.model = None
+                self._stats["unloads"] += 1
+                logger.info("Unloaded Whisper model %s on %s", size, key[1])
+        if key[1].startswith("cuda"):
+            import torch
+            torch.cuda.empty_cache()
+
+    def warm_up(self, size: str = MODEL_SIZE, device: Optional[str] = None) -> threading.Thread:
+        """Loads the model and runs a silent inference on a background thread."""
+        def run():
+            try:
+                model = self.get(size, device)
+                started = time.time()
+                model.transcribe(np.zeros(int(MODEL_WARMUP_SECONDS * SAMPLE_RATE), dtype=np.float32),
+                                 fp16=model.device.type != "cpu")
+                self._entry(size, device).warm = True
+                logger.info("Warmed up Whisper model %s in %.2fs", size, time.time() - started)
+            except Exception as e:
+                logger.error("Error warming up Whisper model %s: %s", size, e)
+
+        thread = threading.Thread(target=run, daemon=True, name=f"warmup-{size}")
+        thread.start()
+        return thread
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            models = {
+                f"{size}@{device}": {
+                    "loaded": entry.model is not None,
+                    "refs": entry.refs,
+                    "warm": entry.warm,
+                    "load_time": entry.load_time,
+                    "loaded_at": entry.loaded_at,
+                } for (size, device), entry in self._entries.items()
+            }
+        return dict(self._stats, models=models)
+
+    def _entry(self, size, device) -> ModelEntry:
+        with self._lock:
+            return self._entry_locked(size, device)
+
+    def _entry_locked(self, size, device) -> ModelEntry:
+        key = (size, device or default_device())
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = ModelEntry()
+        return entry
+
+    def _load(self, entry: ModelEntry, size: str, device: str):
+        import whisper
+
+        started = time.time()
+        entry.model = whisper.load_model(size, device=device)
+        entry.load_time = time.time() - started
+        entry.loaded_at = time.time()
+        self._stats["loads"] += 1
+        logger.info("Loaded Whisper model %s on %s in %.2fs", size, device, entry.load_time)
+
+
+# Shared by the API, the transcription pipeline and test.py
+registry = ModelRegistry()
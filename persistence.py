@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from config import (
+    INCIDENT_BATCH_SIZE, INCIDENT_FLUSH_INTERVAL, INCIDENT_BUFFER_SIZE, INCIDENT_SPOOL_PATH,
+    INCIDENT_SPOOL_COMPACT_ROWS, INCIDENT_MAX_RETRIES, INCIDENT_RETRY_BACKOFF
+)
+
+logger = logging.getLogger(__name__)
+
+
+class IncidentStore:
+    """Storage backend for incidents. insert_many returns the stored rows, with ids, in input order."""
+
+    def insert_many(self, rows: List[Dict]) -> List[Dict]:
+        raise NotImplementedError
+
+    def update(self, incident_id, fields: Dict):
+        raise NotImplementedError
+
+
+class SupabaseIncidentStore(IncidentStore):
+    def __init__(self, client, table="incidents"):
+        self.client = client
+        self.table = table
+
+    def insert_many(self, rows):
+        return self.client.table(self.table).insert(rows).execute().data
+
+    def update(self, incident_id, fields):
+        self.client.table(self.table).update(fields).eq('id', incident_id).execute()
+
+
+class SQLiteIncidentStore(IncidentStore):
+    """Local stand-in for the Supabase incidents table, for tests and benchmarks."""
+
+    COLUMNS = ("title", "location", "type", "severity", "latitude", "longitude", "timestamp")
+
+    def __init__(self, path=":memory:"):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS incidents ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, location TEXT, type TEXT, "
+            "severity INTEGER, latitude REAL, longitude REAL, timestamp TEXT)"
+        )
+        self._db.commit()
+
+    def insert_many(self, rows):
+        inserted = []
+        with self._lock, self._db:
+            for row in rows:
+                values = [row.get(column) for column in self.COLUMNS]
+                cursor = self._db.execute(
+                    f"INSERT INTO incidents ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                    values
+                )
+                inserted.append(dict(row, id=cursor.lastrowid))
+        return inserted
+
+    def update(self, incident_id, fields):
+        columns = [column for column in fields if column in self.COLUMNS]
+        if not columns:
+            return
+        with self._lock, self._db:
+            self._db.execute(
+                f"UPDATE incidents SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                [fields[column] for column in columns] + [incident_id]
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM incidents").fetchone()[0]
+
+
+class IncidentWriter:
+    """
+    Write-behind buffer in front of an IncidentStore.
+
+    submit() appends the row to a local spool file and returns at once with
+    a Future for the stored row. A background thread flushes the buffer as
+    one bulk insert whenever batch_size rows are waiting or flush_interval
+    has passed, retrying failed inserts with exponential backoff. Rows stay
+    in the spool until their insert succeeds, so they survive restarts and
+    outages; delivery is at-least-once.
+
+    When the in-memory buffer is full, new rows are kept only in the spool
+    and loaded back once the buffer drains; their futures are kept and
+    resolve when the reloaded rows are stored.
+
+    The spool starts over whenever everything is stored. Under steady load
+    that may never happen, so once compact_after stored rows have been
+    logged it is rewritten with only the pending ones. Both that and
+    reloading parse the spool without holding the lock submit() takes.
+    """
+
+    def __init__(self, store: IncidentStore, batch_size=INCIDENT_BATCH_SIZE, flush_interval=INCIDENT_FLUSH_INTERVAL,
+                 max_buffer=INCIDENT_BUFFER_SIZE, spool_path=INCIDENT_SPOOL_PATH, compact_after=INCIDENT_SPOOL_COMPACT_ROWS,
+                 max_retries=INCIDENT_MAX_RETRIES, retry_backoff=INCIDENT_RETRY_BACKOFF):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.spool_path = spool_path
+        self.compact_after = compact_after
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._buffer: "OrderedDict[str, tuple]" = OrderedDict()  # spool id -> (row, future)
+        self._spooled_only = 0
+        self._spooled_futures: Dict[str, Future] = {}  # spool id -> future of a row kept only in the spool
+        self._acked = 0  # Stored rows logged in the spool since it was last rewritten
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._stats = {
+            "submitted": 0, "inserted": 0, "batches": 0, "retries": 0, "failed_batches": 0, "compactions": 0
+        }
+
+        self._load_spool()
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+        if self._spool.tell() and not ends_with_newline(self.spool_path):
+            # A line torn by a crash must not swallow the next record
+            self._write_spool_line("")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, row: Dict) -> Future:
+        future = Future()
+        spool_id = uuid.uuid4().hex
+        with self._cond:
+            self._write_spool({"op": "insert", "id": spool_id, "row": row})
+            self._stats["submitted"] += 1
+            if len(self._buffer) < self.max_buffer:
+                self._buffer[spool_id] = (row, future)
+            else:
+                self._spooled_only += 1
+                self._spooled_futures[spool_id] = future
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every buffered row has been stored; returns False on timeout."""
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._buffer and not self._spooled_only, timeout)
+
+    def close(self, timeout: Optional[float] = 10):
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self._spool.close()
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            return dict(self._stats, buffered=len(self._buffer), spooled_only=self._spooled_only)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or len(self._buffer) >= self.batch_size, self.flush_interval
+                )
+                if self._stopping and not self._buffer:
+                    return
+                reload = None
+                if not self._buffer and self._spooled_only:
+                    reload = (self._spool_size(), self._spooled_only)
+                batch = list(self._buffer.items())[:self.batch_size]
+            if reload is not None:
+                self._reload_spool(*reload)
+            elif batch:
+                self._flush_batch(batch)
+
+    def _flush_batch(self, batch):
+        rows = [row for _, (row, _) in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                inserted = self.store.insert_many(rows)
+                break
+            except Exception as e:
+                if attempt == self.max_retries or self._stopping:
+                    # Rows stay buffered and spooled; the next cycle tries again
+                    logger.error("Error inserting %d incidents, will retry: %s", len(rows), e)
+                    with self._cond:
+                        self._stats["failed_batches"] += 1
+                    time.sleep(self.retry_backoff)
+                    return
+                with self._cond:
+                    self._stats["retries"] += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+        with self._cond:
+            for spool_id, _ in batch:
+                self._buffer.pop(spool_id, None)
+            self._write_spool({"op": "ack", "ids": [spool_id for spool_id, _ in batch]})
+            self._acked += len(batch)
+            self._stats["inserted"] += len(batch)
+            self._stats["batches"] += 1
+            if not self._buffer and not self._spooled_only:
+                # Everything is stored; start the spool over
+                self._spool.seek(0)
+                self._spool.truncate()
+                self._acked = 0
+            compact = self._acked >= self.compact_after
+            self._cond.notify_all()
+
+        for (_, (_, future)), stored in zip(batch, inserted or [None] * len(batch)):
+            if future is not None and not future.done():
+                future.set_result(stored)
+        if compact:
+            self._compact()
+
+    def _write_spool(self, record):
+        self._write_spool_line(json.dumps(record))
+
+    def _write_spool_line(self, line):
+        self._spool.write(line + "\n")
+        self._spool.flush()
+        os.fsync(self._spool.fileno())
+
+    def _spool_size(self) -> int:
+        return os.fstat(self._spool.fileno()).st_size
+
+    def _pending_spool_rows(self, end: Optional[int] = None) -> "OrderedDict[str, Dict]":
+        """Rows inserted but not acknowledged in the spool, or in its first end bytes."""
+        pending = OrderedDict()
+        if not os.path.exists(self.spool_path):
+            return pending
+        read = 0
+        with open(self.spool_path, "rb") as spool:
+            for line in spool:
+                read += len(line)
+                if end is not None and read > end:
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a crash mid-line
+                if record["op"] == "insert":
+                    pending[record["id"]] = record["row"]
+                elif record["op"] == "ack":
+                    for spool_id in record["ids"]:
+                        pending.pop(spool_id, None)
+        return pending
+
+    def _load_spool(self):
+        """Requeues rows left unstored by a previous run."""
+        pending = self._pending_spool_rows()
+        for spool_id, row in list(pending.items())[:self.max_buffer]:
+            self._buffer[spool_id] = (row, None)
+        self._spooled_only = max(0, len(pending) - self.max_buffer)
+        if pending:
+            logger.info("Recovered %d unsaved incidents from %s", len(pending), self.spool_path)
+
+    def _reload_spool(self, end: int, spooled_only: int):
+        """
+        Loads spooled-only rows back once the buffer has drained. The spool
+        was end bytes long with spooled_only such rows when it did; only this
+        thread acknowledges rows, so that part is read without the lock.
+        """
+        pending = self._pending_spool_rows(end)
+        with self._cond:
+            loaded = 0
+            for spool_id, row in pending.items():
+                if len(self._buffer) >= self.max_buffer:
+                    break
+                self._buffer[spool_id] = (row, self._spooled_futures.pop(spool_id, None))
+                loaded += 1
+            # Plus any rows that went only to the spool while it was read
+            self._spooled_only = max(0, len(pending) - loaded + self._spooled_only - spooled_only)
+
+    def _compact(self):
+        """Rewrites the spool with only its pending rows."""
+        with self._cond:
+            end = self._spool_size()
+        # Only this thread acknowledges rows, so the first end bytes stay as they are
+        pending = self._pending_spool_rows(end)
+        compacted = self.spool_path + ".compact"
+        with open(compacted, "w", encoding="utf-8") as spool:
+            for spool_id, row in pending.items():
+                spool.write(json.dumps({"op": "insert", "id": spool_id, "row": row}) + "\n")
+            spool.flush()
+            os.fsync(spool.fileno())
+
+        with self._cond:
+            # Rows submitted while rewriting were appended after end
+            with open(self.spool_path, "rb") as spool:
+                spool.seek(end)
+                tail = spool.read()
+            with open(compacted, "ab") as spool:
+                spool.write(tail)
+                spool.flush()
+                os.fsync(spool.fileno())
+            self._spool.close()
+            os.replace(compacted, self.spool_path)
+            self._spool = open(self.spool_path, "a", encoding="utf-8")
+            self._acked = 0
+            self._stats["compactions"] += 1
+        logger.debug("Compacted %s to %d pending incidents", self.spool_path, len(pending))
+
+
+def ends_with_newline(path: str) -> bool:
+    """Whether an append-only log ends on a complete line; a crash mid-write leaves it torn."""
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
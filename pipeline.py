@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+
+
+class Empty(Exception):
+    pass
+
+
+class BoundedQueue:
+    """
+    Fixed-size queue between pipeline stages with an explicit overload policy.
+
+    drop_oldest: a full queue discards its oldest item to make room, so the
+                 consumer always works on the freshest audio.
+    drop_newest: a full queue rejects the incoming item.
+    block:       the producer waits for room (backpressure).
+    """
+
+    def __init__(self, maxsize: int, policy: str = DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST, BLOCK):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item, timeout: Optional[float] = None) -> bool:
+        """Adds an item; returns False if it (or nothing) was dropped by policy instead."""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                elif not self._cond.wait_for(lambda: len(self._items) < self.maxsize or self.closed, timeout):
+                    self.dropped += 1
+                    return False
+            if self.closed:
+                return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout: Optional[float] = None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout) or not self._items:
+                raise Empty
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def close(self):
+        """Wakes every waiting producer and consumer; further puts are ignored."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            return {"depth": len(self._items), "maxsize": self.maxsize, "policy": self.policy, "dropped": self.dropped}
+
+
+class Supervisor:
+    """
+    Owns the threads of one station's pipeline.
+
+    Each stage runs until the stop event is set. A stage that raises or
+    returns early is restarted after an exponential backoff. stop() sets
+    the event, runs the registered cancel hooks (closing sockets and
+    decoders so blocked reads return at once) and joins every thread.
+    """
+
+    def __init__(self, name: str, restart_backoff=1.0, max_backoff=30.0):
+        self.name = name
+        self.restart_backoff = restart_backoff
+        self.max_backoff = max_backoff
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+        self.restarts: Dict[str, int] = {}
+        self._cancel_hooks: List[Callable] = []
+        self._lock = threading.Lock()
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_event.is_set()
+
+    def add_stage(self, stage_name: str, target: Callable):
+        self.restarts[stage_name] = 0
+        thread = threading.Thread(
+            target=self._run_stage, args=(stage_name, target), name=f"{self.name}:{stage_name}", daemon=True
+        )
+        self.threads.append(thread)
+        thread.start()
+        return thread
+
+    def on_cancel(self, hook: Callable):
+        with self._lock:
+            self._cancel_hooks.append(hook)
+
+    def wait(self, seconds: float) -> bool:
+        """Sleeps up to seconds; returns True early if the pipeline is stopping."""
+        return self.stop_event.wait(seconds)
+
+    def stop(self, timeout: float = 2.0):
+        self.stop_event.set()
+        with self._lock:
+            hooks = list(self._cancel_hooks)
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.warning("Error cancelling %s: %s", self.name, e)
+        deadline = time.time() + timeout
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(max(0.0, deadline - time.time()))
+
+    def _run_stage(self, stage_name: str, target: Callable):
+        backoff = self.restart_backoff
+        while not self.stopped:
+            started = time.time()
+            try:
+                target()
+            except Exception as e:
+                logger.exception("Stage %s of %s crashed: %s", stage_name, self.name, e)
+            if self.stopped:
+                break
+            # A stage that ran for a while before failing starts over with a short delay
+            if time.time() - started > self.max_backoff:
+                backoff = self.restart_backoff
+            self.restarts[stage_name] += 1
+            logger.info("Restarting stage %s of %s in %.1fs", stage_name, self.name, backoff)
+            if self.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def get_stats(self) -> Dict:
+        return {
+            "alive_stages": sum(thread.is_alive() for thread in self.threads),
+            "restarts": dict(self.restarts),
+        }
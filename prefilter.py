@@ -0,0 +1,127 @@
+import copy
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import PREFILTER_THRESHOLD, ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL
+
+# List of keywords indicating disasters/emergencies
+EMERGENCY_KEYWORDS = [
+    'fire', 'explosion', 'crash', 'accident', 'disaster', 'emergency',
+    'injury', 'casualty', 'damage', 'hazard', 'threat', 'danger',
+    'evacuation', 'rescue', 'critical', 'severe', 'major', 'incident',
+    'medical', 'assault', 'shooting', 'crime', 'violence'
+]
+
+# Weighted cues for the local classifier. Positive weights point at a real
+# dispatch, negative ones at routine radio chatter.
+DISPATCH_CUES = [
+    (r"\b(" + "|".join(EMERGENCY_KEYWORDS) + r")", 2.0),
+    (r"\b(shots? fired|gunshot|stabb\w*|weapon|gun|knife|robbery|burglary|pursuit|fight)\b", 2.0),
+    (r"\b(unconscious|not breathing|cardiac|overdose|bleeding|injur\w*|fall|seizure|chest pain)\b", 2.0),
+    (r"\b(smoke|flames|structure|alarm|gas leak|hazmat|collision|rollover|mva|vehicle)\b", 1.5),
+    (r"\b(respond\w*|dispatch\w*|en ?route|requesting|backup|ambulance|ems|medic|engine|ladder)\b", 1.0),
+    (r"\b(suspect|victim|patient|caller|complainant|subject)\b", 1.0),
+    (r"\b\d+\s+(block|blk)\b|\b\d{2,5}\s+\w+\s+(st|street|ave|avenue|rd|road|blvd|dr|drive|ln|lane|way|hwy|highway)\b", 1.0),
+    (r"\b(code\s*3|priority\s*1|10-?(33|50|52|53|71|80))\b", 1.5),
+    (r"\b(radio check|test(ing)?|loud and clear|weather|traffic stop clear|end of shift|lunch|break)\b", -2.0),
+    (r"^\W*(10-?4|copy( that)?|roger|affirmative|negative|clear|ok(ay)?|thank you|thanks)\W*$", -3.0),
+]
+
+
+def normalize_transcript(text: str) -> str:
+    """Lowercases and strips punctuation so repeated transmissions share a key."""
+    return " ".join(re.sub(r"[^a-z0-9\- ]+", " ", text.lower()).split())
+
+
+class DispatchPreFilter:
+    """
+    Cheap local classifier run before the LLM call.
+
+    Scores a transcript with compiled keyword and pattern cues; transcripts
+    scoring below threshold are treated as chatter and never sent for
+    analysis.
+    """
+
+    def __init__(self, threshold=PREFILTER_THRESHOLD):
+        self.threshold = threshold
+        self.cues = [(re.compile(pattern), weight) for pattern, weight in DISPATCH_CUES]
+        self._lock = threading.Lock()
+        self._stats = {"evaluated": 0, "skipped": 0}
+
+    def score(self, text: str) -> float:
+        normalized = normalize_transcript(text)
+        score = sum(weight for pattern, weight in self.cues if pattern.search(normalized))
+        if len(normalized.split()) < 3:
+            score -= 1.0
+        return score
+
+    def should_analyze(self, text: str) -> Tuple[bool, float]:
+        score = self.score(text)
+        passed = score >= self.threshold
+        with self._lock:
+            self._stats["evaluated"] += 1
+            self._stats["skipped"] += int(not passed)
+        return passed, score
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["skip_rate"] = stats["skipped"] / stats["evaluated"] if stats["evaluated"] else 0.0
+        return stats
+
+
+class AnalysisCache:
+    """
+    LRU cache of analyses keyed by a hash of the normalized transcript.
+
+    Entries expire after ttl seconds. Negative results (None) are cached
+    too, so rebroadcast chatter is not re-sent to the LLM either.
+    """
+
+    def __init__(self, max_size=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(normalize_transcript(text).encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Tuple[bool, Optional[Dict]]:
+        """Returns (hit, analysis); analysis is a copy and may be None."""
+        key = self.key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, copy.deepcopy(entry[1])
+
+    def put(self, text: str, analysis: Optional[Dict]):
+        key = self.key(text)
+        with self._lock:
+            self._entries[key] = (time.time(), copy.deepcopy(analysis))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evicted"] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,118 @@
+from math import gcd
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy.signal import butter, resample_poly, sosfilt
+
+from config import (
+    PREPROCESS_NORMALIZATION, PREPROCESS_TARGET_DBFS, PREPROCESS_BANDPASS, PREPROCESS_BANDPASS_ORDER,
+    PREPROCESS_TRIM, PREPROCESS_TRIM_DB, PREPROCESS_TRIM_PADDING
+)
+from decoder import SAMPLE_RATE
+
+FRAME_SECONDS = 0.03
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}  # PCM sample width in bytes -> dtype
+
+
+class AudioPreprocessor:
+    """
+    Turns raw PCM into the 16kHz mono float32 array Whisper expects.
+
+    Works directly on NumPy arrays: interleaved channels are averaged and
+    integer samples scaled to [-1, 1] in one pass into a reused scratch
+    buffer, other rates are resampled with a polyphase filter, an optional
+    Butterworth band-pass removes hum and hiss outside the voice band,
+    leading and trailing silence is trimmed, and the gain for peak or
+    loudness normalization is applied while copying into the output.
+
+    Keeps scratch buffers between calls, so use one instance per thread.
+    The returned array is always newly allocated.
+    """
+
+    def __init__(self, target_rate=SAMPLE_RATE, normalization=PREPROCESS_NORMALIZATION,
+                 target_dbfs=PREPROCESS_TARGET_DBFS, bandpass: Optional[Tuple[float, float]] = PREPROCESS_BANDPASS,
+                 bandpass_order=PREPROCESS_BANDPASS_ORDER, trim=PREPROCESS_TRIM, trim_db=PREPROCESS_TRIM_DB,
+                 trim_padding=PREPROCESS_TRIM_PADDING):
+        self.target_rate = target_rate
+        self.normalization = normalization
+        self.target_rms = 10 ** (target_dbfs / 20)
+        self.bandpass = bandpass
+        self.bandpass_order = bandpass_order
+        self.trim = trim
+        self.trim_ratio = 10 ** (trim_db / 10)  # Energy ratio to the loudest frame
+        self.trim_padding = trim_padding
+        self.frame_size = int(FRAME_SECONDS * target_rate)
+        self._scratch = np.empty(0, dtype=np.float32)
+        self._sos: Dict[int, np.ndarray] = {}
+
+    def process(self, samples: np.ndarray, sample_rate=SAMPLE_RATE, channels=1) -> np.ndarray:
+        """samples: interleaved integer or float PCM; returns mono float32 at target_rate."""
+        audio = self._to_mono_float(np.asarray(samples), channels)
+        if sample_rate != self.target_rate:
+            divisor = gcd(self.target_rate, sample_rate)
+            audio = resample_poly(audio, self.target_rate // divisor, sample_rate // divisor).astype(np.float32, copy=False)
+        if self.bandpass:
+            audio = sosfilt(self._bandpass_sos(), audio).astype(np.float32, copy=False)
+        if self.trim:
+            audio = audio[slice(*self._trim_bounds(audio))]
+
+        out = np.empty(len(audio), dtype=np.float32)
+        np.multiply(audio, self._gain(audio), out=out)
+        return out
+
+    def _to_mono_float(self, samples: np.ndarray, channels: int) -> np.ndarray:
+        scale = None
+        if np.issubdtype(samples.dtype, np.integer):
+            scale = np.float32(1.0 / (np.iinfo(samples.dtype).max + 1))
+        elif samples.dtype != np.float32:
+            samples = samples.astype(np.float32)
+
+        if channels == 1 and scale is None:
+            return samples
+
+        frames = len(samples) // channels
+        if len(self._scratch) < frames:
+            self._scratch = np.empty(frames, dtype=np.float32)
+        mono = self._scratch[:frames]
+        # Strided adds per channel are much faster than mean() over a reshaped axis
+        np.copyto(mono, samples[0:frames * channels:channels], casting="unsafe")
+        for channel in range(1, channels):
+            np.add(mono, samples[channel:frames * channels:channels], out=mono, casting="unsafe")
+        mono *= (scale or np.float32(1.0)) / channels
+        return mono
+
+    def _bandpass_sos(self) -> np.ndarray:
+        sos = self._sos.get(self.target_rate)
+        if sos is None:
+            low, high = self.bandpass
+            high = min(high, self.target_rate / 2 * 0.99)
+            sos = butter(self.bandpass_order, [low, high], btype="bandpass", fs=self.target_rate, output="sos")
+            sos = self._sos[self.target_rate] = sos.astype(np.float32)
+        return sos
+
+    def _trim_bounds(self, audio: np.ndarray) -> Tuple[int, int]:
+        n_frames = len(audio) // self.frame_size
+        if n_frames == 0:
+            return 0, len(audio)
+        frames = audio[:n_frames * self.frame_size].reshape(n_frames, self.frame_size)
+        energy = np.einsum("ij,ij->i", frames, frames)
+        loudest = energy.max()
+        if loudest <= 0:
+            return 0, len(audio)
+        voiced = np.flatnonzero(energy >= loudest * self.trim_ratio)
+        padding = int(self.trim_padding * self.target_rate)
+        start = max(0, voiced[0] * self.frame_size - padding)
+        end = len(audio) if voiced[-1] == n_frames - 1 else min(len(audio), (voiced[-1] + 1) * self.frame_size + padding)
+        return start, end
+
+    def _gain(self, audio: np.ndarray) -> float:
+        if not len(audio) or not self.normalization:
+            return 1.0
+        peak = max(float(audio.max()), -float(audio.min()))
+        if peak <= 0:
+            return 1.0
+        if self.normalization == "loudness":
+            rms = np.sqrt(float(np.dot(audio, audio)) / len(audio))
+            # Never boost past full scale
+            return min(self.target_rms / rms, 1.0 / peak)
+        return 1.0 / peak
@@ -1,19 +1,92 @@
+import asyncio
+import logging
+import time
 import httpx
-from config import RADIO_BROWSER_API, DEFAULT_TAG
+from config import RADIO_BROWSER_API, DEFAULT_TAG, STATION_CACHE_TTL, STATION_CACHE_STALE_TTL, STATION_REQUEST_TIMEOUT
 
-def get_radio_stations(tag=DEFAULT_TAG, limit=15):
-  """Fetches police scanner radio stations from Radio-Browser API."""
+logger = logging.getLogger(__name__)
+
+# Shared pooled client, created on first use inside the running event loop
+_client = None
+# (tag, limit) -> (fetched_at, stations)
+_cache = {}
+# (tag, limit) -> in-flight fetch shared by every concurrent caller
+_inflight = {}
+_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "upstream_requests": 0, "upstream_errors": 0}
+
+def _get_client():
+  global _client
+  if _client is None:
+    _client = httpx.AsyncClient(
+      timeout=STATION_REQUEST_TIMEOUT,
+      limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+    )
+  return _client
+
+async def close_client():
+  global _client
+  if _client is not None:
+    await _client.aclose()
+    _client = None
+
+async def _fetch_stations(tag, limit):
   params = {
     "limit": limit,
     "hidebroken": True
   }
 
   url = RADIO_BROWSER_API + tag
-  print(url)
-  
-  response = httpx.get(url, params=params)
-  if response.status_code == 200:
-    stations = response.json()
-    return [{"name": s["name"], "url": s["url_resolved"]} for s in stations]
-  else:
-    return []
\ No newline at end of file
+  _stats["upstream_requests"] += 1
+
+  response = await _get_client().get(url, params=params)
+  response.raise_for_status()
+  stations = response.json()
+  stations = [{"name": s["name"], "url": s["url_resolved"]} for s in stations]
+  _cache[(tag, limit)] = (time.monotonic(), stations)
+  return stations
+
+def _on_fetch_done(key, task):
+  _inflight.pop(key, None)
+  if not task.cancelled() and task.exception() is not None:
+    _stats["upstream_errors"] += 1
+    logger.error("Error fetching stations for %s: %s", key[0], task.exception())
+
+def _refresh(key):
+  """Starts a fetch for key unless one is already running, and returns it."""
+  task = _inflight.get(key)
+  if task is None:
+    task = asyncio.ensure_future(_fetch_stations(*key))
+    task.add_done_callback(lambda t: _on_fetch_done(key, t))
+    _inflight[key] = task
+  return task
+
+async def get_radio_stations(tag=DEFAULT_TAG, limit=15):
+  """
+  Fetches police scanner radio stations from Radio-Browser API.
+
+  Results are cached per tag for STATION_CACHE_TTL seconds. For a further
+  STATION_CACHE_STALE_TTL seconds the stale list is returned at once while
+  a background fetch refreshes it. Concurrent misses for the same tag share
+  a single upstream request.
+  """
+  key = (tag, limit)
+  entry = _cache.get(key)
+  if entry is not None:
+    age = time.monotonic() - entry[0]
+    if age < STATION_CACHE_TTL:
+      _stats["hits"] += 1
+      return entry[1]
+    if age < STATION_CACHE_TTL + STATION_CACHE_STALE_TTL:
+      _stats["stale_hits"] += 1
+      _refresh(key)
+      return entry[1]
+
+  _stats["misses"] += 1
+  try:
+    # Shielded so one caller disconnecting does not cancel the shared fetch
+    return await asyncio.shield(_refresh(key))
+  except (httpx.HTTPError, ValueError, KeyError):
+    return entry[1] if entry is not None else []
+
+def get_station_cache_stats():
+  return dict(_stats, cached_tags=len(_cache), inflight=len(_inflight))
@@ -0,0 +1,228 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    MODEL_SIZE, INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT, INFERENCE_TEMPERATURES,
+    INFERENCE_COMPRESSION_RATIO_THRESHOLD, INFERENCE_LOGPROB_THRESHOLD, INFERENCE_NO_SPEECH_THRESHOLD
+)
+from models import ModelRegistry, registry as default_registry
+
+logger = logging.getLogger(__name__)
+
+
+LIVE, BACKGROUND = 0, 1  # Queue priorities; lower is served first
+
+
+class InferenceRequest:
+    def __init__(self, station, audio, callback: Optional[Callable] = None, background=False):
+        self.station = station
+        self.audio = audio
+        self.callback = callback
+        self.priority = BACKGROUND if background else LIVE
+        self.future = Future()
+        self.enqueued_at = time.time()
+
+
+class InferenceScheduler:
+    """
+    Collects preprocessed chunks from every station into one queue and runs
+    them through Whisper in batches.
+
+    A batch is closed when it reaches max_batch_size or when the oldest
+    request has waited max_wait seconds and nothing else is queued. Requests are completed in the order
+    they were submitted, so results for a station arrive in order.
+
+    Background requests, such as batch job pieces, are queued in a lower
+    priority lane: a batch only takes them when no live chunk is waiting.
+
+    The model is looked up in the registry for every batch, so nothing is
+    loaded until the first chunk arrives. Each queued request holds a
+    registry reference until it completes, so a station that stops with
+    chunks still queued does not unload the model from under them, and the
+    model is unloaded once they drain.
+    """
+
+    def __init__(self, model_size=MODEL_SIZE, registry: Optional[ModelRegistry] = None,
+                 max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_wait=INFERENCE_MAX_WAIT):
+        self.model_size = model_size
+        self.registry = registry if registry is not None else default_registry
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = queue.PriorityQueue()  # (priority, sequence, request)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            "batches": 0,
+            "requests": 0,
+            "background_requests": 0,
+            "total_queue_wait": 0.0,
+            "max_queue_wait": 0.0,
+            "total_inference_time": 0.0,
+        }
+
+    def submit(self, station, audio, callback: Optional[Callable] = None, background=False) -> Future:
+        """
+        Queues a 16kHz float32 audio array for transcription.
+        Returns a Future resolving to a Whisper-style result dict; callback,
+        if given, is called with the same dict. Background requests wait
+        behind every live one.
+        """
+        self._ensure_running()
+        request = InferenceRequest(station, audio, callback, background)
+        self.registry.acquire(self.model_size)
+        self.queue.put((request.priority, next(self._sequence), request))
+        return request.future
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        requests_done = stats["requests"]
+        return {
+            "model_size": self.model_size,
+            "batches": batches,
+            "requests": requests_done,
+            "background_requests": stats["background_requests"],
+            "pending": self.queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait": self.max_wait,
+            "avg_batch_size": requests_done / batches if batches else 0.0,
+            "avg_batch_occupancy": requests_done / (batches * self.max_batch_size) if batches else 0.0,
+            "avg_queue_wait": stats["total_queue_wait"] / requests_done if requests_done else 0.0,
+            "max_queue_wait": stats["max_queue_wait"],
+            "avg_inference_time": stats["total_inference_time"] / batches if batches else 0.0,
+        }
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()[2]]
+            deadline = batch[0].enqueued_at + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.time()
+                try:
+                    if remaining > 0:
+                        item = self.queue.get(timeout=remaining)
+                    else:
+                        # Past the deadline, still take whatever is already queued
+                        item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item[2])
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[InferenceRequest]):
+        started = time.time()
+        waits = [started - request.enqueued_at for request in batch]
+
+        try:
+            results = self._transcribe_batch([request.audio for request in batch])
+        except Exception as e:
+            logger.exception("Error in batched inference: %s", e)
+            results = [e] * len(batch)
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(batch)
+            self._stats["background_requests"] += sum(request.priority == BACKGROUND for request in batch)
+            self._stats["total_queue_wait"] += sum(waits)
+            self._stats["max_queue_wait"] = max(self._stats["max_queue_wait"], max(waits))
+            self._stats["total_inference_time"] += time.time() - started
+
+        for request, result in zip(batch, results):
+            try:
+                if isinstance(result, Exception):
+                    request.future.set_exception(result)
+                    continue
+                request.future.set_result(result)
+                if request.callback:
+                    try:
+                        request.callback(result)
+                    except Exception as e:
+                        logger.warning("Error in inference callback: %s", e)
+            finally:
+                self.registry.release(self.model_size)
+
+    def _transcribe_batch(self, audios):
+        """
+        Runs one encoder/decoder pass over every chunk that fits in Whisper's
+        30 second window. Longer chunks fall back to model.transcribe.
+
+        Like model.transcribe, chunks Whisper judges to be silence come back
+        with empty text, and chunks whose decoding looks like a failure
+        (repetitive or low confidence) are decoded again, together, at the
+        next temperature.
+        """
+        import torch
+        import whisper
+
+        model = self.registry.get(self.model_size)
+        results = [None] * len(audios)
+        batched = {i for i, audio in enumerate(audios) if len(audio) <= whisper.audio.N_SAMPLES}
+
+        for i, audio in enumerate(audios):
+            if i not in batched:
+                results[i] = model.transcribe(audio)
+
+        mels = {
+            i: whisper.log_mel_spectrogram(whisper.pad_or_trim(audios[i]), n_mels=model.dims.n_mels)
+            for i in batched
+        }
+        pending = sorted(batched)
+        for temperature in INFERENCE_TEMPERATURES:
+            if not pending:
+                break
+            mel = torch.stack([mels[i] for i in pending]).to(model.device)
+            options = whisper.DecodingOptions(
+                temperature=temperature,
+                fp16=model.device.type != "cpu",
+                without_timestamps=True,
+            )
+            decoded = whisper.decode(model, mel, options)
+            failed = []
+            for i, result in zip(pending, decoded):
+                results[i] = _decoding_result_to_dict(result)
+                if _needs_fallback(result):
+                    failed.append(i)
+            pending = failed
+
+        return results
+
+
+def _is_silence(result) -> bool:
+    return result.no_speech_prob > INFERENCE_NO_SPEECH_THRESHOLD and result.avg_logprob < INFERENCE_LOGPROB_THRESHOLD
+
+
+def _needs_fallback(result) -> bool:
+    if _is_silence(result):
+        return False
+    return result.compression_ratio > INFERENCE_COMPRESSION_RATIO_THRESHOLD \
+        or result.avg_logprob < INFERENCE_LOGPROB_THRESHOLD
+
+
+def _decoding_result_to_dict(result) -> Dict:
+    """Shapes a DecodingResult like the dict returned by model.transcribe; silence has no text or segments."""
+    if _is_silence(result):
+        return {"text": "", "language": result.language, "segments": []}
+    return {
+        "text": result.text,
+        "language": result.language,
+        "segments": [{
+            "text": result.text,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        }],
+    }
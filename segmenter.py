@@ -0,0 +1,136 @@
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from config import (
+    SEGMENT_MIN_SECONDS, SEGMENT_MAX_SECONDS, SEGMENT_HARD_CAP_SECONDS, SEGMENT_SILENCE_GAP
+)
+from vad import VoiceActivityDetector
+
+
+class SilenceSegmenter:
+    """
+    Cuts a continuous PCM stream into whole transmissions.
+
+    A segment opens on the first speech frame and closes once the silence
+    after it lasts silence_gap seconds. Past max_seconds any pause closes
+    it, and at hard_cap_seconds it is cut regardless so latency stays
+    bounded. Voiced bursts shorter than min_seconds are discarded.
+    """
+
+    def __init__(self, vad: VoiceActivityDetector, min_seconds=SEGMENT_MIN_SECONDS,
+                 max_seconds=SEGMENT_MAX_SECONDS, hard_cap_seconds=SEGMENT_HARD_CAP_SECONDS,
+                 silence_gap=SEGMENT_SILENCE_GAP):
+        self.vad = vad
+        self.frame_size = vad.frame_size
+        frame_seconds = vad.frame_size / vad.sample_rate
+        self.frame_seconds = frame_seconds
+        self.min_frames = int(min_seconds / frame_seconds)
+        self.max_frames = int(max_seconds / frame_seconds)
+        self.hard_cap_frames = int(hard_cap_seconds / frame_seconds)
+        self.gap_frames = max(1, int(silence_gap / frame_seconds))
+        self.padding_frames = vad.padding_frames
+
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._lead_in = deque(maxlen=self.padding_frames or 1)
+        self._segment: Optional[List[np.ndarray]] = None
+        self._segment_start = 0  # Frame index where the open segment begins
+        self._position = 0  # Frames consumed so far
+        self._silence_run = 0
+        self._voiced_frames = 0
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "seconds_in": 0.0,
+            "seconds_emitted": 0.0,
+            "segments": 0,
+            "segments_discarded": 0,
+            "segments_capped": 0,
+        }
+
+    def feed(self, samples: np.ndarray) -> List[np.ndarray]:
+        """Consumes any number of samples and returns the segments they complete."""
+        return [segment for _, segment in self.feed_timed(samples)]
+
+    def feed_timed(self, samples: np.ndarray) -> List[Tuple[float, np.ndarray]]:
+        """Like feed(), with each segment's start in seconds since the first sample fed."""
+        samples = np.concatenate([self._pending, samples]) if len(self._pending) else samples
+        frames = self.vad.frames(samples)
+        self._pending = samples[len(frames) * self.frame_size:]
+        mask = self.vad.speech_mask(frames)
+
+        with self._lock:
+            self._stats["seconds_in"] += len(frames) * self.frame_seconds
+
+        segments = []
+        for frame, is_speech in zip(frames, mask):
+            segment = self._push(frame, bool(is_speech))
+            self._position += 1
+            if segment is not None:
+                segments.append(segment)
+        return segments
+
+    def flush(self) -> List[np.ndarray]:
+        """Closes any open segment, e.g. when the stream ends."""
+        return [segment for _, segment in self.flush_timed()]
+
+    def flush_timed(self) -> List[Tuple[float, np.ndarray]]:
+        if self._segment is None:
+            return []
+        segment = self._close(trailing_silence=self._silence_run, capped=False)
+        return [segment] if segment is not None else []
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_segment_seconds"] = stats["seconds_emitted"] / stats["segments"] if stats["segments"] else 0.0
+        stats["skipped_ratio"] = 1 - stats["seconds_emitted"] / stats["seconds_in"] if stats["seconds_in"] else 0.0
+        return stats
+
+    def _push(self, frame: np.ndarray, is_speech: bool) -> Optional[Tuple[float, np.ndarray]]:
+        if self._segment is None:
+            if not is_speech:
+                if self.padding_frames:
+                    self._lead_in.append(frame)
+                return None
+            self._segment = list(self._lead_in)
+            self._segment_start = self._position - len(self._lead_in)
+            self._lead_in.clear()
+            self._silence_run = 0
+            self._voiced_frames = 0
+
+        self._segment.append(frame)
+        if is_speech:
+            self._silence_run = 0
+            self._voiced_frames += 1
+        else:
+            self._silence_run += 1
+
+        length = len(self._segment)
+        if self._silence_run >= self.gap_frames:
+            return self._close(trailing_silence=self._silence_run, capped=False)
+        if length >= self.max_frames and self._silence_run > 0:
+            return self._close(trailing_silence=self._silence_run, capped=False)
+        if length >= self.hard_cap_frames:
+            return self._close(trailing_silence=0, capped=True)
+        return None
+
+    def _close(self, trailing_silence: int, capped: bool) -> Optional[Tuple[float, np.ndarray]]:
+        frames = self._segment
+        drop = max(0, trailing_silence - self.padding_frames)
+        if drop:
+            frames = frames[:-drop]
+        voiced = self._voiced_frames
+        self._segment = None
+        self._silence_run = 0
+        self._voiced_frames = 0
+
+        with self._lock:
+            if voiced < self.min_frames:
+                self._stats["segments_discarded"] += 1
+                return None
+            self._stats["segments"] += 1
+            self._stats["segments_capped"] += int(capped)
+            self._stats["seconds_emitted"] += len(frames) * self.frame_seconds
+        return self._segment_start * self.frame_seconds, np.concatenate(frames)
@@ -1,11 +1,13 @@
 import json
 from datetime import datetime
 from openai import OpenAI
-import whisper
+from models import registry
 from supabase import create_client
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
 from dotenv import load_dotenv, dotenv_values
+from history import TranscriptHistory
+from geocoding import GeocodeResolver
+from persistence import SupabaseIncidentStore, IncidentWriter
+from metrics import configure_logging
 import os
 
 # Initialize Supabase client
@@ -17,9 +19,15 @@ supabase = create_client(
     supabase_key
 )
 
+# Incidents are buffered, spooled to disk and bulk inserted in the background
+incident_writer = IncidentWriter(SupabaseIncidentStore(supabase))
+
+# Shared geocoder: cached on disk and rate limited on a background thread
+geocoder = GeocodeResolver()
+
 def read_audio_message(audio_file_path):
-    # Load Whisper model
-    model = whisper.load_model("tiny")
+    # Loaded once and reused across calls
+    model = registry.get("tiny")
     
     # Transcribe audio file
     result = model.transcribe(audio_file_path)
@@ -91,22 +99,32 @@ def get_coordinates(location: str):
     Get latitude and longitude coordinates for a given location string.
     Returns (latitude, longitude) tuple or (None, None) if geocoding fails.
     """
-    geolocator = Nominatim(user_agent="triage_transcription")
+    return geocoder.resolve(location, timeout=30)
+
+def update_coordinates(incident_id, latitude, longitude):
+    """
+    Fill in coordinates for an incident once the background geocoder resolves them
+    """
+    if latitude is None:
+        return
     try:
-        location_data = geolocator.geocode(location)
-        if location_data:
-            return location_data.latitude, location_data.longitude
-    except (GeocoderTimedOut, GeocoderUnavailable) as e:
-        print(f"Geocoding error for location '{location}': {e}")
-    return None, None
+        incident_writer.store.update(incident_id, {
+            'latitude': latitude,
+            'longitude': longitude
+        })
+    except Exception as e:
+        print(f"Error updating coordinates for incident {incident_id}: {e}")
 
 def insert_transcription(text: str, analysis: dict, station_url: str):
     """
-    Insert transcription data into Supabase database
+    Queue transcription data for insertion into Supabase.
+    Returns a Future for the inserted row; the insert itself happens in
+    bulk on the writer's thread. Coordinates come from the geocoding cache
+    when known; otherwise they are resolved in the background and written
+    once both the row and the coordinates are available.
     """
-    # Get coordinates for the location
     location = analysis.get('Location', 'Unknown')
-    latitude, longitude = get_coordinates(location)
+    cached, (latitude, longitude) = geocoder.lookup_cached(location)
     
     # Get title from analysis or use first 100 chars of text as fallback
     title = analysis.get('Title', text[:100])
@@ -121,37 +139,32 @@ def insert_transcription(text: str, analysis: dict, station_url: str):
         'timestamp': datetime.now().isoformat()
     }
 
-    try:
-        # Insert the data into the incidents table
-        result = supabase.table('incidents').insert(incident_data).execute()
-        print(f"Successfully inserted transcription: {result.data}")
-        return result.data
-    except Exception as e:
-        print(f"Error inserting transcription: {e}")
-        return None
+    pending = incident_writer.submit(incident_data)
+
+    def on_inserted(future):
+        row = future.result()
+        print(f"Successfully inserted transcription: {row}")
+        if not cached and row:
+            geocoder.resolve_async(location, lambda lat, lon: update_coordinates(row['id'], lat, lon))
+
+    pending.add_done_callback(on_inserted)
+    return pending
 
 # Modify the TranscriptionRecord class to use Supabase
 class TranscriptionRecord:
     def __init__(self):
-        self.transcriptions = []
-        self.max_history = 100
+        self.transcriptions = TranscriptHistory()
         
     def add_transcription(self, text: str, analysis: dict, station_url: str):
         # Store in local memory
-        self.transcriptions.append({
-            "text": text,
-            "analysis": analysis,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Maintain history limit
-        if len(self.transcriptions) > self.max_history:
-            self.transcriptions.pop(0)
+        self.transcriptions.append(text, analysis)
             
-        # Insert into Supabase
+        # Queue for Supabase; never blocks the transcriber on the database
         insert_transcription(text, analysis, station_url)
 
 if __name__ == "__main__":
+    configure_logging()
+    
     # Read dispatch message from audio file
     audio_file_path = "test.mp3"
     dispatch_message = read_audio_message(audio_file_path)
@@ -166,14 +179,15 @@ if __name__ == "__main__":
     test_station_url = "test_station"
     
     # Insert the transcription into Supabase
-    result = insert_transcription(
+    pending = insert_transcription(
         text=dispatch_message,
         analysis=analysis,
         station_url=test_station_url
     )
+    incident_writer.close()
     
-    if result:
+    if pending.done():
         print("\n=== Database Insertion Successful ===")
-        print(f"Inserted record ID: {result[0]['id'] if result else 'Unknown'}")
+        print(f"Inserted record ID: {pending.result()['id']}")
     else:
-        print("\n=== Database Insertion Failed ===")
+        print("\n=== Database Insertion Pending (spooled for the next run) ===")
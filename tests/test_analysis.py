@@ -0,0 +1,72 @@
+import threading
+import time
+
+import openai
+import pytest
+
+from analysis import AnalysisService
+from fixtures.stub_llm import StubHandler, serve
+
+
+def start(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+@pytest.fixture
+def flaky_llm():
+    """Stub LLM answering the first `failures` requests with 429."""
+    class FlakyHandler(StubHandler):
+        failures = 2
+        calls = 0
+        lock = threading.Lock()
+
+        def do_POST(self):
+            with self.lock:
+                type(self).calls += 1
+                fail = type(self).calls <= self.failures
+            if fail:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._send(429, {"error": {"message": "rate limited", "type": "rate_limit_exceeded"}})
+                return
+            super().do_POST()
+
+    server = serve(port=0)
+    server.RequestHandlerClass = FlakyHandler
+    yield start(server), FlakyHandler
+    server.shutdown()
+
+
+def test_retries_with_backoff_until_success(flaky_llm):
+    base_url, handler = flaky_llm
+    service = AnalysisService(base_url=base_url, api_key="stub", max_retries=4, backoff_base=0.05, rate_limit=0)
+
+    started = time.time()
+    response = service.submit("Structure fire at 12 Main St").result(timeout=10)
+
+    assert response.startswith("Type: Fire incident")
+    assert handler.calls == 3
+    assert service.get_stats()["retries"] == 2
+    # Two backoffs of at least 0.5 * base and 0.5 * 2 * base
+    assert time.time() - started >= 0.05 * 0.5 * 3
+
+
+def test_gives_up_after_max_retries(flaky_llm):
+    base_url, handler = flaky_llm
+    handler.failures = 100
+    service = AnalysisService(base_url=base_url, api_key="stub", max_retries=1, backoff_base=0.01, rate_limit=0)
+
+    with pytest.raises(openai.RateLimitError):
+        service.submit("Structure fire at 12 Main St").result(timeout=10)
+    assert handler.calls == 2
+    assert service.get_stats()["failed"] == 1
+
+
+def test_submit_raises_when_client_cannot_start(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    service = AnalysisService(api_key=None)
+
+    started = time.time()
+    with pytest.raises(RuntimeError, match="failed to start"):
+        service.submit("Structure fire at 12 Main St")
+    assert time.time() - started < 5
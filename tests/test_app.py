@@ -0,0 +1,50 @@
+import importlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+STATION = "http://station.test/stream"
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    # The app keeps its database and job files relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    api = importlib.import_module("app")
+    monkeypatch.setattr(api.feed, "keepalive", 0.05)
+    return api
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("7", {STATION: 7}),
+    (json.dumps({STATION: 3, "http://other.test": 4}), {STATION: 3}),
+    (json.dumps({STATION: "5"}), {STATION: 5}),
+    (json.dumps({STATION: "abc"}), {}),
+    (json.dumps({STATION: None}), {}),
+    (json.dumps({STATION: [1]}), {}),
+    ("not json", {}),
+    ("[1, 2]", {}),
+])
+def test_parse_since(api, raw, expected):
+    assert api._parse_since(raw, [STATION]) == expected
+
+
+def test_websocket_with_malformed_since_streams_without_cursor(api):
+    client = TestClient(api.app)
+    since = json.dumps({STATION: "abc"})
+    with client.websocket_connect(f"/transcribe/ws?station_url={STATION}&since={since}") as websocket:
+        assert websocket.receive_json() == {"type": "keepalive"}
+
+
+def test_jobs_by_path_are_limited_to_the_ingest_dir(api, tmp_path, monkeypatch):
+    ingest = tmp_path / "ingest"
+    ingest.mkdir()
+    (tmp_path / "secret.mp3").write_bytes(b"secret")
+    monkeypatch.setattr(api.job_manager, "ingest_dir", str(ingest))
+    client = TestClient(api.app)
+
+    refused = client.post("/jobs", params={"path": "../secret.mp3"}).json()
+    assert "ingest directory" in refused["message"]
+    assert client.post("/jobs", params={"path": "missing.mp3"}).json() == {"message": "Recording not found"}
+    assert api.job_manager.jobs == {}
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+import transcriber
+from fingerprint import Fingerprinter, FingerprintIndex
+from pipeline import Supervisor
+from transcriber import LiveTranscriber
+
+RATE = 16000
+LEADER, MIRROR, OTHER = "http://leader.test", "http://mirror.test", "http://other.test"
+
+
+def program(seed, seconds=20.0):
+    """Speech-like test audio: a new pair of voice-band tones every 80 ms."""
+    rng = np.random.default_rng(seed)
+    step = int(0.08 * RATE)
+    t = np.arange(step) / RATE
+    notes = [sum(rng.uniform(0.1, 0.4) * np.sin(2 * np.pi * rng.uniform(300, 3800) * t) for _ in range(2))
+             for _ in range(int(seconds / 0.08))]
+    return np.concatenate(notes).astype(np.float32)
+
+
+def rebroadcast(samples, delay_seconds, gain, seed=0):
+    """The same audio running behind, quieter and with a little noise, as a second stream URL carries it."""
+    noise = np.random.default_rng(seed).normal(0, 0.005, len(samples))
+    return np.concatenate([np.zeros(int(delay_seconds * RATE)), samples * gain + noise]).astype(np.float32)
+
+
+def index_of(streams, block=8000):
+    index = FingerprintIndex(window=30, min_matches=40, min_ratio=0.1)
+    for station_url, samples in streams.items():
+        fingerprinter = Fingerprinter()
+        for i in range(0, len(samples), block):
+            index.add(station_url, *fingerprinter.update(samples[i:i + block]))
+    return index
+
+
+def test_delayed_quieter_copy_is_a_mirror():
+    audio = program(1)
+    index = index_of({LEADER: audio, MIRROR: rebroadcast(audio, 1.3, 0.5)})
+
+    matches, ratio = index.compare(MIRROR, LEADER)
+    assert matches >= index.min_matches and ratio >= index.min_ratio
+    assert index.is_mirror(MIRROR, LEADER)
+
+
+def test_different_audio_is_not_a_mirror():
+    index = index_of({LEADER: program(1), OTHER: program(2)})
+
+    assert not index.is_mirror(OTHER, LEADER)
+    assert index.find_mirror(OTHER, [LEADER]) is None
+
+
+def test_find_mirror_picks_the_station_with_the_same_audio():
+    audio = program(1)
+    index = index_of({LEADER: audio, OTHER: program(2), MIRROR: rebroadcast(audio, 0.7, 0.8)})
+
+    assert index.find_mirror(MIRROR, [OTHER, LEADER]) == LEADER
+    assert index.get_stats()["mirrors_found"] == 1
+
+
+def test_removed_station_matches_nothing():
+    audio = program(1)
+    index = index_of({LEADER: audio, MIRROR: audio})
+    index.remove(LEADER)
+
+    assert index.compare(MIRROR, LEADER) == (0, 0.0)
+
+
+@pytest.fixture
+def stations(monkeypatch):
+    """A running leader and a later station, both fingerprinting through a fresh index."""
+    monkeypatch.setattr(transcriber, "fingerprints", FingerprintIndex())
+    monkeypatch.setattr(transcriber, "live_transcribers", {})
+    started = []
+    for i, url in enumerate((LEADER, MIRROR)):
+        station = LiveTranscriber(segmentation="fixed", vad=None)
+        station.station_url = url
+        station.started_at = i
+        station.supervisor = Supervisor(url)
+        transcriber.live_transcribers[url] = station
+        started.append(station)
+    yield started
+    for station in started:
+        station.supervisor.stop()
+
+
+def feed(station, samples, block=8000):
+    for i in range(0, len(samples), block):
+        station._fingerprint(samples[i:i + block])
+
+
+def test_station_follows_a_mirror_and_stops_when_its_audio_diverges(stations):
+    leader, mirror = stations
+    audio = program(1, seconds=12)
+    feed(leader, audio)
+    feed(mirror, rebroadcast(audio, 1.0, 0.6))
+
+    assert mirror.leader is leader
+    assert MIRROR in leader.subscribers
+    # The earlier station never follows the later one
+    assert leader.leader is None
+
+    # Thirty seconds of its own programme push the shared audio out of the mirror's window
+    feed(leader, program(3, seconds=35))
+    feed(mirror, program(4, seconds=35))
+
+    assert mirror.leader is None
+    assert leader.subscribers == {}
+
+
+def test_followers_go_back_to_transcribing_when_the_leader_stops(stations):
+    leader, mirror = stations
+    audio = program(1, seconds=12)
+    feed(leader, audio)
+    feed(mirror, audio)
+    assert mirror.leader is leader
+
+    leader.stop_streaming(timeout=0.1)
+
+    assert mirror.leader is None
+    assert transcriber.fingerprints.hash_count(LEADER) == 0
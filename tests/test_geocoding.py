@@ -0,0 +1,41 @@
+from geopy.exc import GeocoderServiceError
+
+from geocoding import GeocodeCache, GeocodeResolver, StaticGeocoder
+
+
+class FailingGeocoder(StaticGeocoder):
+    """Raises the given error for the listed addresses."""
+
+    def __init__(self, locations, failures):
+        super().__init__(locations)
+        self.failures = failures
+
+    def geocode(self, query):
+        error = self.failures.get(query)
+        if error is not None:
+            self.calls += 1
+            raise error
+        return super().geocode(query)
+
+
+def resolver(tmp_path, failures):
+    geocoder = FailingGeocoder({"12 Main Street": (40.0, -75.0)}, failures)
+    return GeocodeResolver(geocoder, GeocodeCache(str(tmp_path / "geocodes.db")), min_interval=0)
+
+
+def test_unexpected_error_fails_the_location_and_keeps_the_worker(tmp_path):
+    geo = resolver(tmp_path, {"5th and Oak": ValueError("bad response")})
+
+    assert geo.resolve("5th and Oak", timeout=5) == (None, None)
+    assert geo.resolve("12 Main Street", timeout=5) == (40.0, -75.0)
+    assert geo.get_stats()["errors"] == 1
+    assert not geo._waiting
+
+
+def test_service_errors_are_not_cached(tmp_path):
+    geo = resolver(tmp_path, {"5th and Oak": GeocoderServiceError("unavailable")})
+
+    assert geo.resolve("5th and Oak", timeout=5) == (None, None)
+    assert geo.resolve("5th and Oak", timeout=5) == (None, None)
+    assert geo.geocoder.calls == 2
+    assert geo.lookup_cached("5th and Oak") == (False, (None, None))
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from history import TranscriptHistory
+
+BASE = datetime(2025, 1, 1)
+
+
+def filled(count, capacity=5):
+    """History holding entries 1..count, entry n timestamped n minutes after BASE."""
+    history = TranscriptHistory(capacity=capacity)
+    for n in range(1, count + 1):
+        history.append(f"entry {n}", {}, BASE + timedelta(minutes=n))
+    return history
+
+
+def seqs(entries):
+    return [entry["seq"] for entry in entries]
+
+
+def test_seq_numbers_keep_counting_past_capacity():
+    history = filled(8)
+
+    assert history.last_seq == 8
+    assert len(history) == 5
+    # Entries 1-3 were overwritten by the wraparound
+    assert seqs(history.query()) == [4, 5, 6, 7, 8]
+
+
+@pytest.mark.parametrize("count, since, limit, expected", [
+    (3, 1, None, [2, 3]),
+    (3, 3, None, []),
+    (3, 10, None, []),
+    (8, 0, None, [4, 5, 6, 7, 8]),  # Evicted entries cannot be returned
+    (8, 5, None, [6, 7, 8]),
+    (8, 4, 2, [5, 6]),  # With since, limit pages forward from the oldest
+    (8, None, 2, [7, 8]),  # Without since, the newest
+    (8, None, 10, [4, 5, 6, 7, 8]),
+])
+def test_since_and_limit(count, since, limit, expected):
+    assert seqs(filled(count).query(since=since, limit=limit)) == expected
+
+
+def test_paging_forward_with_since_returns_every_entry_once():
+    history = filled(12, capacity=10)
+    cursor, seen = 2, []
+    while True:
+        page = history.query(since=cursor, limit=3)
+        if not page:
+            break
+        seen += seqs(page)
+        cursor = page[-1]["seq"]
+
+    assert seen == list(range(3, 13))
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    (6, None, [6, 7, 8]),
+    (None, 5, [4, 5]),
+    (5, 7, [5, 6, 7]),
+    (1, 3, []),  # Only evicted entries were in range
+    (2, 4, [4]),
+    (9, None, []),
+])
+def test_time_range_is_inclusive_across_the_wraparound(start, end, expected):
+    history = filled(8)
+
+    entries = history.query(
+        start=BASE + timedelta(minutes=start) if start else None,
+        end=BASE + timedelta(minutes=end) if end else None,
+    )
+
+    assert seqs(entries) == expected
+
+
+def test_time_range_combines_with_since_and_limit():
+    history = filled(8)
+    start, end = BASE + timedelta(minutes=5), BASE + timedelta(minutes=8)
+
+    assert seqs(history.query(since=6, start=start, end=end)) == [7, 8]
+    assert seqs(history.query(start=start, end=end, limit=2)) == [7, 8]
+    assert seqs(history.query(since=4, start=start, end=end, limit=2)) == [5, 6]
+
+
+def persisted(*seq_numbers):
+    return [{"seq": seq, "text": "", "analysis": None, "timestamp": (BASE + timedelta(minutes=seq)).isoformat()}
+            for seq in seq_numbers]
+
+
+def test_restore_keeps_seq_numbers():
+    history = TranscriptHistory(capacity=5)
+    history.restore(persisted(40, 41, 42))
+
+    assert history.last_seq == 42
+    assert len(history) == 3
+    assert seqs(history.query()) == [40, 41, 42]
+    assert seqs(history.query(since=40)) == [41, 42]
+    assert seqs(history.query(start=BASE)) == [40, 41, 42]
+    assert history.append("next", {})["seq"] == 43
+
+
+def test_restore_keeps_only_the_newest_consecutive_entries():
+    history = TranscriptHistory(capacity=5)
+    # Entry 41 never reached the store
+    history.restore(persisted(38, 39, 40, 42, 43))
+
+    assert seqs(history.query()) == [42, 43]
+    assert seqs(history.query(start=BASE)) == [42, 43]
@@ -0,0 +1,114 @@
+from incidents import IncidentTracker
+
+STATION = "http://station.test/stream"
+
+FIRE = "Structure fire reported at the old warehouse by the river, heavy smoke showing from the roof"
+FIRE_FOLLOW_UP = "structure fire at the old warehouse by the river heavy smoke showing from roof"
+CRASH = "Two vehicle collision on the interstate northbound, one patient trapped"
+
+
+def analysis(kind, location="", units=""):
+    return {"Type": kind, "Location": location, "Severity": "High", "Units Responding": units}
+
+
+def ids(tracker, station_url=STATION):
+    return [incident["id"] for incident in tracker.open_incidents(station_url)]
+
+
+def test_similar_transcripts_join_the_same_incident():
+    tracker = IncidentTracker()
+    first = tracker.match(STATION, FIRE)
+    tracker.record(STATION, FIRE, analysis("Fire"), first)
+
+    second = tracker.match(STATION, FIRE_FOLLOW_UP)
+
+    assert not second.opened
+    assert second.incident is first.incident
+    assert second.score >= tracker.similarity
+    assert second.earlier == [FIRE]
+
+
+def test_unrelated_transcripts_open_separate_incidents():
+    tracker = IncidentTracker()
+    fire = tracker.match(STATION, FIRE)
+    fire_id = tracker.record(STATION, FIRE, analysis("Fire"), fire)
+    crash = tracker.match(STATION, CRASH)
+    crash_id = tracker.record(STATION, CRASH, analysis("Collision"), crash)
+
+    assert crash.opened
+    assert crash.score < tracker.similarity
+    assert fire_id != crash_id
+    assert ids(tracker) == [fire_id, crash_id]
+
+
+def test_same_address_links_differently_worded_transcripts():
+    tracker = IncidentTracker()
+    first = tracker.match(STATION, "Caller reports smoke in the kitchen at 12 Main Street")
+    tracker.record(STATION, "", analysis("Fire", "12 Main Street"), first)
+
+    second = tracker.match(STATION, "second alarm requested, 12 main st")
+
+    assert second.incident is first.incident
+    assert second.score == 1.0
+
+
+def test_incidents_on_different_stations_stay_separate():
+    tracker = IncidentTracker()
+    first = tracker.match(STATION, FIRE)
+    tracker.record(STATION, FIRE, analysis("Fire"), first)
+
+    other = tracker.match("http://other.test/stream", FIRE)
+
+    assert other.opened
+    assert other.incident is not first.incident
+
+
+def test_provisional_incident_is_listed_only_once_confirmed():
+    tracker = IncidentTracker()
+    match = tracker.match(STATION, FIRE)
+
+    assert match.opened and match.incident.provisional
+    assert ids(tracker) == []
+    assert tracker.get_stats()["open"] == 0
+
+    incident_id = tracker.record(STATION, FIRE, analysis("Fire"), match)
+    assert ids(tracker) == [incident_id]
+    assert tracker.get_stats()["opened"] == 1
+
+
+def test_chatter_does_not_leave_an_incident_behind():
+    tracker = IncidentTracker()
+    match = tracker.match(STATION, "radio check on channel two, how copy")
+
+    assert tracker.record(STATION, "radio check on channel two, how copy", None, match) is None
+    assert ids(tracker) == []
+    assert tracker.get_stats()["opened"] == 0
+
+
+def test_follow_up_matched_before_the_first_analysis_returns_joins_its_incident():
+    tracker = IncidentTracker()
+    # Both transmissions are matched before either analysis is back
+    first = tracker.match(STATION, FIRE)
+    second = tracker.match(STATION, FIRE_FOLLOW_UP)
+    assert second.incident is first.incident
+
+    first_analysis, second_analysis = analysis("Fire"), analysis("Fire", units="Engine 5")
+    first_id = tracker.record(STATION, FIRE, first_analysis, first)
+    second_id = tracker.record(STATION, FIRE_FOLLOW_UP, second_analysis, second)
+
+    assert first_id == second_id == first_analysis["Incident"] == second_analysis["Incident"]
+    assert ids(tracker) == [first_id]
+
+
+def test_unit_only_transmission_updates_the_incident_without_analysis():
+    tracker = IncidentTracker()
+    first = tracker.match(STATION, FIRE)
+    incident_id = tracker.record(STATION, FIRE, analysis("Fire", units="Engine 5"), first)
+
+    update = tracker.match(STATION, "Ladder 7 responding")
+    assert update.unit_update
+    updated = tracker.update_analysis(update)
+
+    assert updated["Incident"] == incident_id
+    assert updated["Units Responding"] == "Engine 5, Ladder 7"
+    assert tracker.get_stats()["unit_updates"] == 1
@@ -0,0 +1,163 @@
+import json
+import os
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+import jobs
+from jobs import IngestJobManager, DONE
+
+RATE = 16000
+
+
+def recording(transmissions=3):
+    """One-second 300 Hz transmissions separated by silence."""
+    t = np.arange(RATE) / RATE
+    tone, silence = 0.5 * np.sin(2 * np.pi * 300 * t), np.zeros(int(1.5 * RATE))
+    return np.concatenate([silence] + [np.concatenate([tone, silence]) for _ in range(transmissions)]).astype(np.float32)
+
+
+class StubScheduler:
+    """Transcribes each piece as its index at once."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, station, audio, callback=None, background=False):
+        index = station.rsplit(":", 1)[1]
+        self.submitted.append((int(index), background))
+        future = Future()
+        future.set_result({"text": f" piece {index} "})
+        return future
+
+
+@pytest.fixture
+def recordings(tmp_path, monkeypatch):
+    """Recording files whose decoded audio is served from memory, since tests run without ffmpeg."""
+    audio = {}
+
+    def decode_file(path, block_samples):
+        samples = audio[path]
+        for i in range(0, len(samples), block_samples):
+            yield samples[i:i + block_samples]
+
+    def add(name, samples):
+        path = str(tmp_path / name)
+        with open(path, "wb") as f:
+            f.write(b"recording")
+        audio[path] = samples
+        return path
+
+    monkeypatch.setattr(jobs, "decode_file", decode_file)
+    return add
+
+
+def manager(tmp_path, scheduler, **kwargs):
+    return IngestJobManager(lambda size: scheduler, directory=str(tmp_path / "jobs"), **kwargs)
+
+
+def wait_until_done(jobs_manager, job_id):
+    deadline = time.time() + 10
+    while jobs_manager.status(job_id)["status"] != DONE and time.time() < deadline:
+        jobs_manager.results(job_id, wait=0.1)
+    return jobs_manager.status(job_id)
+
+
+def test_job_transcribes_every_piece_as_background_work(tmp_path, recordings):
+    scheduler = StubScheduler()
+    jobs_manager = manager(tmp_path, scheduler).start()
+
+    job_id = jobs_manager.submit(recordings("archive.mp3", recording()))["id"]
+    status = wait_until_done(jobs_manager, job_id)
+    jobs_manager.close()
+
+    assert status["pieces_total"] == status["pieces_done"] == 3
+    assert scheduler.submitted == [(0, True), (1, True), (2, True)]
+    pieces = jobs_manager.transcript(job_id)
+    assert [piece["text"] for piece in pieces] == ["piece 0", "piece 1", "piece 2"]
+    assert [piece["start"] for piece in pieces] == sorted(piece["start"] for piece in pieces)
+
+
+def test_resumed_job_skips_checkpointed_pieces(tmp_path, recordings):
+    first = manager(tmp_path, StubScheduler()).start()
+    job_id = first.submit(recordings("archive.mp3", recording()))["id"]
+    wait_until_done(first, job_id)
+    first.close()
+
+    # As if the process died after checkpointing two pieces, mid-way through writing a third
+    state_path = tmp_path / "jobs" / f"{job_id}.json"
+    state = json.loads(state_path.read_text())
+    state_path.write_text(json.dumps(dict(state, status="running", pieces_total=None)))
+    checkpoint = tmp_path / "jobs" / f"{job_id}.pieces.jsonl"
+    lines = checkpoint.read_text().splitlines()
+    torn = lines[2][:10]
+    checkpoint.write_text(lines[0] + "\n" + lines[1] + "\n" + torn)
+
+    scheduler = StubScheduler()
+    resumed = manager(tmp_path, scheduler).start()
+    assert resumed.status(job_id)["pieces_done"] == 2
+    status = wait_until_done(resumed, job_id)
+    resumed.close()
+
+    assert scheduler.submitted == [(2, True)]
+    assert status["pieces_done"] == 3
+    assert [piece["text"] for piece in resumed.transcript(job_id)] == ["piece 0", "piece 1", "piece 2"]
+    # The torn line was closed off, so the new entry is readable
+    lines = checkpoint.read_text().splitlines()
+    assert lines[2] == torn
+    assert [json.loads(line)["index"] for line in lines[:2] + lines[3:]] == [0, 1, 2]
+
+
+def test_uploaded_recording_is_removed_once_transcribed(tmp_path, recordings):
+    jobs_manager = manager(tmp_path, StubScheduler()).start()
+    path = recordings("upload.mp3", recording(1))
+
+    job_id = jobs_manager.submit(path, upload=True)["id"]
+    wait_until_done(jobs_manager, job_id)
+    # The upload is removed just after the job is marked done
+    deadline = time.time() + 5
+    while os.path.exists(path) and time.time() < deadline:
+        time.sleep(0.01)
+    jobs_manager.close()
+
+    assert not os.path.exists(path)
+
+
+@pytest.fixture
+def ingest_dir(tmp_path):
+    root = tmp_path / "ingest"
+    (root / "scanner").mkdir(parents=True)
+    (root / "scanner" / "archive.mp3").write_bytes(b"recording")
+    # A sibling whose name starts like the ingest directory, and a file outside it
+    (tmp_path / "ingest-private").mkdir()
+    (tmp_path / "ingest-private" / "secret.mp3").write_bytes(b"secret")
+    (root / "escape.mp3").symlink_to(tmp_path / "ingest-private" / "secret.mp3")
+    return root
+
+
+def test_local_path_resolves_recordings_inside_the_ingest_dir(tmp_path, ingest_dir):
+    jobs_manager = manager(tmp_path, StubScheduler(), ingest_dir=str(ingest_dir))
+
+    assert jobs_manager.local_path("scanner/archive.mp3") == os.path.realpath(ingest_dir / "scanner" / "archive.mp3")
+    assert jobs_manager.local_path("scanner/../scanner/archive.mp3") == os.path.realpath(
+        ingest_dir / "scanner" / "archive.mp3")
+
+
+@pytest.mark.parametrize("path", [
+    "../ingest-private/secret.mp3",
+    "scanner/../../ingest-private/secret.mp3",
+    "/etc/passwd",
+    "escape.mp3",  # Symlink pointing outside
+])
+def test_local_path_refuses_paths_outside_the_ingest_dir(tmp_path, ingest_dir, path):
+    jobs_manager = manager(tmp_path, StubScheduler(), ingest_dir=str(ingest_dir))
+
+    assert jobs_manager.local_path(path) is None
+
+
+def test_local_path_refuses_everything_without_an_ingest_dir(tmp_path):
+    jobs_manager = manager(tmp_path, StubScheduler(), ingest_dir=None)
+
+    assert jobs_manager.local_path("archive.mp3") is None
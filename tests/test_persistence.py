@@ -0,0 +1,102 @@
+import json
+import threading
+
+from persistence import IncidentWriter, SQLiteIncidentStore
+
+
+class FlakyStore(SQLiteIncidentStore):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def insert_many(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("store unavailable")
+        return super().insert_many(rows)
+
+
+class GatedStore(SQLiteIncidentStore):
+    """Holds every insert until released, so submissions pile up."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def insert_many(self, rows):
+        self.gate.wait()
+        return super().insert_many(rows)
+
+
+def rows(n):
+    return [{"title": f"Incident {i}", "type": "fire", "severity": 2} for i in range(n)]
+
+
+def test_overflow_rows_resolve_their_futures(tmp_path):
+    store = GatedStore()
+    writer = IncidentWriter(store, batch_size=2, flush_interval=0.05, max_buffer=3,
+                            spool_path=str(tmp_path / "spool.jsonl"), retry_backoff=0.01)
+
+    futures = [writer.submit(row) for row in rows(10)]
+    assert writer.get_stats()["spooled_only"] == 7
+    store.gate.set()
+    stored = [future.result(timeout=5) for future in futures]
+    writer.close()
+
+    assert [row["title"] for row in stored] == [f"Incident {i}" for i in range(10)]
+    assert len({row["id"] for row in stored}) == 10
+    assert store.count() == 10
+
+
+def test_spool_replays_rows_left_by_a_previous_run(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    # Four rows submitted and one acknowledged before a crash, the last line torn
+    lines = [json.dumps({"op": "insert", "id": f"r{i}", "row": row}) for i, row in enumerate(rows(4))]
+    lines.append(json.dumps({"op": "ack", "ids": ["r0"]}))
+    spool.write_text("\n".join(lines) + '\n{"op": "ins')
+
+    store = SQLiteIncidentStore()
+    writer = IncidentWriter(store, batch_size=5, flush_interval=0.05, max_buffer=2, spool_path=str(spool))
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert store.count() == 3
+    assert spool.read_text() == ""
+
+
+def test_failed_inserts_are_retried(tmp_path):
+    store = FlakyStore(failures=2)
+    writer = IncidentWriter(store, batch_size=1, flush_interval=0.05, spool_path=str(tmp_path / "spool.jsonl"),
+                            max_retries=3, retry_backoff=0.01)
+
+    assert writer.submit(rows(1)[0]).result(timeout=5)["id"] == 1
+    writer.close()
+    assert writer.get_stats()["retries"] == 2
+
+
+def test_spool_is_compacted_while_rows_are_pending(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+
+    class SpoolWatchingStore(GatedStore):
+        snapshots = []
+
+        def insert_many(self, rows):
+            self.snapshots.append(spool.read_text())
+            return super().insert_many(rows)
+
+    store = SpoolWatchingStore()
+    writer = IncidentWriter(store, batch_size=2, flush_interval=0.01, max_buffer=2, spool_path=str(spool),
+                            compact_after=4)
+
+    futures = [writer.submit(row) for row in rows(10)]
+    store.gate.set()
+    stored = [future.result(timeout=5) for future in futures]
+    writer.close()
+
+    assert [row["title"] for row in stored] == [f"Incident {i}" for i in range(10)]
+    # Rewritten after every four stored rows, until the last ones emptied it
+    assert writer.get_stats()["compactions"] == 2
+    counts = [(text.count('"op": "insert"'), text.count('"op": "ack"')) for text in store.snapshots]
+    assert counts[2] == (6, 0)
+    assert counts[4] == (2, 0)
+    assert spool.read_text() == ""
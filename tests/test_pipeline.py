@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import BoundedQueue, Supervisor, Empty, DROP_OLDEST, DROP_NEWEST, BLOCK
+
+
+def drain(queue):
+    items = []
+    while True:
+        try:
+            items.append(queue.get(timeout=0))
+        except Empty:
+            return items
+
+
+def test_drop_oldest_keeps_the_newest_items():
+    queue = BoundedQueue(3, DROP_OLDEST)
+    results = [queue.put(i) for i in range(5)]
+
+    assert results == [True] * 5
+    assert queue.dropped == 2
+    assert drain(queue) == [2, 3, 4]
+
+
+def test_drop_newest_rejects_items_while_full():
+    queue = BoundedQueue(3, DROP_NEWEST)
+    results = [queue.put(i) for i in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert queue.dropped == 2
+    assert drain(queue) == [0, 1, 2]
+
+
+def test_block_waits_for_room():
+    queue = BoundedQueue(1, BLOCK)
+    queue.put(0)
+    put = []
+    producer = threading.Thread(target=lambda: put.append(queue.put(1, timeout=5)))
+    producer.start()
+    time.sleep(0.1)
+    assert put == []
+
+    assert queue.get(timeout=1) == 0
+    producer.join(5)
+    assert put == [True]
+    assert queue.get(timeout=1) == 1
+    assert queue.dropped == 0
+
+
+def test_block_drops_after_timeout():
+    queue = BoundedQueue(1, BLOCK)
+    queue.put(0)
+
+    assert queue.put(1, timeout=0.05) is False
+    assert queue.dropped == 1
+    assert queue.get_stats() == {"depth": 1, "maxsize": 1, "policy": BLOCK, "dropped": 1}
+
+
+def test_close_wakes_blocked_consumers_and_producers():
+    queue = BoundedQueue(1, BLOCK)
+    queue.put(0)
+    blocked_put = []
+    producer = threading.Thread(target=lambda: blocked_put.append(queue.put(1)))
+    producer.start()
+    time.sleep(0.05)
+
+    queue.close()
+    producer.join(5)
+    assert blocked_put == [False]
+    assert queue.get(timeout=1) == 0
+    with pytest.raises(Empty):
+        queue.get()
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BoundedQueue(1, "drop_random")
+
+
+def test_crashed_stage_is_restarted_with_backoff():
+    supervisor = Supervisor("station", restart_backoff=0.05, max_backoff=1.0)
+    runs = []
+
+    def stage():
+        runs.append(time.time())
+        if len(runs) < 3:
+            raise RuntimeError("boom")
+        supervisor.wait(10)
+
+    supervisor.add_stage("transcribe", stage)
+    deadline = time.time() + 5
+    while len(runs) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    supervisor.stop(timeout=2)
+
+    assert len(runs) == 3
+    assert supervisor.restarts == {"transcribe": 2}
+    # The second restart waits twice as long as the first
+    assert runs[1] - runs[0] >= 0.05
+    assert runs[2] - runs[1] >= 0.1
+    assert supervisor.get_stats()["alive_stages"] == 0
+
+
+def test_stop_runs_cancel_hooks_and_ends_stages():
+    supervisor = Supervisor("station")
+    queue = BoundedQueue(1)
+    supervisor.on_cancel(queue.close)
+
+    def stage():
+        while not supervisor.stopped:
+            try:
+                queue.get()
+            except Empty:
+                continue
+
+    supervisor.add_stage("analyze", stage)
+    started = time.time()
+    supervisor.stop(timeout=2)
+
+    assert queue.closed
+    assert time.time() - started < 1
+    assert supervisor.get_stats() == {"alive_stages": 0, "restarts": {"analyze": 0}}
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import radio
+from fixtures.radio_browser import serve
+
+
+@pytest.fixture
+def radio_browser(monkeypatch):
+    """Slow local Radio-Browser with radio's cache and client reset around each test."""
+    server = serve(port=0, latency=0.3)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(radio, "RADIO_BROWSER_API", f"http://127.0.0.1:{server.server_address[1]}/json/stations/bytag/")
+    monkeypatch.setattr(radio, "_cache", {})
+    monkeypatch.setattr(radio, "_inflight", {})
+    monkeypatch.setattr(radio, "_stats", dict.fromkeys(radio._stats, 0))
+    monkeypatch.setattr(radio, "_client", None)
+    yield server.handler
+    server.shutdown()
+
+
+def test_concurrent_misses_share_one_request(radio_browser):
+    async def fetch_all():
+        try:
+            return await asyncio.gather(*(radio.get_radio_stations("police", 5) for _ in range(20)))
+        finally:
+            await radio.close_client()
+
+    results = asyncio.run(fetch_all())
+
+    assert radio_browser.hits == {"police": 1}
+    assert all(stations == results[0] for stations in results)
+    assert len(results[0]) == 5
+    stats = radio.get_station_cache_stats()
+    assert stats["misses"] == 20
+    assert stats["upstream_requests"] == 1
+    assert stats["inflight"] == 0
+
+
+def test_fresh_entries_are_served_from_cache(radio_browser):
+    async def fetch_twice():
+        try:
+            first = await radio.get_radio_stations("fire", 5)
+            started = time.monotonic()
+            second = await radio.get_radio_stations("fire", 5)
+            return first, second, time.monotonic() - started
+        finally:
+            await radio.close_client()
+
+    first, second, elapsed = asyncio.run(fetch_twice())
+
+    assert first == second
+    assert elapsed < 0.1
+    assert radio_browser.hits == {"fire": 1}
+    assert radio.get_station_cache_stats()["hits"] == 1
@@ -0,0 +1,202 @@
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+import models
+from models import ModelRegistry
+from scheduler import InferenceScheduler
+
+
+class StubRegistry(ModelRegistry):
+    """Registry whose models are plain objects, so nothing needs Whisper."""
+
+    def _load(self, entry, size, device):
+        entry.model = object()
+        self._stats["loads"] += 1
+
+
+class GatedScheduler(InferenceScheduler):
+    """Holds every batch until `gate` is set, then looks the model up like the real one."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.gate = threading.Event()
+
+    def _transcribe_batch(self, audios):
+        self.gate.wait(10)
+        self.registry.get(self.model_size)
+        return [{"text": "ok", "segments": []} for _ in audios]
+
+
+@pytest.fixture(autouse=True)
+def cpu_device(monkeypatch):
+    monkeypatch.setattr(models, "default_device", lambda: "cpu")
+
+
+def test_model_stays_loaded_until_queued_chunks_drain_after_stop():
+    registry = StubRegistry(pinned=())
+    scheduler = GatedScheduler("small", registry=registry, max_batch_size=4, max_wait=0.01)
+
+    # A station takes its reference, queues a chunk and stops before it is transcribed
+    registry.acquire("small")
+    future = scheduler.submit("station", np.zeros(1600, dtype=np.float32))
+    registry.release("small")
+    assert registry.get_stats()["models"]["small@cpu"]["refs"] == 1
+
+    scheduler.gate.set()
+    assert future.result(timeout=10)["text"] == "ok"
+
+    # The batch gives its reference back just after resolving the future
+    deadline = time.time() + 5
+    while registry.get_stats()["models"] and time.time() < deadline:
+        time.sleep(0.01)
+    stats = registry.get_stats()
+    assert stats["models"] == {}
+    assert stats["loads"] == stats["unloads"] == 1
+
+
+class RecordingScheduler(InferenceScheduler):
+    """Records the chunk ids of every batch; the first batch waits for `gate`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, registry=StubRegistry(pinned=()), **kwargs)
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.batches = []
+
+    def _transcribe_batch(self, audios):
+        self.started.set()
+        self.gate.wait(10)
+        self.batches.append([int(audio[0]) for audio in audios])
+        return [{"text": str(int(audio[0])), "segments": []} for audio in audios]
+
+
+def chunk(chunk_id, samples=16):
+    return np.full(samples, chunk_id, dtype=np.float32)
+
+
+def test_live_chunks_are_served_before_background_ones():
+    scheduler = RecordingScheduler(max_batch_size=2, max_wait=0.01)
+    first = scheduler.submit("station", chunk(0))
+    assert scheduler.started.wait(5)
+
+    futures = [scheduler.submit("job", chunk(1), background=True), scheduler.submit("job", chunk(2), background=True)]
+    futures += [scheduler.submit("station", chunk(3)), scheduler.submit("station", chunk(4))]
+    # Everything queued behind the first batch is past max_wait by the time it finishes
+    time.sleep(0.1)
+    scheduler.gate.set()
+    for future in [first] + futures:
+        future.result(timeout=5)
+
+    # The backlog is taken in full batches, live first
+    assert scheduler.batches == [[0], [3, 4], [1, 2]]
+    assert scheduler.get_stats()["background_requests"] == 2
+
+
+def test_batch_closes_when_full_or_after_max_wait():
+    scheduler = RecordingScheduler(max_batch_size=3, max_wait=0.3)
+    scheduler.gate.set()
+
+    submitted = time.time()
+    futures = [scheduler.submit("station", chunk(i)) for i in range(7)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert scheduler.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    # The last batch was not full, so it waited for more chunks until max_wait passed
+    assert time.time() - submitted >= 0.3
+    stats = scheduler.get_stats()
+    assert stats["batches"] == 3
+    assert stats["avg_batch_size"] == pytest.approx(7 / 3)
+
+
+# Decoding outcomes per chunk id and temperature; missing temperatures reuse the last one
+GOOD = dict(avg_logprob=-0.3, compression_ratio=1.5, no_speech_prob=0.1)
+REPETITIVE = dict(avg_logprob=-0.3, compression_ratio=3.0, no_speech_prob=0.1)
+UNSURE = dict(avg_logprob=-1.5, compression_ratio=1.5, no_speech_prob=0.1)
+SILENT = dict(avg_logprob=-1.5, compression_ratio=1.5, no_speech_prob=0.9)
+OUTCOMES = {
+    1: [GOOD],
+    2: [REPETITIVE, GOOD],
+    3: [UNSURE, UNSURE, GOOD],
+    4: [SILENT],
+}
+
+
+class StubModel:
+    dims = types.SimpleNamespace(n_mels=80)
+    device = types.SimpleNamespace(type="cpu")
+
+    def __init__(self):
+        self.decoded = []  # (temperature, chunk ids) per decode call
+        self.transcribed = []
+
+    def transcribe(self, audio):
+        self.transcribed.append(int(audio[0]))
+        return {"text": "long", "segments": []}
+
+    def decode(self, mel, options):
+        ids = [int(audio[0]) for audio in mel]
+        self.decoded.append((options.temperature, ids))
+        results = []
+        for chunk_id in ids:
+            attempt = sum(chunk_id in batch for _, batch in self.decoded) - 1
+            outcome = OUTCOMES[chunk_id][min(attempt, len(OUTCOMES[chunk_id]) - 1)]
+            results.append(types.SimpleNamespace(
+                text=f"chunk {chunk_id} at {options.temperature}", language="en",
+                temperature=options.temperature, **outcome
+            ))
+        return results
+
+
+@pytest.fixture
+def stub_whisper(monkeypatch):
+    """Just enough of whisper and torch for _transcribe_batch, decoding through StubModel."""
+    class Batch(list):
+        def to(self, device):
+            return self
+
+    whisper = types.SimpleNamespace(
+        audio=types.SimpleNamespace(N_SAMPLES=100),
+        pad_or_trim=lambda audio: audio,
+        log_mel_spectrogram=lambda audio, n_mels: audio,
+        DecodingOptions=lambda **options: types.SimpleNamespace(**options),
+        decode=lambda model, mel, options: model.decode(mel, options),
+    )
+    monkeypatch.setitem(sys.modules, "whisper", whisper)
+    monkeypatch.setitem(sys.modules, "torch", types.SimpleNamespace(stack=Batch))
+
+    model = StubModel()
+    registry = StubRegistry(pinned=())
+    monkeypatch.setattr(registry, "_load", lambda entry, size, device: setattr(entry, "model", model))
+    return InferenceScheduler("small", registry=registry), model
+
+
+def test_failed_decodings_fall_back_to_higher_temperatures_together(stub_whisper):
+    scheduler, model = stub_whisper
+
+    results = scheduler._transcribe_batch([chunk(1), chunk(2), chunk(3), chunk(4), chunk(5, samples=200)])
+
+    assert model.decoded == [(0.0, [1, 2, 3, 4]), (0.2, [2, 3]), (0.4, [3])]
+    assert [result["text"] for result in results] == [
+        "chunk 1 at 0.0", "chunk 2 at 0.2", "chunk 3 at 0.4", "", "long"
+    ]
+    # Silence is not retried and comes back empty, like model.transcribe
+    assert results[3]["segments"] == []
+    # Longer than Whisper's window, so transcribed on its own
+    assert model.transcribed == [5]
+
+
+def test_fallback_stops_at_the_last_temperature(stub_whisper, monkeypatch):
+    scheduler, model = stub_whisper
+    monkeypatch.setitem(OUTCOMES, 1, [REPETITIVE])
+
+    result, = scheduler._transcribe_batch([chunk(1)])
+
+    assert [temperature for temperature, _ in model.decoded] == [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]
+    assert result["segments"][0]["temperature"] == 1.0
+    assert result["segments"][0]["compression_ratio"] == 3.0
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from segmenter import SilenceSegmenter
+from vad import EnergyVAD
+
+RATE = 16000
+
+
+def audio(*parts):
+    """Concatenates ("tone" | "silence", seconds) parts; the tone is a 300 Hz sine."""
+    pieces = []
+    for kind, seconds in parts:
+        t = np.arange(int(round(seconds * RATE))) / RATE
+        pieces.append(0.5 * np.sin(2 * np.pi * 300 * t) if kind == "tone" else np.zeros_like(t))
+    return np.concatenate(pieces).astype(np.float32)
+
+
+def segment(samples, block=8000, padding_seconds=0.0, flush=False, **kwargs):
+    """Feeds samples in blocks; returns (start, seconds) per segment and the segmenter."""
+    options = dict(min_seconds=0.5, max_seconds=2.0, hard_cap_seconds=3.0, silence_gap=0.3)
+    options.update(kwargs)
+    segmenter = SilenceSegmenter(EnergyVAD(frame_ms=10, padding_seconds=padding_seconds), **options)
+    segments = []
+    for i in range(0, len(samples), block):
+        segments += segmenter.feed_timed(samples[i:i + block])
+    if flush:
+        segments += segmenter.flush_timed()
+    return [(round(start, 2), round(len(pcm) / RATE, 2)) for start, pcm in segments], segmenter
+
+
+@pytest.mark.parametrize("block", [8000, 1234])
+def test_transmissions_are_cut_at_silences(block):
+    samples = audio(("silence", 0.5), ("tone", 1.0), ("silence", 1.0), ("tone", 0.8), ("silence", 1.0))
+
+    segments, segmenter = segment(samples, block=block)
+
+    assert segments == [(0.5, 1.0), (2.5, 0.8)]
+    assert segmenter.get_stats()["segments"] == 2
+
+
+def test_short_pauses_do_not_split_a_transmission():
+    samples = audio(("tone", 0.6), ("silence", 0.2), ("tone", 0.6), ("silence", 1.0))
+
+    segments, _ = segment(samples)
+
+    assert segments == [(0.0, 1.4)]
+
+
+def test_bursts_shorter_than_min_seconds_are_discarded():
+    samples = audio(("silence", 0.2), ("tone", 0.3), ("silence", 1.0), ("tone", 0.6), ("silence", 1.0))
+
+    segments, segmenter = segment(samples)
+
+    assert segments == [(1.5, 0.6)]
+    assert segmenter.get_stats()["segments_discarded"] == 1
+
+
+def test_any_pause_closes_a_segment_past_max_seconds():
+    # The first pause is too short to end it; the second comes after max_seconds
+    samples = audio(("tone", 0.9), ("silence", 0.1), ("tone", 1.4), ("silence", 0.1), ("tone", 0.7),
+                    ("silence", 1.0))
+
+    segments, _ = segment(samples)
+
+    assert segments == [(0.0, 2.4), (2.5, 0.7)]
+
+
+def test_continuous_audio_is_cut_at_the_hard_cap():
+    samples = audio(("tone", 7.0), ("silence", 1.0))
+
+    segments, segmenter = segment(samples)
+
+    assert segments == [(0.0, 3.0), (3.0, 3.0), (6.0, 1.0)]
+    assert segmenter.get_stats()["segments_capped"] == 2
+
+
+def test_padding_keeps_silence_around_the_transmission():
+    samples = audio(("silence", 1.0), ("tone", 1.0), ("silence", 1.0))
+
+    segments, _ = segment(samples, padding_seconds=0.1)
+
+    assert segments == [(0.9, 1.2)]
+
+
+def test_flush_closes_the_open_segment():
+    segments, segmenter = segment(audio(("silence", 0.5), ("tone", 1.0)), flush=True)
+
+    assert segments == [(0.5, 1.0)]
+    assert segmenter.flush() == []
@@ -0,0 +1,55 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from pipeline import Supervisor
+from transcriber import LiveTranscriber, incident_tracker
+
+
+class HeldScheduler:
+    """Scheduler whose futures only resolve when the test says so."""
+
+    def __init__(self):
+        self.futures = []
+        self.submitted = threading.Event()
+
+    def submit(self, station, audio, callback=None, background=False):
+        future = Future()
+        self.futures.append(future)
+        self.submitted.set()
+        return future
+
+
+def start_stages(transcriber):
+    transcriber.station_url = "http://station.test/stream"
+    transcriber.supervisor = Supervisor(transcriber.station_url)
+    transcriber.supervisor.on_cancel(transcriber._cancel_io)
+    transcriber.supervisor.add_stage("transcribe", transcriber._process_audio)
+    transcriber.supervisor.add_stage("analyze", transcriber._process_analysis)
+
+
+def test_stages_blocked_on_results_exit_on_stop_without_calling_back():
+    transcriber = LiveTranscriber(segmentation="fixed", vad=None)
+    transcriber.scheduler = HeldScheduler()
+    calls = []
+    transcriber.callback = lambda text, analysis: calls.append(text)
+    start_stages(transcriber)
+
+    transcriber.audio_queue.put((np.zeros(1600, dtype=np.float32), time.time()))
+    pending = Future()
+    match = incident_tracker.match(transcriber.station_url, "Engine 5 responding")
+    transcriber.analysis_queue.put(("Engine 5 responding", pending, False, match, time.time(), 1.0, time.time()))
+    assert transcriber.scheduler.submitted.wait(5)
+    time.sleep(0.1)
+
+    transcriber.stop_streaming(timeout=0.1)
+    # Results arriving after the stop are ignored
+    transcriber.scheduler.futures[0].set_result({"text": "Engine 5 responding"})
+    pending.set_result({"Type": "Fire"})
+
+    for thread in transcriber.supervisor.threads:
+        thread.join(3)
+        assert not thread.is_alive()
+    assert calls == []
@@ -0,0 +1,93 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from metrics import TRANSCRIPTS_DROPPED
+from transcripts import TranscriptStore
+
+BASE = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TranscriptStore(path=str(tmp_path / "transcripts.sqlite3"), flush_interval=0.01)
+    # Timestamps run backwards against id for half the rows, as when a backlog is written late
+    for i in range(400):
+        minutes = i if i % 2 else 400 - i
+        store.add(f"station-{i % 4}", {
+            "seq": i, "text": f"unit {i} responding",
+            "analysis": {"Severity": "High" if i % 3 == 0 else "Low"},
+            "timestamp": (BASE + timedelta(minutes=minutes)).isoformat(),
+        })
+    store.flush(timeout=10)
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("filters", [
+    {"start": BASE + timedelta(minutes=100)},
+    {"end": BASE + timedelta(minutes=50)},
+    {"start": BASE + timedelta(minutes=100), "end": BASE + timedelta(minutes=200)},
+    {"station_url": "station-1", "start": BASE + timedelta(minutes=300)},
+    {"severity": "high", "end": BASE + timedelta(minutes=100)},
+    {"station_url": "station-1", "severity": "high", "start": BASE},
+])
+def test_time_filtered_search_uses_an_index_without_sorting(store, filters):
+    plan = " ".join(store.explain(before=250, **filters))
+
+    assert "USING" in plan and "INDEX" in plan
+    assert "TEMP B-TREE" not in plan
+    assert "SCAN t" not in plan.replace("SCAN t USING", "")
+
+
+def test_time_filtered_pages_cover_the_range_newest_first(store):
+    start, end = BASE + timedelta(minutes=100), BASE + timedelta(minutes=300)
+    seen, before = [], None
+    while True:
+        page = store.search(start=start, end=end, limit=7, before=before)
+        seen.extend(page["results"])
+        before = page["next_before"]
+        if before is None:
+            break
+
+    expected = [(BASE + timedelta(minutes=i if i % 2 else 400 - i)) for i in range(400)]
+    assert len(seen) == sum(start <= ts <= end for ts in expected)
+    assert len({r["id"] for r in seen}) == len(seen)
+    keys = [(r["timestamp"], r["id"]) for r in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_full_queue_drops_are_counted_and_logged(tmp_path, monkeypatch, caplog):
+    store = TranscriptStore(path=str(tmp_path / "transcripts.sqlite3"), queue_size=1)
+    release, writing = threading.Event(), threading.Event()
+    write = store._write
+
+    def blocked_write(batch):
+        writing.set()
+        release.wait(10)
+        write(batch)
+
+    monkeypatch.setattr(store, "_write", blocked_write)
+    entry = {"seq": 0, "text": "unit responding", "analysis": None, "timestamp": BASE.isoformat()}
+    store.add("station-full", entry)
+    assert writing.wait(5)
+    # The writer holds the first entry and the queue the second; the rest are dropped
+    store.add("station-full", entry)
+    before = TRANSCRIPTS_DROPPED.labels("station-full").value
+    with caplog.at_level(logging.WARNING, logger="transcripts"):
+        adders = [threading.Thread(target=lambda: [store.add("station-full", entry) for _ in range(50)])
+                  for _ in range(4)]
+        for adder in adders:
+            adder.start()
+        for adder in adders:
+            adder.join()
+    release.set()
+    store.flush(timeout=10)
+
+    assert store.get_stats()["dropped"] == 200
+    assert store.get_stats()["written"] == 2
+    assert TRANSCRIPTS_DROPPED.labels("station-full").value - before == 200
+    assert sum("dropped transcript" in record.getMessage() for record in caplog.records) == 200
+    store.close()
@@ -1,193 +1,474 @@
 from io import BytesIO
+import numpy as np
+from scipy.io import wavfile
 import requests
-import whisper
+import threading
 from pydub import AudioSegment
 import time
-import io
-import threading
-import queue
-from config import MODEL_SIZE
-from openai import OpenAI
+import logging
+from config import (
+    MODEL_SIZE, INFERENCE_BACKEND, CASCADE_ENABLED, CASCADE_TIERS, VAD_ENABLED, SEGMENTATION, SEGMENT_BLOCK_SECONDS, DECODER_BUFFER_SECONDS,
+    PIPELINE_AUDIO_QUEUE_SIZE, PIPELINE_AUDIO_QUEUE_POLICY, PIPELINE_ANALYSIS_QUEUE_SIZE,
+    PIPELINE_ANALYSIS_QUEUE_POLICY, PIPELINE_STOP_TIMEOUT, STREAM_READ_TIMEOUT,
+    RECONNECT_BACKOFF, RECONNECT_MAX_BACKOFF, DEDUPE_ENABLED, DEDUPE_CHECK_SECONDS
+)
+from models import registry
+from scheduler import InferenceScheduler
+from cascade import ModelCascade
+from workers import WhisperWorkerPool
+from preprocess import AudioPreprocessor, SAMPLE_DTYPES
+from decoder import StreamDecoder, PCMRingBuffer, SAMPLE_RATE
+from pipeline import BoundedQueue, Supervisor, Empty
+from vad import EnergyVAD
+from segmenter import SilenceSegmenter
+from prefilter import DispatchPreFilter, AnalysisCache, EMERGENCY_KEYWORDS
+from analysis import AnalysisService
+from incidents import IncidentTracker
+from fingerprint import Fingerprinter, FingerprintIndex
+from metrics import (
+    STREAM_BYTES, STREAM_RECONNECTS, STREAM_MIRRORED, DECODED_AUDIO, STAGE_SECONDS, QUEUE_WAIT, TRANSCRIBE_RTF,
+    ANALYSIS_ROUTES, LLM_SECONDS, LLM_REQUESTS, VALIDATION
+)
+from concurrent.futures import Future, wait
 from datetime import datetime
 from typing import Dict
 
-# Load Whisper model
-model = whisper.load_model(MODEL_SIZE)
+logger = logging.getLogger(__name__)
+
+# Shared by every station so chunks can be batched together, or spread
+# across worker processes. Nothing is loaded until first use or warm_up().
+if INFERENCE_BACKEND == "process_pool":
+    scheduler = WhisperWorkerPool()
+else:
+    scheduler = InferenceScheduler(MODEL_SIZE)
+
+# Stations asking for another model size share one batching scheduler per size
+schedulers = {MODEL_SIZE: scheduler}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(model_size=MODEL_SIZE):
+    with _schedulers_lock:
+        if model_size not in schedulers:
+            schedulers[model_size] = InferenceScheduler(model_size)
+        return schedulers[model_size]
+
+# Stations on the default size go through the cascade when it is enabled
+cascade = ModelCascade([(size, get_scheduler(size)) for size in CASCADE_TIERS]) if CASCADE_ENABLED else None
+if cascade:
+    # Every cascade station shares the tier models without holding references
+    registry.pin(*CASCADE_TIERS)
+
+def warm_up():
+    """Starts loading the default models in the background so the first chunk is not slow."""
+    for size in (CASCADE_TIERS if cascade else (MODEL_SIZE,)):
+        if isinstance(schedulers[size], WhisperWorkerPool):
+            schedulers[size].start()
+        else:
+            registry.warm_up(size)
+
+# Shared so rebroadcasts on any station hit the same cache
+prefilter = DispatchPreFilter()
+analysis_cache = AnalysisCache()
+
+# One pooled, rate-limited LLM client for all stations
+analysis_service = AnalysisService()
+
+# Links follow-up transmissions to each station's open incidents
+incident_tracker = IncidentTracker()
+
+# Mirrored station URLs carrying the same audio share one transcription pipeline
+fingerprints = FingerprintIndex() if DEDUPE_ENABLED else None
+live_transcribers = {}  # station_url -> running LiveTranscriber
 
 class LiveTranscriber:
-    def __init__(self, chunk_duration=10):
-        self.audio_queue = queue.Queue()
-        self.is_running = False
-        self.chunk_duration = chunk_duration  # Duration in seconds
-        self.buffer = io.BytesIO()
-        self.current_chunk_start = time.time()
+    def __init__(self, chunk_duration=10, vad=None, segmentation=SEGMENTATION, model_size=MODEL_SIZE):
+        # Bounded hand-offs between stages keep per-station memory flat under overload
+        self.audio_queue = BoundedQueue(PIPELINE_AUDIO_QUEUE_SIZE, PIPELINE_AUDIO_QUEUE_POLICY)
+        self.analysis_queue = BoundedQueue(PIPELINE_ANALYSIS_QUEUE_SIZE, PIPELINE_ANALYSIS_QUEUE_POLICY)
+        self.chunk_duration = chunk_duration  # Duration in seconds, used by "fixed" segmentation
+        self.chunk_samples = int(chunk_duration * SAMPLE_RATE)
+        # Decoded PCM survives reconnects; the oldest audio is dropped if decoding outpaces segmenting
+        self.ring = PCMRingBuffer(int(SAMPLE_RATE * DECODER_BUFFER_SECONDS))
+        self.decoder = None
+        self.station_url = None
+        self.supervisor = None
+        self.reconnects = 0
+        self._response = None
+        self.model_size = model_size
+        self.scheduler = cascade if cascade and model_size == MODEL_SIZE else get_scheduler(model_size)
+        # In-process models are reference counted so unused sizes can be unloaded
+        self._model_ref = False
+        # Any VoiceActivityDetector; silent chunks are dropped before the queue
+        self.vad = vad if vad is not None else (EnergyVAD() if VAD_ENABLED else None)
+        # "silence" cuts at pauses between transmissions, "fixed" every chunk_duration
+        self.segmenter = None
+        self.block_samples = self.chunk_samples
+        if segmentation == "silence":
+            self.segmenter = SilenceSegmenter(self.vad or EnergyVAD())
+            self.block_samples = int(SEGMENT_BLOCK_SECONDS * SAMPLE_RATE)
+        # Segments are already trimmed by the segmenter or VAD
+        self.preprocessor = AudioPreprocessor(trim=self.vad is None and self.segmenter is None)
+        # Optional hook called as observer(station_url, stage, seconds, audio_seconds) for
+        # the preprocess, transcribe, analysis and end_to_end stages of every segment
+        self.observer = None
+        self.callback = None
+        # While this station mirrors another, it only fingerprints its audio and the
+        # leader's results are passed to its callback through the leader's subscribers
+        self.fingerprinter = Fingerprinter() if fingerprints is not None else None
+        self.leader = None
+        self.subscribers = {}  # station_url -> callback(text, analysis) of stations mirroring this one
+        self.started_at = None
+        self._next_mirror_check = DEDUPE_CHECK_SECONDS
+
+    @property
+    def is_running(self):
+        return self.supervisor is not None and not self.supervisor.stopped
 
     def start_streaming(self, url):
-        self.is_running = True
-        
-        # Start stream capture thread
-        stream_thread = threading.Thread(target=self._capture_stream, args=(url,))
-        stream_thread.daemon = True
-        stream_thread.start()
+        self.station_url = url
+        self.started_at = time.time()
+        live_transcribers[url] = self
+        if isinstance(self.scheduler, InferenceScheduler) and not self._model_ref:
+            registry.acquire(self.model_size)
+            self._model_ref = True
+        self.supervisor = Supervisor(url)
+        self.supervisor.on_cancel(self._cancel_io)
         
-        # Start transcription thread
-        transcribe_thread = threading.Thread(target=self._process_audio)
-        transcribe_thread.daemon = True
-        transcribe_thread.start()
+        # capture -> decode -> transcribe -> analyze, each restarted if it crashes
+        self.supervisor.add_stage("capture", self._capture_stream)
+        self.supervisor.add_stage("decode", self._decode_audio)
+        self.supervisor.add_stage("transcribe", self._process_audio)
+        self.supervisor.add_stage("analyze", self._process_analysis)
         
-        return stream_thread, transcribe_thread
+        return self.supervisor.threads
 
-    def stop_streaming(self):
-        self.is_running = False
+    def stop_streaming(self, timeout=PIPELINE_STOP_TIMEOUT):
+        """Stops every stage, closing the stream and decoder so blocked reads return at once."""
+        if self.supervisor is not None:
+            self.supervisor.stop(timeout)
+        if live_transcribers.get(self.station_url) is self:
+            del live_transcribers[self.station_url]
+        self._unfollow()
+        # Mirrors of this station go back to transcribing for themselves
+        for follower in [t for t in list(live_transcribers.values()) if t.leader is self]:
+            follower._unfollow()
+        if fingerprints is not None:
+            fingerprints.remove(self.station_url)
+        if self._model_ref:
+            registry.release(self.model_size)
+            self._model_ref = False
 
-    def _capture_stream(self, url):
-        try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            for chunk in response.iter_content(chunk_size=1024):
-                if not self.is_running:
-                    break
-                    
-                self.buffer.write(chunk)
+    def get_stats(self):
+        return {
+            "model_size": self.model_size,
+            "audio_queue": self.audio_queue.get_stats(),
+            "analysis_queue": self.analysis_queue.get_stats(),
+            "decoded_samples_dropped": self.ring.dropped,
+            "reconnects": self.reconnects,
+            "mirror_of": self.leader.station_url if self.leader else None,
+            "mirrors": list(self.subscribers),
+            "supervisor": self.supervisor.get_stats() if self.supervisor else None,
+            "vad": self.vad.get_stats() if self.vad and not self.segmenter else None,
+            "segmenter": self.segmenter.get_stats() if self.segmenter else None
+        }
+
+    def _cancel_io(self):
+        response = self._response
+        if response is not None:
+            response.close()
+        if self.decoder is not None:
+            self.decoder.close()
+        self.ring.close()
+        self.audio_queue.close()
+        self.analysis_queue.close()
+
+    def _capture_stream(self):
+        backoff = RECONNECT_BACKOFF
+        while self.is_running:
+            try:
+                if self.decoder is None or not self.decoder.alive:
+                    if self.decoder is not None:
+                        self.decoder.close()
+                    self.decoder = StreamDecoder(ring=self.ring).start()
                 
-                # Check if we've captured enough audio
-                if time.time() - self.current_chunk_start >= self.chunk_duration:
-                    # Process the current buffer
-                    self.buffer.seek(0)
-                    audio = AudioSegment.from_file(self.buffer, format="mp3")
-                    self.audio_queue.put(audio)
+                self._response = requests.get(self.station_url, stream=True, timeout=(10, STREAM_READ_TIMEOUT))
+                self._response.raise_for_status()
+                
+                received = STREAM_BYTES.labels(self.station_url)
+                for chunk in self._response.iter_content(chunk_size=4096):
+                    if not self.is_running:
+                        break
                     
-                    # Reset buffer and timer
-                    self.buffer = io.BytesIO()
-                    self.current_chunk_start = time.time()
+                    self.decoder.feed(chunk)
+                    received.inc(len(chunk))
+                    backoff = RECONNECT_BACKOFF
                     
-        except requests.RequestException as e:
-            print(f"Error in stream capture: {e}")
-            self.is_running = False
+            except Exception as e:
+                if self.is_running:
+                    logger.warning("Error in stream capture for %s: %s", self.station_url, e)
+            finally:
+                if self._response is not None:
+                    self._response.close()
+                    self._response = None
+            
+            if not self.is_running:
+                break
+            self.reconnects += 1
+            STREAM_RECONNECTS.labels(self.station_url).inc()
+            logger.info("Reconnecting to %s in %.1fs", self.station_url, backoff)
+            if self.supervisor.wait(backoff):
+                break
+            backoff = min(backoff * 2, RECONNECT_MAX_BACKOFF)
+        
+        if self.decoder is not None:
+            self.decoder.close()
 
-    def _process_audio(self):
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key="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"  # Move this to config.py
-        )
+    def _decode_audio(self):
+        # Read decoded audio by exact sample count rather than wall-clock time
+        while self.is_running:
+            samples = self.ring.read(self.block_samples, timeout=1)
+            if samples is None:
+                continue
+            if self.fingerprinter is not None:
+                self._fingerprint(samples)
+            started = time.time()
+            # A mirror's transmissions are transcribed by its leader
+            segments = self._segment(samples) if self.leader is None else []
+            DECODED_AUDIO.labels(self.station_url).inc(len(samples) / SAMPLE_RATE)
+            self._observe("segment", time.time() - started, len(samples) / SAMPLE_RATE)
+            for segment in segments:
+                self.audio_queue.put((segment, time.time()))
+
+    def _fingerprint(self, samples):
+        fingerprints.add(self.station_url, *self.fingerprinter.update(samples))
+        if self.fingerprinter.seconds < self._next_mirror_check:
+            return
+        self._next_mirror_check = self.fingerprinter.seconds + DEDUPE_CHECK_SECONDS
+
+        leader = self.leader
+        if leader is not None:
+            # Keep following through silence; stop once this station has audio the leader lacks
+            if not leader.is_running or (fingerprints.hash_count(self.station_url) >= fingerprints.min_matches
+                                         and not fingerprints.is_mirror(self.station_url, leader.station_url)):
+                logger.info("%s no longer mirrors %s; transcribing it separately", self.station_url, leader.station_url)
+                self._unfollow()
+            return
+        if self.subscribers:
+            return
+        # Only follow an earlier station that transcribes for itself with the same model
+        candidates = {
+            t.station_url: t for t in list(live_transcribers.values())
+            if t is not self and t.leader is None and t.is_running and t.model_size == self.model_size
+            and t.started_at < self.started_at
+        }
+        mirror_of = fingerprints.find_mirror(self.station_url, candidates)
+        if mirror_of is not None:
+            logger.info("%s mirrors %s; sharing its transcription pipeline", self.station_url, mirror_of)
+            self._follow(candidates[mirror_of])
+
+    def _follow(self, leader):
+        if self.segmenter:
+            # The open transmission is transcribed by the leader
+            self.segmenter.flush()
+        self.leader = leader
+        leader.subscribers[self.station_url] = self._publish
+        STREAM_MIRRORED.labels(self.station_url).set(1)
+
+    def _unfollow(self):
+        leader, self.leader = self.leader, None
+        if leader is not None:
+            leader.subscribers.pop(self.station_url, None)
+            STREAM_MIRRORED.labels(self.station_url).set(0)
+
+    def _publish(self, text, analysis):
+        if self.callback and self.is_running:
+            self.callback(text, analysis)
+
+    def _segment(self, samples):
+        if self.segmenter:
+            # The segmenter only returns complete transmissions
+            return self.segmenter.feed(samples)
         
+        if self.vad:
+            samples = self.vad.trim(samples)
+            if samples is None:
+                return []
+        return [samples]
+
+    def _process_audio(self):
         while self.is_running:
             try:
-                audio = self.audio_queue.get(timeout=1)
-                audio = self._preprocess_audio(audio)
+                audio, segmented_at = self.audio_queue.get(timeout=1)
+                audio_seconds = len(audio) / SAMPLE_RATE
+                started = time.time()
+                QUEUE_WAIT.labels(self.station_url, "audio").observe(started - segmented_at)
+                samples = self._preprocess_audio(audio)
+                self._observe("preprocess", time.time() - started, audio_seconds)
                 
-                temp_file = "temp_chunk.wav"
-                audio.export(temp_file, format="wav")
-                
-                # Transcribe
-                result = model.transcribe(temp_file)
+                # Transcribe through the shared batching scheduler
+                started = time.time()
+                result = self._result(self.scheduler.submit(self.station_url, samples))
+                if result is None:
+                    break
+                elapsed = time.time() - started
+                self._observe("transcribe", elapsed, audio_seconds)
+                if audio_seconds:
+                    TRANSCRIBE_RTF.labels(self.station_url).observe(elapsed / audio_seconds)
                 transcribed_text = result["text"].strip()
                 
                 if transcribed_text:
-                    # Generate analysis
-                    analysis = self._analyze_dispatch(client, transcribed_text)
+                    # Hand off to the analysis stage without waiting on the LLM
+                    self.analysis_queue.put((
+                        transcribed_text, *self._analyze_dispatch(transcribed_text),
+                        segmented_at, audio_seconds, time.time()
+                    ))
                     
-                    # Only process if we have valid analysis
-                    if analysis:
-                        # Send to callback if provided
-                        if hasattr(self, 'callback') and self.callback:
-                            self.callback(transcribed_text, analysis)
-                        
-                        print(f"Transcription: {transcribed_text}")
-                        print("Analysis:", analysis)
+            except Empty:
+                continue
+            except Exception as e:
+                logger.exception("Error in audio processing for %s: %s", self.station_url, e)
+
+    def _process_analysis(self):
+        # Results are consumed in submission order so callbacks stay ordered
+        while self.is_running:
+            try:
+                item = self.analysis_queue.get(timeout=1)
+                transcribed_text, pending, from_llm, match, segmented_at, audio_seconds, submitted_at = item
+                QUEUE_WAIT.labels(self.station_url, "analysis").observe(time.time() - submitted_at)
+                analysis = self._result(pending)
+                if not self.is_running:
+                    break
+                if from_llm:
+                    analysis = self._finish_analysis(transcribed_text, analysis)
+                incident_tracker.record(self.station_url, transcribed_text, analysis, match)
+                self._observe("analysis", time.time() - submitted_at, audio_seconds)
+                
+                # Only process if we have valid analysis, and never for a stopped station
+                if analysis and self.is_running:
+                    # Send to callback if provided
+                    if self.callback:
+                        self.callback(transcribed_text, analysis)
+                    # and to every station mirroring this one
+                    for station_url, callback in list(self.subscribers.items()):
+                        try:
+                            callback(transcribed_text, dict(analysis))
+                        except Exception as e:
+                            logger.warning("Error delivering transcription to mirror %s: %s", station_url, e)
+                    
+                    logger.info("Transcription from %s: %s", self.station_url, transcribed_text)
+                    logger.debug("Analysis: %s", analysis)
+                self._observe("end_to_end", time.time() - segmented_at, audio_seconds)
                     
-            except queue.Empty:
+            except Empty:
                 continue
             except Exception as e:
-                print(f"Error in audio processing: {e}")
-
-    def _analyze_dispatch(self, client, dispatch_message):
-        # Get recent history if available
-        recent_history = ""
-        if hasattr(self, 'callback') and hasattr(self.callback, '__self__'):
-            record_keeper = self.callback.__self__
-            if hasattr(record_keeper, 'transcriptions'):
-                # Get last 3 transcriptions for context
-                recent = record_keeper.transcriptions[-3:] if record_keeper.transcriptions else []
-                recent_history = "\n".join([t["text"] for t in recent])
-
-        prompt = f"""Analyze this emergency dispatch message. Include previous context if relevant.
-If this is not an emergency or disaster-related incident, respond with 'NOT_EMERGENCY'.
-
-Previous context (if relevant):
-{recent_history}
-
-Current message:
-{dispatch_message}
-
-Format the response exactly as shown below:
-Type: [Specific type of emergency/incident]
-Location: [Exact location including address if available]
-Severity: [Critical/High/Medium/Low]
-Units Responding: [List all responding units]
-Description: [Detailed description of the emergency]
-Timestamp: [Current time]
-
-Debug Info:
-- Confidence: [High/Medium/Low]
-- Reasoning: [Brief explanation of emergency classification]
-"""
-
-        try:
-            print("\n=== Processing New Dispatch ===")
-            print(f"Message: {dispatch_message}")
-            
-            completion = client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": "YOUR_WEBSITE",
-                    "X-Title": "Emergency Dispatch Analysis",
-                },
-                model="deepseek/deepseek-chat:free",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=500
-            )
-            
-            generated_text = completion.choices[0].message.content
-            print(f"\nAI Response:\n{generated_text}")
-            
-            # Check if it's not an emergency
-            if "NOT_EMERGENCY" in generated_text:
-                print("Result: Not an emergency - skipping")
-                return None
-            
-            # Extract and validate the analysis
-            analysis = self._extract_details(generated_text)
-            is_valid, message = self._validate_analysis(analysis)
-            
-            if not is_valid:
-                print(f"Validation Failed: {message}")
+                logger.exception("Error in analysis for %s: %s", self.station_url, e)
+
+    def _result(self, future):
+        """
+        Waits for a scheduler or LLM future while the station runs. Once it
+        is stopped the result is ignored and None returned, so a stage never
+        outlives stop_streaming().
+        """
+        while not wait([future], timeout=1).done:
+            if not self.is_running:
                 return None
-            
-            # Add timestamp if missing
-            if 'Timestamp' not in analysis:
-                analysis['Timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Add debug info
-            analysis['Debug'] = {
-                'Confidence': analysis.get('Confidence', 'Unknown'),
-                'Reasoning': analysis.get('Reasoning', 'Unknown'),
-                'ValidationStatus': message
-            }
-            
-            print("\nValidated Analysis:")
-            for key, value in analysis.items():
-                print(f"{key}: {value}")
-            print("===========================\n")
-            
-            return analysis
-            
-        except Exception as e:
-            print(f"Error in analysis: {e}")
+        return future.result() if self.is_running else None
+
+    def _observe(self, stage, seconds, audio_seconds):
+        STAGE_SECONDS.labels(self.station_url, stage).observe(seconds)
+        if self.observer is not None:
+            try:
+                self.observer(self.station_url, stage, seconds, audio_seconds)
+            except Exception as e:
+                logger.warning("Error in stage observer: %s", e)
+
+    def _analyze_dispatch(self, dispatch_message):
+        """
+        Starts analysis of a transcript. Returns (future, from_llm, match);
+        the future holds the final analysis when resolved locally, or the
+        raw LLM response when from_llm is True. match is the incident the
+        transcript was added to; _process_analysis records its analysis in
+        the same order.
+        """
+        resolved = Future()
+        match = incident_tracker.match(self.station_url, dispatch_message)
+
+        # Units joining a known incident only update its analysis
+        update = incident_tracker.update_analysis(match)
+        if update is not None:
+            ANALYSIS_ROUTES.labels(self.station_url, "incident").inc()
+            logger.debug("Unit update to incident %d: %s", match.incident.id, dispatch_message)
+            resolved.set_result(update)
+            return resolved, False, match
+
+        # Repeated transmissions reuse an earlier analysis
+        hit, cached = analysis_cache.get(dispatch_message)
+        if hit:
+            ANALYSIS_ROUTES.labels(self.station_url, "cache").inc()
+            logger.debug("Served from analysis cache: %s", dispatch_message)
+            if cached is not None:
+                cached['Timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            resolved.set_result(cached)
+            return resolved, False, match
+
+        # Obvious chatter never reaches the LLM
+        should_analyze, score = prefilter.should_analyze(dispatch_message)
+        if not should_analyze:
+            ANALYSIS_ROUTES.labels(self.station_url, "prefilter").inc()
+            logger.debug("Pre-filter skipped dispatch (score %.1f): %s", score, dispatch_message)
+            resolved.set_result(None)
+            return resolved, False, match
+
+        # The matched incident, or the station's open incidents, within a token budget
+        context = incident_tracker.context(self.station_url, match)
+
+        ANALYSIS_ROUTES.labels(self.station_url, "llm").inc()
+        logger.debug("Sending dispatch for analysis: %s", dispatch_message)
+        pending = analysis_service.submit(dispatch_message, context)
+        pending.add_done_callback(lambda future, started=time.time(): self._record_llm(future, started))
+        return pending, True, match
+
+    def _record_llm(self, future, started):
+        LLM_SECONDS.labels(self.station_url).observe(time.time() - started)
+        LLM_REQUESTS.labels(self.station_url, "error" if future.exception() else "ok").inc()
+
+    def _finish_analysis(self, dispatch_message, generated_text):
+        logger.debug("AI response:\n%s", generated_text)
+        
+        # Check if it's not an emergency
+        if "NOT_EMERGENCY" in generated_text:
+            VALIDATION.labels(self.station_url, "not_emergency").inc()
+            logger.debug("Not an emergency - skipping")
+            analysis_cache.put(dispatch_message, None)
             return None
+        
+        # Extract and validate the analysis
+        analysis = self._extract_details(generated_text)
+        is_valid, message = self._validate_analysis(analysis)
+        
+        if not is_valid:
+            VALIDATION.labels(self.station_url, "invalid").inc()
+            logger.info("Validation failed: %s", message)
+            analysis_cache.put(dispatch_message, None)
+            return None
+        
+        # Add timestamp if missing
+        if 'Timestamp' not in analysis:
+            analysis['Timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        # Add debug info
+        analysis['Debug'] = {
+            'Confidence': analysis.get('Confidence', 'Unknown'),
+            'Reasoning': analysis.get('Reasoning', 'Unknown'),
+            'ValidationStatus': message
+        }
+        
+        VALIDATION.labels(self.station_url, "valid").inc()
+        logger.debug("Validated analysis: %s", analysis)
+        
+        analysis_cache.put(dispatch_message, analysis)
+        return analysis
 
     def _extract_details(self, text):
         details = {}
@@ -198,14 +479,9 @@ Debug Info:
                 details[key.strip()] = value.strip()
         return details
 
-    def _preprocess_audio(self, audio):
-        # Convert to mono
-        audio = audio.set_channels(1)
-        # Normalize volume
-        audio = audio.apply_gain(-audio.max_dBFS)
-        # Resample to 16kHz
-        audio = audio.set_frame_rate(16000)
-        return audio
+    def _preprocess_audio(self, samples):
+        # The decoder already delivers 16kHz mono, so this normalizes and optionally filters
+        return self.preprocessor.process(samples, SAMPLE_RATE)
 
     def _validate_analysis(self, analysis: Dict) -> tuple[bool, str]:
         # Required fields that must be present and non-empty
@@ -228,32 +504,30 @@ Debug Info:
         if analysis['Severity'].lower() not in valid_severities:
             return False, f"Invalid severity level: {analysis['Severity']}"
         
-        # List of keywords indicating disasters/emergencies
-        emergency_keywords = [
-            'fire', 'explosion', 'crash', 'accident', 'disaster', 'emergency',
-            'injury', 'casualty', 'damage', 'hazard', 'threat', 'danger',
-            'evacuation', 'rescue', 'critical', 'severe', 'major', 'incident',
-            'medical', 'assault', 'shooting', 'crime', 'violence'
-        ]
-        
         # Check if the content is related to an emergency
         description_lower = analysis['Description'].lower()
         type_lower = analysis['Type'].lower()
         
         is_emergency = any(keyword in description_lower or keyword in type_lower 
-                          for keyword in emergency_keywords)
+                          for keyword in EMERGENCY_KEYWORDS)
         
         if not is_emergency:
             return False, f"Not emergency-related. Type: {analysis['Type']}, Description contains no emergency keywords"
         
         return True, "Valid emergency analysis"
 
-def get_audio_stream(url, output_file="radio.wav"):
+def _segment_pcm(audio: AudioSegment):
+  # Interleaved samples viewed straight from the segment's raw bytes, no copy
+  samples = np.frombuffer(audio.raw_data, dtype=SAMPLE_DTYPES[audio.sample_width])
+  return samples, audio.frame_rate, audio.channels
+
+def capture_audio_segment(url, duration=5):
   """
-  Captures 10 seconds of live radio audio from the given URL and saves it as a WAV file.
-  
+  Captures live radio audio from the given URL into an in-memory AudioSegment.
+  Returns None if the stream could not be fetched.
+
   :param url: The streaming URL of the radio station.
-  :param output_file: The name of the output WAV file.
+  :param duration: Seconds of stream to capture.
   """
   try:
     # Open a connection to the stream
@@ -268,57 +542,89 @@ def get_audio_stream(url, output_file="radio.wav"):
     for chunk in response.iter_content(chunk_size=chunk_size):
       buffer.write(chunk)
 
-      if time.time() - start_time >= 5:
+      if time.time() - start_time >= duration:
         break  # Stop after capturing the required duration
 
     # Convert raw stream data to an AudioSegment
     buffer.seek(0)  # Reset buffer position
-    audio = AudioSegment.from_file(buffer, format="MP3")  # Most streams are MP3
-
-    # Export as WAV
-    audio.export(output_file, format="wav")
-    print(f"Saved 10 seconds of audio to {output_file}")
+    return AudioSegment.from_file(buffer, format="MP3")  # Most streams are MP3
 
   except requests.RequestException as e:
-    print(f"Error fetching audio stream: {e}")
+    logger.error("Error fetching audio stream: %s", e)
+    return None
+
+def get_audio_stream(url, output_file="radio.wav"):
+  """
+  Captures 10 seconds of live radio audio from the given URL and saves it as a WAV file.
+  
+  :param url: The streaming URL of the radio station.
+  :param output_file: The name of the output WAV file.
+  """
+  audio = capture_audio_segment(url)
+  if audio is None:
+    return
+
+  # Export as WAV
+  audio.export(output_file, format="wav")
+  logger.info("Saved 10 seconds of audio to %s", output_file)
+
+def get_audio_array(url, duration=5):
+  """
+  In-memory variant of get_audio_stream. Captures live radio audio and
+  returns it preprocessed as a float32 array ready for transcribe_audio_array,
+  or None if the stream could not be fetched.
+  """
+  audio = capture_audio_segment(url, duration)
+  if audio is None:
+    return None
+  return preprocess_audio_array(audio)
 
 def preprocess_audio(input_path, output_path="processed_audio.wav"):
   """
   Preprocess the audio file:
   1. Convert to mono
-  2. Normalize volume
-  3. Trim silence
-  4. Resample to 16kHz
+  2. Resample to 16kHz
+  3. Band-pass filter, if PREPROCESS_BANDPASS is set
+  4. Trim silence
+  5. Normalize volume
   """
   # Load audio
   audio = AudioSegment.from_file(input_path)
 
-  # Convert to mono
-  audio = audio.set_channels(1)
+  samples = AudioPreprocessor().process(*_segment_pcm(audio))
 
-  # Normalize volume
-  audio = audio.apply_gain(-audio.max_dBFS)
-
-  # Resample to 16kHz
-  processed_audio = audio.set_frame_rate(16000)
-
-  # Export the processed audio
-  processed_audio.export(output_path, format="wav")
+  # Export the processed audio as 16-bit PCM
+  wavfile.write(output_path, SAMPLE_RATE, (samples * 32767).astype(np.int16))
 
   return output_path
 
+def preprocess_audio_array(audio: AudioSegment) -> np.ndarray:
+  """
+  In-memory variant of preprocess_audio. Applies the same steps to an
+  AudioSegment and returns a 16kHz mono float32 array without touching disk.
+  """
+  return AudioPreprocessor().process(*_segment_pcm(audio))
+
 def transcribe_audio(file_path: str):
   """
   Transcribes the audio from a WAV file using Whisper.
   """
-  result = model.transcribe(file_path)
+  result = registry.get(MODEL_SIZE).transcribe(file_path)
+  return result["text"]
+
+def transcribe_audio_array(samples: np.ndarray):
+  """
+  Transcribes a 16kHz mono float32 array using Whisper, skipping the
+  WAV encode and ffmpeg decode of the file-based path.
+  """
+  result = registry.get(MODEL_SIZE).transcribe(samples)
   return result["text"]
 
-def transcribe_audio_pipeline(station_url):
+def transcribe_audio_pipeline(station_url, model_size=MODEL_SIZE):
     """
     Main function to continuously transcribe audio from a radio station.
     Returns a LiveTranscriber instance that can be controlled.
     """
-    transcriber = LiveTranscriber()
+    transcriber = LiveTranscriber(model_size=model_size)
     transcriber.start_streaming(station_url)
     return transcriber
\ No newline at end of file
@@ -0,0 +1,251 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import (
+    TRANSCRIPT_DB_PATH, TRANSCRIPT_BATCH_SIZE, TRANSCRIPT_FLUSH_INTERVAL, TRANSCRIPT_QUEUE_SIZE,
+    SEARCH_MAX_LIMIT
+)
+from metrics import TRANSCRIPTS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS transcripts ("
+    "id INTEGER PRIMARY KEY, station TEXT NOT NULL, seq INTEGER NOT NULL, text TEXT NOT NULL, "
+    "analysis TEXT, type TEXT, severity TEXT, location TEXT, timestamp REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS transcripts_station ON transcripts (station, id)",
+    "CREATE INDEX IF NOT EXISTS transcripts_severity ON transcripts (severity, id)",
+    "CREATE INDEX IF NOT EXISTS transcripts_timestamp ON transcripts (timestamp)",
+    # Time-filtered searches walk these in (timestamp, id) order, so they need no sort
+    "CREATE INDEX IF NOT EXISTS transcripts_station_timestamp ON transcripts (station, timestamp)",
+    "CREATE INDEX IF NOT EXISTS transcripts_severity_timestamp ON transcripts (severity, timestamp)",
+]
+FTS_SCHEMA = [
+    # External content table: the text is stored once, in transcripts
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5("
+    "text, type, location, content='transcripts', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS transcripts_fts_insert AFTER INSERT ON transcripts BEGIN "
+    "INSERT INTO transcripts_fts (rowid, text, type, location) VALUES (new.id, new.text, new.type, new.location); END",
+    "CREATE TRIGGER IF NOT EXISTS transcripts_fts_delete AFTER DELETE ON transcripts BEGIN "
+    "INSERT INTO transcripts_fts (transcripts_fts, rowid, text, type, location) "
+    "VALUES ('delete', old.id, old.text, old.type, old.location); END",
+]
+
+
+def fts_query(keywords: str) -> str:
+    """Quotes each word so user input can't break FTS5 syntax; words are ANDed."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in keywords.split())
+
+
+class TranscriptStore:
+    """
+    Persistent, searchable record of every transcription, in SQLite.
+
+    add() only queues the entry; a writer thread inserts queued entries in
+    batches of up to batch_size, one transaction each, so the transcriber
+    never waits on disk; when the queue is full the entry is dropped, with a
+    warning and a count in triage_transcripts_dropped_total. The database runs in WAL mode so searches read
+    concurrently with the writer. Text, type and location are indexed with
+    FTS5 (falling back to LIKE where SQLite lacks it), and station,
+    severity and time filters use B-tree indexes. Results are paged by id
+    with a `before` cursor, which stays fast deep into large tables. With a
+    time filter, results are read newest first from the timestamp indexes
+    instead, and the cursor is looked up there. explain() shows the plan
+    SQLite picks for a search.
+    """
+
+    def __init__(self, path=TRANSCRIPT_DB_PATH, batch_size=TRANSCRIPT_BATCH_SIZE,
+                 flush_interval=TRANSCRIPT_FLUSH_INTERVAL, queue_size=TRANSCRIPT_QUEUE_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.fts = True
+        self._write_db = self._connect()
+        self._read_db = self._connect()
+        self._read_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"written": 0, "batches": 0, "dropped": 0, "errors": 0}
+        self._create_schema()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="transcript-writer")
+        self._thread.start()
+
+    def add(self, station_url: str, entry: Dict):
+        """Queues a history entry ({seq, text, analysis, timestamp}) for writing."""
+        try:
+            self.queue.put_nowait((station_url, entry))
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+                dropped = self._stats["dropped"]
+            TRANSCRIPTS_DROPPED.labels(station_url).inc()
+            logger.warning("Transcript store queue is full, dropped transcript %s from %s (%d dropped so far)",
+                           entry.get("seq"), station_url, dropped)
+
+    def flush(self, timeout: Optional[float] = None):
+        """Blocks until everything queued so far has been written."""
+        done = threading.Event()
+        self.queue.put((None, done), timeout=timeout)
+        done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10):
+        self.flush(timeout)
+
+    def search(self, keywords: Optional[str] = None, station_url: Optional[str] = None,
+               severity: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               limit: int = 50, before: Optional[int] = None) -> Dict:
+        """
+        Returns matching transcriptions, newest first. Pass the returned
+        next_before as `before` to fetch the next page.
+        """
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        sql, params = self._search_sql(keywords, station_url, severity, start, end, before)
+        with self._read_lock:
+            rows = self._read_db.execute(sql, params + [limit + 1]).fetchall()
+
+        results = [{
+            "id": row[0],
+            "station_url": row[1],
+            "seq": row[2],
+            "text": row[3],
+            "analysis": json.loads(row[4]) if row[4] else None,
+            "timestamp": datetime.fromtimestamp(row[5]).isoformat(),
+        } for row in rows[:limit]]
+        return {"results": results, "next_before": results[-1]["id"] if len(rows) > limit else None}
+
+    def explain(self, keywords: Optional[str] = None, station_url: Optional[str] = None,
+                severity: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                before: Optional[int] = None) -> List[str]:
+        """SQLite's query plan for a search with these filters, one line per step."""
+        sql, params = self._search_sql(keywords, station_url, severity, start, end, before)
+        with self._read_lock:
+            rows = self._read_db.execute("EXPLAIN QUERY PLAN " + sql, params + [1]).fetchall()
+        return [row[3] for row in rows]
+
+    def latest(self, station_url: str, n: int) -> List[Dict]:
+        """The station's newest n entries, oldest first, shaped like TranscriptHistory entries."""
+        with self._read_lock:
+            rows = self._read_db.execute(
+                "SELECT seq, text, analysis, timestamp FROM transcripts WHERE station = ? ORDER BY id DESC LIMIT ?",
+                (station_url, n)
+            ).fetchall()
+        return [{
+            "seq": row[0],
+            "text": row[1],
+            "analysis": json.loads(row[2]) if row[2] else None,
+            "timestamp": datetime.fromtimestamp(row[3]).isoformat(),
+        } for row in reversed(rows)]
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return dict(stats, pending=self.queue.qsize(), fts=self.fts)
+
+    def _search_sql(self, keywords, station_url, severity, start, end, before):
+        conditions, params = [], []
+        source, order = "transcripts t", "t.id DESC"
+        cursor = "t.id < ?"
+        if keywords and keywords.strip():
+            if self.fts:
+                # Ordering and paging on the FTS rowid lets FTS5 return matches newest first without a sort
+                source, order = "transcripts_fts f JOIN transcripts t ON t.id = f.rowid", "f.rowid DESC"
+                cursor = "f.rowid < ?"
+                conditions.append("transcripts_fts MATCH ?")
+                params.append(fts_query(keywords))
+            else:
+                for word in keywords.split():
+                    conditions.append("(t.text LIKE ? OR t.type LIKE ? OR t.location LIKE ?)")
+                    params.extend([f"%{word}%"] * 3)
+        elif start or end:
+            # Read the time range from a timestamp index rather than sorting it by id
+            order = "t.timestamp DESC, t.id DESC"
+            cursor = "(t.timestamp, t.id) < (SELECT timestamp, id FROM transcripts WHERE id = ?)"
+        if station_url:
+            conditions.append("t.station = ?")
+            params.append(station_url)
+        if severity:
+            conditions.append("t.severity = ?")
+            params.append(severity.lower())
+        if start:
+            conditions.append("t.timestamp >= ?")
+            params.append(start.timestamp())
+        if end:
+            conditions.append("t.timestamp <= ?")
+            params.append(end.timestamp())
+        if before:
+            conditions.append(cursor)
+            params.append(before)
+
+        sql = (f"SELECT t.id, t.station, t.seq, t.text, t.analysis, t.timestamp FROM {source}"
+               + (" WHERE " + " AND ".join(conditions) if conditions else "")
+               + f" ORDER BY {order} LIMIT ?")
+        return sql, params
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _create_schema(self):
+        with self._write_db:
+            for statement in SCHEMA:
+                self._write_db.execute(statement)
+            try:
+                for statement in FTS_SCHEMA:
+                    self._write_db.execute(statement)
+            except sqlite3.OperationalError as e:
+                logger.warning("FTS5 unavailable (%s); keyword search falls back to LIKE", e)
+                self.fts = False
+
+    def _run(self):
+        while True:
+            batch, waiters = [], []
+            item = self.queue.get()
+            deadline = time.time() + self.flush_interval
+            while True:
+                if item[0] is None:
+                    waiters.append(item[1])
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size or waiters:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch):
+        rows = []
+        for station_url, entry in batch:
+            analysis = entry.get("analysis") or {}
+            rows.append((
+                station_url, entry["seq"], entry["text"],
+                json.dumps(analysis, default=str) if analysis else None,
+                analysis.get("Type"), (analysis.get("Severity") or "").strip().lower() or None,
+                analysis.get("Location"),
+                datetime.fromisoformat(entry["timestamp"]).timestamp(),
+            ))
+        try:
+            with self._write_db:
+                self._write_db.executemany(
+                    "INSERT INTO transcripts (station, seq, text, analysis, type, severity, location, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+            with self._stats_lock:
+                self._stats["written"] += len(rows)
+                self._stats["batches"] += 1
+        except sqlite3.Error as e:
+            logger.error("Error writing %d transcripts: %s", len(rows), e)
+            with self._stats_lock:
+                self._stats["errors"] += 1
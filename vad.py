@@ -0,0 +1,98 @@
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+from config import (
+    VAD_FRAME_MS, VAD_ENERGY_THRESHOLD_DB, VAD_MAX_ZCR,
+    VAD_MIN_SPEECH_SECONDS, VAD_PADDING_SECONDS
+)
+from decoder import SAMPLE_RATE
+
+
+class VoiceActivityDetector:
+    """
+    Base class for voice activity gating.
+
+    Subclasses only implement speech_mask; trimming, dropping and the
+    skipped-audio statistics are shared, so a model-based detector can be
+    swapped in for the energy detector without touching the transcriber.
+    """
+
+    def __init__(self, frame_ms=VAD_FRAME_MS, min_speech_seconds=VAD_MIN_SPEECH_SECONDS,
+                 padding_seconds=VAD_PADDING_SECONDS, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.min_speech_frames = max(1, int(min_speech_seconds * sample_rate / self.frame_size))
+        self.padding_frames = int(padding_seconds * sample_rate / self.frame_size)
+        self._lock = threading.Lock()
+        self._stats = {
+            "chunks_in": 0,
+            "chunks_dropped": 0,
+            "seconds_in": 0.0,
+            "seconds_skipped": 0.0,
+        }
+
+    def speech_mask(self, frames: np.ndarray) -> np.ndarray:
+        """Returns one bool per row of a (n_frames, frame_size) array."""
+        raise NotImplementedError
+
+    def frames(self, samples: np.ndarray) -> np.ndarray:
+        n_frames = len(samples) // self.frame_size
+        return samples[:n_frames * self.frame_size].reshape(n_frames, self.frame_size)
+
+    def trim(self, samples: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Drops leading and trailing silence from a chunk.
+        Returns None if the chunk holds too little speech to transcribe.
+        """
+        mask = self.speech_mask(self.frames(samples))
+        speech_frames = int(mask.sum())
+        seconds_in = len(samples) / self.sample_rate
+
+        if speech_frames < self.min_speech_frames:
+            self._record(seconds_in, seconds_in, dropped=True)
+            return None
+
+        voiced = np.flatnonzero(mask)
+        first = max(0, voiced[0] - self.padding_frames)
+        last = min(len(mask), voiced[-1] + 1 + self.padding_frames)
+        trimmed = samples[first * self.frame_size:last * self.frame_size]
+        self._record(seconds_in, seconds_in - len(trimmed) / self.sample_rate, dropped=False)
+        return trimmed
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["skipped_ratio"] = stats["seconds_skipped"] / stats["seconds_in"] if stats["seconds_in"] else 0.0
+        return stats
+
+    def _record(self, seconds_in, seconds_skipped, dropped):
+        with self._lock:
+            self._stats["chunks_in"] += 1
+            self._stats["chunks_dropped"] += int(dropped)
+            self._stats["seconds_in"] += seconds_in
+            self._stats["seconds_skipped"] += seconds_skipped
+
+
+class EnergyVAD(VoiceActivityDetector):
+    """
+    Frame energy and zero-crossing rate detector.
+
+    A frame counts as speech when it is louder than threshold_db and its
+    zero-crossing rate is below max_zcr, which rejects the broadband hiss
+    scanners leave between transmissions.
+    """
+
+    def __init__(self, threshold_db=VAD_ENERGY_THRESHOLD_DB, max_zcr=VAD_MAX_ZCR, **kwargs):
+        super().__init__(**kwargs)
+        self.threshold_db = threshold_db
+        self.max_zcr = max_zcr
+
+    def speech_mask(self, frames: np.ndarray) -> np.ndarray:
+        if not len(frames):
+            return np.zeros(0, dtype=bool)
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        energy_db = 20 * np.log10(np.maximum(rms, 1e-10))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frames.shape[1]
+        return (energy_db > self.threshold_db) & (zcr < self.max_zcr)
@@ -0,0 +1,329 @@
+import atexit
+import itertools
+import logging
+import multiprocessing as mp
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from config import (
+    MODEL_SIZE, WORKER_PROCESSES, WORKER_THREADS, WORKER_SLOTS, WORKER_MAX_AUDIO_SECONDS,
+    WORKER_MAX_TASK_CRASHES, WORKER_MAX_BACKGROUND, WORKER_MAX_STARTUP_CRASHES, WORKER_RESTART_BACKOFF,
+    WORKER_RESTART_MAX_BACKOFF
+)
+from decoder import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+
+def _compact_result(result: Dict) -> Dict:
+    """Keeps only what the pipeline reads so results pickle cheaply."""
+    return {
+        "text": result["text"],
+        "language": result.get("language"),
+        "segments": [{
+            "text": segment["text"],
+            "temperature": segment.get("temperature"),
+            "avg_logprob": segment.get("avg_logprob"),
+            "compression_ratio": segment.get("compression_ratio"),
+            "no_speech_prob": segment.get("no_speech_prob"),
+        } for segment in result.get("segments", [])],
+    }
+
+
+def _worker_main(index, shm_name, slot_samples, model_size, threads, task_queue, result_queue, current_task):
+    """Entry point of a worker process: loads the model once, then serves tasks."""
+    import torch
+    import whisper
+
+    torch.set_num_threads(threads)
+    model = whisper.load_model(model_size, device="cpu")
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray((len(shm.buf) // (slot_samples * 4), slot_samples), dtype=np.float32, buffer=shm.buf)
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            task_id, slot, n_samples, audio = task
+            # Written straight to shared memory so the parent can tell which
+            # chunk was running if this process dies
+            current_task.value = task_id
+            try:
+                if audio is None:
+                    audio = slots[slot, :n_samples].copy()
+                result = _compact_result(model.transcribe(audio, fp16=False))
+                result_queue.put((task_id, index, result, None))
+            except Exception as e:
+                result_queue.put((task_id, index, None, repr(e)))
+    finally:
+        del slots
+        shm.close()
+
+
+class PendingTask:
+    def __init__(self, task_id, station, slot, n_samples, audio, callback, background=False):
+        self.task_id = task_id
+        self.station = station
+        self.slot = slot
+        self.n_samples = n_samples
+        self.audio = audio  # Only set when the chunk did not fit in a shared memory slot
+        self.callback = callback
+        self.background = background
+        self.future = Future()
+        self.submitted_at = time.time()
+        self.crashes = 0
+
+
+class WorkerHandle:
+    def __init__(self, index, slots, slot_samples):
+        self.index = index
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_samples * 4)
+        self.slots = np.ndarray((slots, slot_samples), dtype=np.float32, buffer=self.shm.buf)
+        self.free_slots = list(range(slots))
+        self.pending: Dict[int, PendingTask] = {}
+        self.process = None
+        self.task_queue = None
+        self.current_task = None
+        self.restarts = 0
+        self.startup_crashes = 0  # In a row, before the process ran any task
+        self.restart_at = None  # When a crashed process is due to be restarted
+        self.failed = False  # Given up after too many startup crashes
+        self.completed = 0
+        self.total_latency = 0.0
+
+
+class WhisperWorkerPool:
+    """
+    Pool of worker processes, each holding its own Whisper model.
+
+    Stations are sharded to workers by a hash of the station key, so each
+    station's chunks are transcribed in order by one process. Audio is
+    copied into a per-worker shared memory slot instead of being pickled;
+    only the slot index crosses the process boundary. A monitor thread
+    restarts crashed workers and resends their unfinished tasks. A worker
+    that keeps dying before running any task (e.g. its model cannot load)
+    is restarted with exponential backoff, and after max_startup_crashes
+    its tasks are failed and the pool reports itself unhealthy.
+
+    Background tasks, such as batch job pieces, are admitted to a worker
+    only while it has fewer than max_background of them queued, so a live
+    chunk never waits behind a long run of them.
+
+    Exposes the same submit()/get_stats() interface as InferenceScheduler.
+    """
+
+    def __init__(self, num_workers=WORKER_PROCESSES, threads_per_worker=WORKER_THREADS,
+                 model_size=MODEL_SIZE, slots_per_worker=WORKER_SLOTS,
+                 max_audio_seconds=WORKER_MAX_AUDIO_SECONDS, max_background=WORKER_MAX_BACKGROUND,
+                 max_startup_crashes=WORKER_MAX_STARTUP_CRASHES):
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.model_size = model_size
+        self.slots_per_worker = slots_per_worker
+        self.slot_samples = int(max_audio_seconds * SAMPLE_RATE)
+        self.max_background = max_background
+        self.max_startup_crashes = max_startup_crashes
+        self.workers = []
+        self._ids = itertools.count()
+        self._ctx = mp.get_context("spawn")
+        self._result_queue = None
+        self._cond = threading.Condition()
+        self._started = False
+        self._closed = False
+
+    def start(self):
+        """Spawns the workers ahead of the first chunk so their models load in the background."""
+        self._ensure_running()
+        return self
+
+    def submit(self, station, audio, callback: Optional[Callable] = None, background=False) -> Future:
+        """
+        Queues a 16kHz float32 audio array on the station's worker.
+        Blocks while that worker has no free shared memory slot, and a
+        background task also while the worker has max_background queued.
+        """
+        self._ensure_running()
+        worker = self.workers[zlib.crc32(str(station).encode("utf-8")) % self.num_workers]
+        audio = np.asarray(audio, dtype=np.float32)
+
+        fits = len(audio) <= self.slot_samples
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or worker.failed or (
+                (worker.free_slots or not fits)
+                and (not background or self._background(worker) < self.max_background)
+            ))
+            if self._closed:
+                raise RuntimeError("worker pool is closed")
+            if worker.failed:
+                raise RuntimeError(f"Whisper worker {worker.index} failed to start")
+            slot, inline_audio = None, None
+            if fits:
+                slot = worker.free_slots.pop(0)
+                worker.slots[slot, :len(audio)] = audio
+            else:
+                inline_audio = audio
+            task = PendingTask(next(self._ids), station, slot, len(audio), inline_audio, callback, background)
+            worker.pending[task.task_id] = task
+            worker.task_queue.put((task.task_id, task.slot, task.n_samples, task.audio))
+        return task.future
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            workers = [{
+                "index": worker.index,
+                "alive": worker.process is not None and worker.process.is_alive(),
+                "failed": worker.failed,
+                "pending": len(worker.pending),
+                "background": self._background(worker),
+                "free_slots": len(worker.free_slots),
+                "completed": worker.completed,
+                "restarts": worker.restarts,
+                "avg_latency": worker.total_latency / worker.completed if worker.completed else 0.0,
+            } for worker in self.workers]
+        return {
+            "backend": "process_pool",
+            "num_workers": self.num_workers,
+            "threads_per_worker": self.threads_per_worker,
+            "healthy": not any(worker["failed"] for worker in workers),
+            "pending": sum(worker["pending"] for worker in workers),
+            "completed": sum(worker["completed"] for worker in workers),
+            "workers": workers,
+        }
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.task_queue.put(None)
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            del worker.slots
+            worker.shm.close()
+            worker.shm.unlink()
+
+    def _background(self, worker: WorkerHandle) -> int:
+        """Background tasks queued on the worker; called with the lock held."""
+        return sum(task.background for task in worker.pending.values())
+
+    def _ensure_running(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            self._result_queue = self._ctx.Queue()
+            for index in range(self.num_workers):
+                worker = WorkerHandle(index, self.slots_per_worker, self.slot_samples)
+                self.workers.append(worker)
+                self._spawn(worker)
+        threading.Thread(target=self._collect_results, daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+        atexit.register(self.close)
+
+    def _spawn(self, worker: WorkerHandle):
+        # A fresh queue per process, so tasks queued for a crashed worker are
+        # resent exactly once and in their original order
+        worker.task_queue = self._ctx.Queue()
+        worker.current_task = self._ctx.Value("q", -1, lock=False)
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, worker.shm.name, self.slot_samples, self.model_size,
+                  self.threads_per_worker, worker.task_queue, self._result_queue, worker.current_task),
+            name=f"whisper-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def _monitor(self):
+        while not self._closed:
+            time.sleep(1)
+            failed = []  # (worker, task, error) resolved once the lock is released
+            with self._cond:
+                for worker in self.workers:
+                    if self._closed or worker.failed or worker.process.is_alive():
+                        continue
+                    if worker.restart_at is None:
+                        self._on_exit(worker, failed)
+                    if worker.restart_at is not None and time.time() >= worker.restart_at:
+                        worker.restart_at = None
+                        self._spawn(worker)
+                        # Results still buffered in the dead process are lost, so
+                        # everything unresolved is sent again
+                        for task in sorted(worker.pending.values(), key=lambda t: t.task_id):
+                            worker.task_queue.put((task.task_id, task.slot, task.n_samples, task.audio))
+            for worker, task, error in failed:
+                self._resolve(worker, task, None, error)
+
+    def _on_exit(self, worker: WorkerHandle, failed: list):
+        """Handles a worker process that died; called with the lock held."""
+        worker.restarts += 1
+        running = worker.pending.get(worker.current_task.value)
+        if running is None:
+            # Died before running anything, most likely while loading the model
+            worker.startup_crashes += 1
+            if worker.startup_crashes >= self.max_startup_crashes:
+                logger.error("Whisper worker %d crashed %d times at startup (%s); giving up",
+                             worker.index, worker.startup_crashes, worker.process.exitcode)
+                worker.failed = True
+                for task in list(worker.pending.values()):
+                    self._release(worker, task)
+                    failed.append((worker, task, "worker failed to start"))
+                return
+            delay = min(WORKER_RESTART_BACKOFF * 2 ** (worker.startup_crashes - 1), WORKER_RESTART_MAX_BACKOFF)
+        else:
+            # Give up on a chunk that keeps killing the worker rather than crash-loop
+            worker.startup_crashes = 0
+            running.crashes += 1
+            if running.crashes > WORKER_MAX_TASK_CRASHES:
+                self._release(worker, running)
+                failed.append((worker, running, "worker crashed repeatedly on this chunk"))
+            delay = 0
+        logger.warning("Whisper worker %d exited (%s); restarting in %.1fs",
+                       worker.index, worker.process.exitcode, delay)
+        worker.restart_at = time.time() + delay
+
+    def _collect_results(self):
+        while not self._closed:
+            try:
+                task_id, index, result, error = self._result_queue.get(timeout=1)
+            except Exception:
+                continue
+            worker = self.workers[index]
+            with self._cond:
+                worker.startup_crashes = 0
+                task = worker.pending.get(task_id)
+                if task is None:
+                    continue
+                self._release(worker, task)
+            self._resolve(worker, task, result, error)
+
+    def _release(self, worker: WorkerHandle, task: PendingTask):
+        """Frees the task's slot; called with the lock held."""
+        worker.pending.pop(task.task_id, None)
+        if task.slot is not None:
+            worker.free_slots.append(task.slot)
+        worker.completed += 1
+        worker.total_latency += time.time() - task.submitted_at
+        self._cond.notify_all()
+
+    def _resolve(self, worker: WorkerHandle, task: PendingTask, result, error):
+        """Resolves the task's future and runs its callback; called without the lock."""
+        if error is not None:
+            task.future.set_exception(RuntimeError(f"Whisper worker {worker.index} failed: {error}"))
+            return
+        task.future.set_result(result)
+        if task.callback:
+            try:
+                task.callback(result)
+            except Exception as e:
+                logger.warning("Error in inference callback: %s", e)